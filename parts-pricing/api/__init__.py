@@ -5,10 +5,10 @@ API routes package
 # Lazy imports to avoid circular import issues
 def __getattr__(name):
     if name == "prices":
-        from . import prices
+        from .routes import prices
         return prices
     elif name == "search":
-        from . import search
+        from .routes import search
         return search
     elif name == "damage":
         from .routes import damage
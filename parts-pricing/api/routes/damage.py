@@ -2,38 +2,133 @@
 Hugging Face Damage Detection API Route
 Uses DETR (Detection Transformer) from Hugging Face for better object detection
 """
-import base64
-import json
-from io import BytesIO
+import asyncio
 
-from fastapi import APIRouter, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, Response
 
 # Import the Hugging Face detector
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-from hf_damage_detector import get_detector, HuggingFaceDamageDetector
+from hf_damage_detector import analyze_images, summarize_damage
+from services.damage_inference import InferenceBatcher, InferenceQueueFull, create_executor, damage_metrics
+from services.damage_cache import cache_keys, cache_result, get_cached_result
+from services.uploads import (
+    InvalidUpload,
+    UploadTooLarge,
+    read_base64_image,
+    read_multipart_image,
+    read_multipart_images,
+)
 
 router = APIRouter()
 
-# Global detector instance
-_detector = None
+_batcher = None
 
-def get_damage_detector() -> HuggingFaceDamageDetector:
-    """Get or create the damage detector instance"""
-    global _detector
-    if _detector is None:
-        _detector = HuggingFaceDamageDetector()
-        _detector.load_model()
-    return _detector
+def get_damage_batcher() -> InferenceBatcher:
+    """Get or create the micro-batcher that feeds the detector"""
+    global _batcher
+    if _batcher is None:
+        _batcher = InferenceBatcher(analyze_images, executor=create_executor())
+    return _batcher
 
 
-@router.post("/detect")
-async def detect_damage(
-    image: UploadFile = File(..., description="Car image to analyze for damage"),
-):
+def shutdown_damage_inference() -> None:
+    """Stop the inference worker pool"""
+    if _batcher is not None:
+        _batcher.shutdown()
+
+
+async def _analyze(request: Request, image_data: bytes) -> Response:
+    """
+    Run analysis through the worker pool, unless the image was analyzed before
+    
+    With an ``X-Debug-Timings: 1`` request header the result includes
+    per-stage timings in milliseconds.
+    
+    Returns 503 with Retry-After when the queue is full and abandons the
+    request (dropping it from the queue if not started) when the client
+    disconnects.
+    """
+    keys = await cache_keys(image_data)
+    cached = await get_cached_result(keys)
+    if cached is not None:
+        return JSONResponse(content=cached, headers={"X-Cache": "HIT"})
+    
+    try:
+        future = get_damage_batcher().submit(image_data)
+    except InferenceQueueFull as e:
+        return _queue_full_response(e)
+    
+    if not await _wait_for_client(request, future):
+        return Response(status_code=499)
+    
+    result = future.result()
+    timings = result.pop("timings", None)
+    await cache_result(keys, result)
+    if _debug_timings(request):
+        result["timings"] = timings
+    return JSONResponse(
+        content=result,
+        status_code=200 if result.get("success") else 500,
+        headers={"X-Cache": "MISS"},
+    )
+
+
+def _debug_timings(request: Request) -> bool:
+    """Stage timings are returned only when the client asks for them"""
+    return request.headers.get("x-debug-timings", "").lower() in ("1", "true", "yes")
+
+
+async def _wait_for_client(request: Request, future: asyncio.Future) -> bool:
+    """Wait for an analysis; cancel it and return False if the client disconnects"""
+    while not future.done():
+        await asyncio.wait({future}, timeout=0.5)
+        if not future.done() and await request.is_disconnected():
+            future.cancel()
+            return False
+    return True
+
+
+def _upload_error_response(error: Exception) -> JSONResponse:
+    return JSONResponse(
+        status_code=413 if isinstance(error, UploadTooLarge) else 400,
+        content={
+            "success": False,
+            "error": str(error),
+            "has_damage": False,
+        }
+    )
+
+
+def _queue_full_response(error: InferenceQueueFull) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        headers={"Retry-After": str(error.retry_after)},
+        content={
+            "success": False,
+            "error": str(error),
+            "has_damage": False,
+        }
+    )
+
+
+@router.post(
+    "/detect",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "required": ["image"],
+                "properties": {"image": {"type": "string", "format": "binary"}},
+            }}},
+        },
+    },
+)
+async def detect_damage(request: Request):
     """
     Detect damage in a car image using Hugging Face DETR model
     
@@ -41,19 +136,21 @@ async def detect_damage(
     - Facebook's DETR (Detection Transformer) for object detection
     - Advanced image analysis for damage indicators
     
+    The ``image`` file field is streamed; uploads over
+    DAMAGE_MAX_IMAGE_BYTES are rejected with 413.
+    
     Returns:
         JSON with detected objects and damage analysis
     """
     try:
-        # Read image data
-        image_data = await image.read()
-        
-        # Get detector and analyze
-        detector = get_damage_detector()
-        result = detector.analyze_damage(image_data)
+        # Stream the image into a preallocated buffer
+        image_data = await read_multipart_image(request)
         
-        return JSONResponse(content=result)
+        # Analyze in the worker pool together with concurrent requests
+        return await _analyze(request, image_data)
         
+    except (UploadTooLarge, InvalidUpload) as e:
+        return _upload_error_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -65,29 +162,114 @@ async def detect_damage(
         )
 
 
-@router.post("/detect-base64")
-async def detect_damage_base64(
-    image_base64: str = Form(..., description="Base64 encoded car image"),
-):
+@router.post(
+    "/detect-base64",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                content_type: {"schema": {
+                    "type": "object",
+                    "required": ["image_base64"],
+                    "properties": {"image_base64": {"type": "string", "description": "Base64 encoded car image"}},
+                }}
+                for content_type in ("application/x-www-form-urlencoded", "multipart/form-data")
+            },
+        },
+    },
+)
+async def detect_damage_base64(request: Request):
     """
     Detect damage in a base64 encoded car image
     
     Args:
-        image_base64: Base64 encoded image string (without data URI prefix)
+        image_base64: Base64 encoded image string (without data URI prefix),
+            sent urlencoded or as multipart/form-data and decoded
+            incrementally while the form body streams in
         
     Returns:
         JSON with detected objects and damage analysis
     """
     try:
         # Decode base64 image
-        image_data = base64.b64decode(image_base64)
+        image_data = await read_base64_image(request)
+        
+        # Analyze in the worker pool together with concurrent requests
+        return await _analyze(request, image_data)
+        
+    except (UploadTooLarge, InvalidUpload) as e:
+        return _upload_error_response(e)
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "error": str(e),
+                "has_damage": False,
+            }
+        )
+
+
+@router.post(
+    "/detect-batch",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "required": ["images"],
+                "properties": {"images": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+            }}},
+        },
+    },
+)
+async def detect_damage_batch(request: Request):
+    """
+    Detect damage in all photos of one car in a single request
+    
+    The ``images`` file fields (up to DAMAGE_BATCH_MAX_IMAGES) are decoded
+    in parallel and analyzed in one batched DETR forward pass; photos
+    analyzed before come from the result cache.
+    
+    Returns:
+        JSON with per-image results (in upload order) and a merged
+        damage summary for the car
+    """
+    try:
+        images_data = await read_multipart_images(request)
         
-        # Get detector and analyze
-        detector = get_damage_detector()
-        result = detector.analyze_damage(image_data)
+        keys = await asyncio.gather(*(cache_keys(image_data) for image_data in images_data))
+        results = [await get_cached_result(image_keys) for image_keys in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
         
-        return JSONResponse(content=result)
+        if missing:
+            try:
+                future = get_damage_batcher().submit_group([images_data[i] for i in missing])
+            except InferenceQueueFull as e:
+                return _queue_full_response(e)
+            
+            if not await _wait_for_client(request, future):
+                return Response(status_code=499)
+            
+            debug = _debug_timings(request)
+            for i, result in zip(missing, future.result()):
+                timings = result.pop("timings", None)
+                await cache_result(keys[i], result)
+                if debug:
+                    result["timings"] = timings
+                results[i] = result
+        
+        return JSONResponse(
+            content={
+                "success": True,
+                "results": results,
+                "summary": summarize_damage(results),
+            },
+            headers={"X-Cache-Hits": str(len(images_data) - len(missing))},
+        )
         
+    except (UploadTooLarge, InvalidUpload) as e:
+        return _upload_error_response(e)
     except Exception as e:
         return JSONResponse(
             status_code=500,
@@ -99,6 +281,23 @@ async def detect_damage_base64(
         )
 
 
+@router.get("/metrics")
+async def damage_metrics_snapshot():
+    """
+    Damage pipeline metrics
+    
+    Counters and rates (images, batches, failures), histograms of batch
+    size, queue wait, executor round trip and every inference stage
+    (decode, preprocess, forward, postprocess, region analysis), and the
+    model load time.
+    """
+    snapshot = damage_metrics.snapshot()
+    snapshot["queue_pending"] = _batcher.pending if _batcher is not None else 0
+    # Each preforked worker keeps its own metrics
+    snapshot["pid"] = os.getpid()
+    return snapshot
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
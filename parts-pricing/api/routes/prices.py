@@ -2,13 +2,18 @@
 Price lookup API endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from typing import Optional, List
 from pydantic import BaseModel
 
 from services.cache import cache_get, cache_set, CACHE_TTL_PRICES
 from services.price_aggregator import PriceAggregator
-from scrapers import AutoDocScraper, ExistScraper
+from services.price_index import price_index
+from services.refresh import (
+    REFRESH_SOURCES, record_view, refresh_queue, refresh_status, request_refresh, write_savings
+)
+from scrapers.registry import source_names
+from models import Part, async_session
 
 router = APIRouter()
 aggregator = PriceAggregator()
@@ -28,11 +33,12 @@ class PriceResponse(BaseModel):
     message: Optional[str] = None
 
 
-class RefreshResponse(BaseModel):
-    """Response model for refresh operation"""
+class RefreshJobResponse(BaseModel):
+    """Response model for a queued refresh"""
+    job_id: str
     status: str
-    message: str
-    scraped_count: int = 0
+    attached: bool = False
+    status_url: str
 
 
 @router.get("/{part_id}/prices", response_model=PriceResponse)
@@ -48,6 +54,9 @@ async def get_part_prices(
     """
     cache_key = f"prices:part:{part_id}:stock:{in_stock_only}"
     
+    # Popularity decides how often the part is refreshed
+    await record_view(part_id)
+    
     # Try cache first
     if not force_refresh:
         cached = await cache_get(cache_key)
@@ -56,8 +65,8 @@ async def get_part_prices(
     
     # Get prices from aggregator
     try:
-        summary = await aggregator.get_price_summary(part_id)
-        response = PriceResponse(**summary)
+        stats = await aggregator.get_price_stats(part_id)
+        response = PriceResponse(**stats.to_summary())
         
         # Cache the result
         await cache_set(cache_key, response.model_dump(), CACHE_TTL_PRICES)
@@ -76,12 +85,23 @@ async def get_best_price(
     """
     Get the best (lowest) price for a part
     """
+    await record_view(part_id)
+    
+    # Served from the mapped offer index when a snapshot is available
+    if price_index.ready:
+        await price_index.sync()
+        best = await price_index.best(part_id, in_stock_only)
+        if not best:
+            raise HTTPException(status_code=404, detail="No prices found for this part")
+        return best
+    
     cache_key = f"best_price:part:{part_id}:stock:{in_stock_only}"
     
     if cached := await cache_get(cache_key):
         return cached
     
-    best = await aggregator.get_best_price(part_id, in_stock_only)
+    stats = await aggregator.get_price_stats(part_id)
+    best = stats.best_in_stock if in_stock_only else stats.best
     
     if not best:
         raise HTTPException(status_code=404, detail="No prices found for this part")
@@ -90,67 +110,67 @@ async def get_best_price(
     return best
 
 
-@router.post("/refresh", response_model=RefreshResponse)
+@router.post("/refresh", response_model=RefreshJobResponse, status_code=202)
 async def refresh_prices(
+    request: Request,
     part_id: int = Query(..., description="Part ID to refresh"),
-    sources: Optional[str] = Query(None, description="Comma-separated list of sources (autodoc,exist)")
+    sources: Optional[str] = Query(None, description="Comma-separated list of sources (default: all configured)")
 ):
     """
-    Force refresh prices for a part from all sources
+    Queue a refresh of a part's prices from all sources
+    
+    Returns immediately with a job ID; poll ``GET /refresh/{job_id}`` for
+    progress. A request for a part whose refresh is still in progress
+    returns that job instead of starting another.
     """
-    # Parse sources
-    source_list = sources.split(",") if sources else ["autodoc", "exist"]
+    # Parse sources: only those refreshed here and with a configured scraper
+    configured = source_names("prices", configured=True)
+    known = [s for s in REFRESH_SOURCES if s in configured]
+    source_list = [s for s in sources.split(",") if s] if sources else known
+    unknown = [s for s in source_list if s not in known]
+    if unknown or not source_list:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown or unconfigured sources: {', '.join(unknown)}; expected some of: {', '.join(known)}"
+        )
     
-    scraped_count = 0
+    async with async_session() as session:
+        part = await session.get(Part, part_id)
     
-    try:
-        # Initialize scrapers
-        async with AutoDocScraper() as autodoc, ExistScraper() as exist:
-            scrapers = {"autodoc": autodoc, "exist": exist}
-            
-            for source in source_list:
-                if source not in scrapers:
-                    continue
-                    
-                scraper = scrapers[source]
-                
-                # Search and get prices
-                parts = await scraper.search(f"part:{part_id}")
-                
-                for part in parts:
-                    prices = await scraper.get_prices(part)
-                    
-                    for scraped_price in prices:
-                        await aggregator.save_price_record(
-                            part_id=part_id,
-                            source=source,
-                            price=scraped_price.price,
-                            url=scraped_price.url or "",
-                            availability=scraped_price.availability,
-                            delivery_days=scraped_price.delivery_days,
-                            raw_data=scraped_price.raw_data
-                        )
-                        scraped_count += 1
-        
-        # Clear cache
-        await cache_delete(f"prices:part:{part_id}:*")
-        
-        return RefreshResponse(
-            status="success",
-            message=f"Refreshed prices from {len(source_list)} sources",
-            scraped_count=scraped_count
-        )
-        
-    except Exception as e:
-        return RefreshResponse(
-            status="error",
-            message=f"Refresh failed: {str(e)}",
-            scraped_count=scraped_count
-        )
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found")
+    
+    job_id, attached = await request_refresh(part_id, source_list)
+    status = await refresh_status(job_id)
+    
+    return RefreshJobResponse(
+        job_id=job_id,
+        status=status["status"],
+        attached=attached,
+        status_url=str(request.url_for("get_refresh_status", job_id=job_id))
+    )
 
 
-async def cache_delete(pattern: str) -> None:
-    """Helper to delete cache"""
-    from services.cache import cache_delete_pattern
-    # This is a simplified version
-    pass
+@router.get("/refresh/stats")
+async def get_refresh_stats():
+    """
+    Refresh queue counts and price writes avoided by change detection
+    
+    Write counts cover refreshes run by this process.
+    """
+    return {"queue": await refresh_queue.counts(), **write_savings()}
+
+
+@router.get("/refresh/{job_id}")
+async def get_refresh_status(job_id: str):
+    """
+    Progress of a queued refresh
+    
+    Overall status (queued, running, done, failed), number of prices
+    scraped and failed attempts, and per source its status, attempts,
+    failures, scraped count and last error.
+    """
+    status = await refresh_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    return status
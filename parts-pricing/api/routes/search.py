@@ -2,15 +2,24 @@
 Search API endpoints
 """
 
+import asyncio
+import os
+
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from pydantic import BaseModel
 
 from services.cache import cache_get, cache_set, CACHE_TTL_SEARCH
-from scrapers import AutoDocScraper, ExistScraper
+from services.part_index import normalize_article, normalize_brand, part_index
+from services.catalog_search import search_catalog, LOCAL_SEARCH_MIN_RESULTS
+from scrapers import ScrapedPart
+from scrapers.registry import get_source, plan_sources, registry_snapshot
 
 router = APIRouter()
 
+# Default latency budget of live searches (ms)
+SEARCH_LATENCY_BUDGET_MS = int(os.getenv("SEARCH_LATENCY_BUDGET_MS", "5000"))
+
 
 class PartSearchResult(BaseModel):
     """Single search result"""
@@ -20,6 +29,8 @@ class PartSearchResult(BaseModel):
     oem_number: Optional[str] = None
     url: Optional[str] = None
     source: str
+    part_id: Optional[int] = None  # Matched catalog part, if any
+    origin: str = "live"  # catalog (local index) or live (scraped)
 
 
 class SearchResponse(BaseModel):
@@ -28,24 +39,33 @@ class SearchResponse(BaseModel):
     results: List[PartSearchResult]
     total: int
     sources_searched: List[str]
+    sources_skipped: Dict[str, str] = {}
 
 
 @router.get("", response_model=SearchResponse)
 async def search_parts(
     q: str = Query(..., description="Search query (part name, SKU, OEM)"),
     limit: int = Query(10, ge=1, le=50, description="Maximum results per source"),
-    sources: Optional[str] = Query("autodoc,exist", description="Sources to search")
+    sources: Optional[str] = Query(
+        None, description="Sources to search, \"catalog\" for the local catalog (default: the catalog and every source that can)"
+    ),
+    budget_ms: int = Query(SEARCH_LATENCY_BUDGET_MS, ge=100, description="Latency budget for live sources")
 ):
     """
     Search for auto parts across multiple sources
     
-    Returns aggregated results from all specified sources
+    Returns aggregated results from the specified sources; the query
+    planner skips sources that cannot answer (or not within the budget)
+    and lists them in ``sources_skipped``. The same part found in several
+    places is listed once, where it was found first.
     """
     # Parse sources
-    source_list = [s.strip() for s in sources.split(",")]
+    source_list = [s.strip() for s in sources.split(",")] if sources else None
+    use_catalog = source_list is None or "catalog" in source_list
+    live_sources = [s for s in source_list if s != "catalog"] if source_list else None
     
     # Check cache
-    cache_key = f"search:{q}:{':'.join(source_list)}:{limit}"
+    cache_key = f"search:{q}:{':'.join(source_list or ['*'])}:{limit}:{budget_ms}"
     cached = await cache_get(cache_key)
     if cached:
         return SearchResponse(**cached)
@@ -54,46 +74,65 @@ async def search_parts(
     sources_searched = []
     
     try:
-        async with AutoDocScraper() as autodoc:
-            if "autodoc" in source_list:
-                autodoc_results = await autodoc.search(q, limit)
-                for part in autodoc_results:
-                    results.append(PartSearchResult(
-                        name=part.name,
-                        sku=part.sku,
-                        brand=part.brand,
-                        oem_number=part.oem_number,
-                        url=part.url,
-                        source="autodoc"
-                    ))
-                sources_searched.append("autodoc")
+        # Answer from the local catalog when it has enough fresh matches
+        local_hits = await search_catalog(q, limit) if use_catalog else []
+        for hit in local_hits:
+            results.append(PartSearchResult(
+                name=hit.name,
+                sku=hit.sku or "",
+                brand=hit.brand,
+                oem_number=hit.oem_number,
+                source="catalog",
+                part_id=hit.part_id,
+                origin="catalog"
+            ))
+        if local_hits:
+            sources_searched.append("catalog")
+        
+        # (or at once when only the catalog was asked for)
+        if live_sources == [] or sum(hit.is_fresh() for hit in local_hits) >= min(LOCAL_SEARCH_MIN_RESULTS, limit):
+            response = SearchResponse(
+                query=q,
+                results=results,
+                total=len(results),
+                sources_searched=sources_searched
+            )
+            await cache_set(cache_key, response.model_dump(), CACHE_TTL_SEARCH)
+            return response
         
-        async with ExistScraper() as exist:
-            if "exist" in source_list:
-                exist_results = await exist.search(q, limit)
-                for part in exist_results:
-                    results.append(PartSearchResult(
-                        name=part.name,
-                        sku=part.sku,
-                        brand=part.brand,
-                        oem_number=part.oem_number,
-                        url=part.url,
-                        source="exist"
-                    ))
-                sources_searched.append("exist")
+        # Live sources are searched concurrently, those expected to answer
+        # first listed first; a source whose circuit is open or that is
+        # not expected to answer within the budget is skipped
+        needs = ("search", "oem") if q.upper().startswith("OEM:") else ("search",)
+        plan = plan_sources(needs, budget=budget_ms / 1000, candidates=live_sources)
         
-        # Limit total results
-        results = results[:limit * len(source_list)]
+        for source, found in await asyncio.gather(*(_search_source(s, q, limit) for s in plan.sources)):
+            for part in found:
+                results.append(PartSearchResult(
+                    name=part.name,
+                    sku=part.sku,
+                    brand=part.brand,
+                    oem_number=part.oem_number,
+                    url=part.url,
+                    source=source,
+                    part_id=part_index.resolve(part)
+                ))
+            sources_searched.append(source)
+        
+        # Limit total results (local matches are kept on top)
+        results = _dedup(results)[:limit * (len(plan.sources) + 1)]
         
         response = SearchResponse(
             query=q,
             results=results,
             total=len(results),
-            sources_searched=sources_searched
+            sources_searched=sources_searched,
+            sources_skipped=plan.skipped
         )
         
-        # Cache results
-        await cache_set(cache_key, response.model_dump(), CACHE_TTL_SEARCH)
+        # Cache results, unless a source was skipped for the time being
+        if plan.complete:
+            await cache_set(cache_key, response.model_dump(), CACHE_TTL_SEARCH)
         
         return response
         
@@ -101,13 +140,43 @@ async def search_parts(
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+def _dedup(results: List[PartSearchResult]) -> List[PartSearchResult]:
+    """Keep the first result of every part (normalized brand and article)"""
+    seen = set()
+    unique = []
+    for result in results:
+        article = normalize_article(result.sku)
+        key = (normalize_brand(result.brand), article)
+        if article and key in seen:
+            continue
+        seen.add(key)
+        unique.append(result)
+    return unique
+
+
+async def _search_source(source: str, q: str, limit: int) -> Tuple[str, List[ScrapedPart]]:
+    async with get_source(source).create() as scraper:
+        return source, await scraper.search(q, limit)
+
+
 @router.get("/by-oem", response_model=SearchResponse)
 async def search_by_oem(
     oem: str = Query(..., description="OEM number"),
     limit: int = Query(10, ge=1, le=50),
-    sources: Optional[str] = Query("autodoc,exist")
+    sources: Optional[str] = Query(None),
+    budget_ms: int = Query(SEARCH_LATENCY_BUDGET_MS, ge=100)
 ):
     """
     Search for parts by OEM number
     """
-    return await search_parts(q=f"OEM:{oem}", limit=limit, sources=sources)
+    return await search_parts(q=f"OEM:{oem}", limit=limit, sources=sources, budget_ms=budget_ms)
+
+
+@router.get("/sources")
+async def source_health():
+    """
+    Registered sources: declared capabilities and rate limit, and this
+    worker's circuit state, latency percentiles, success rate, retry
+    budget and request counters
+    """
+    return registry_snapshot()
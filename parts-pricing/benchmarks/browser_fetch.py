@@ -0,0 +1,188 @@
+"""
+Benchmark: browser-backed fetches against a local fixture site
+
+Serves an Exist-like catalog page (with images, a stylesheet and a web
+font, and a session cookie) from a local HTTP server and fetches it with
+ExistScraper pointed at it (SCRAPER_EXIST_BASE_URL):
+
+- http:          the regular httpx fetch path
+- launch:        a browser launched and closed for every fetch
+- pool:          the warm BrowserPool, images/fonts blocked
+- pool-noblock:  the warm BrowserPool loading every resource
+
+For each mode it reports latency per fetch, the images and fonts the
+server had to send per fetch, the share of fetches that came back with
+the session cookie (context reuse) and how many results were parsed.
+
+Usage:
+    python -m benchmarks.browser_fetch --fetches 30 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+CATALOG_PAGE = """<!doctype html>
+<html><head>
+<link rel="stylesheet" href="/static/style.css">
+</head><body>
+{items}
+</body></html>"""
+
+ITEM = """<a class="goods-item" href="/part/{i}">
+<img src="/static/photo-{i}.jpg"><h3>Oil filter {i}</h3>
+<span class="article">W610{i}</span><span class="brand">MANN</span>
+</a>"""
+
+STYLESHEET = b"""@font-face { font-family: Site; src: url(/static/site.woff2) format("woff2"); }
+body { font-family: Site, sans-serif; }"""
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Catalog page and its resources; counts what was requested"""
+
+    counts: Counter = Counter()
+    lock = threading.Lock()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] += 1
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0]
+        headers = {}
+        if path.startswith("/catalog"):
+            self._count("documents")
+            if "session=" in self.headers.get("Cookie", ""):
+                self._count("with_session")
+            else:
+                headers["Set-Cookie"] = "session=fixture; Path=/"
+            body = CATALOG_PAGE.format(items="\n".join(ITEM.format(i=i) for i in range(8))).encode()
+            content_type = "text/html; charset=utf-8"
+        elif path.endswith(".jpg"):
+            self._count("images")
+            body, content_type = b"\xff\xd8" + b"\0" * 20000, "image/jpeg"
+        elif path.endswith(".woff2"):
+            self._count("fonts")
+            body, content_type = b"\0" * 30000, "font/woff2"
+        elif path.endswith(".css"):
+            self._count("stylesheets")
+            body, content_type = STYLESHEET, "text/css"
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_fixture_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fetch_launching(url: str) -> None:
+    """The naive way: a whole browser per fetch"""
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch()
+        page = await browser.new_page()
+        await page.goto(url, wait_until="domcontentloaded")
+        await page.content()
+        await browser.close()
+
+
+async def run_mode(mode: str, base_url: str, fetches: int, concurrency: int) -> dict:
+    from scrapers.browser import BrowserPool, close_browser_pool
+    from scrapers import browser, ExistScraper
+
+    if mode.startswith("pool"):
+        # A fresh pool per mode, warmed up with one fetch
+        await close_browser_pool()
+        browser._pool = BrowserPool(block=set() if mode == "pool-noblock" else browser.SCRAPER_BROWSER_BLOCK)
+
+    latencies: List[float] = []
+    parsed: List[int] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async with ExistScraper() as scraper:
+        scraper.fetch_mode = "http" if mode == "http" else "browser"
+
+        async def one(i: int) -> None:
+            async with slots:
+                start = time.perf_counter()
+                if mode == "launch":
+                    await fetch_launching(f"{base_url}/catalog?kw=W610{i}")
+                    parsed.append(0)
+                else:
+                    parsed.append(len(await scraper.search(f"W610{i}", limit=20)))
+                latencies.append(time.perf_counter() - start)
+
+        if mode != "launch":
+            await one(-1)
+            latencies.clear()
+            parsed.clear()
+        FixtureHandler.counts.clear()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(fetches)))
+        elapsed = time.perf_counter() - start
+
+    counts = FixtureHandler.counts
+    if mode.startswith("pool"):
+        await close_browser_pool()
+    return {
+        "ms": statistics.mean(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+        "per_s": fetches / elapsed,
+        "images": counts["images"] / fetches,
+        "fonts": counts["fonts"] / fetches,
+        "session": counts["with_session"] / max(1, counts["documents"]),
+        "parsed": statistics.mean(parsed),
+    }
+
+
+async def main_async(args) -> None:
+    print(f"{'mode':>13s} {'ms/fetch':>9s} {'p95 ms':>8s} {'fetch/s':>8s} {'img/fetch':>10s} "
+          f"{'font/fetch':>11s} {'session':>8s} {'parsed':>7s}")
+    for mode in args.modes.split(","):
+        result = await run_mode(mode, args.base_url, args.fetches, args.concurrency)
+        print(f"{mode:>13s} {result['ms']:9.1f} {result['p95_ms']:8.1f} {result['per_s']:8.1f} "
+              f"{result['images']:10.1f} {result['fonts']:11.1f} {result['session']:8.0%} {result['parsed']:7.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fetches", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--modes", default="http,launch,pool,pool-noblock")
+    args = parser.parse_args()
+
+    server = start_fixture_server()
+    args.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # Scrapers created from now on fetch from the fixture
+    os.environ["SCRAPER_EXIST_BASE_URL"] = args.base_url
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Evaluate the damage detector cascade: accuracy vs. latency per threshold
+
+Runs the full DETR model and the low-resolution pre-filter over a set of
+photos and, for every pre-filter resolution and threshold, reports how
+many photos would skip DETR, how many car photos would be lost and the
+expected latency per photo.
+
+Ground truth is either given by directories (--positives with cars,
+--negatives without) or, for a single --images directory, taken from the
+full model itself (a car detected at DETR's 0.3 threshold), which
+measures exactly what the cascade changes.
+
+Usage:
+    python -m benchmarks.cascade_eval --positives photos/cars --negatives photos/other
+    python -m benchmarks.cascade_eval --images photos/ --short-edges 256,320,384
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.damage_backends import load_images
+from damage_cascade import CarPrefilter, DAMAGE_CASCADE_MODEL
+from hf_damage_detector import HuggingFaceDamageDetector, decode_image
+
+
+def time_per_image(run, images: List[np.ndarray]) -> tuple:
+    """Results and per-image latencies (ms) of ``run`` on single images"""
+    run(images[:1])  # warm-up
+    outputs, timings = [], []
+    for image in images:
+        start = time.perf_counter()
+        outputs.extend(run([image]))
+        timings.append((time.perf_counter() - start) * 1000)
+    return outputs, timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="", help="Unlabeled photos (DETR decides what is a car)")
+    parser.add_argument("--positives", default="", help="Photos with a car")
+    parser.add_argument("--negatives", default="", help="Photos without a car")
+    parser.add_argument("--model", default=DAMAGE_CASCADE_MODEL, help="Pre-filter model")
+    parser.add_argument("--short-edges", default="256,320,384", help="Pre-filter resolutions")
+    parser.add_argument("--thresholds", default="0.02,0.05,0.1,0.2,0.3,0.5", help="Vehicle score thresholds")
+    args = parser.parse_args()
+
+    if args.positives or args.negatives:
+        positives = load_images(args.positives) if args.positives else []
+        negatives = load_images(args.negatives) if args.negatives else []
+        encoded = positives + negatives
+        labels = np.array([True] * len(positives) + [False] * len(negatives))
+    else:
+        encoded = load_images(args.images)
+        labels = None
+
+    images = [decode_image(data)[0] for data in encoded]
+
+    detector = HuggingFaceDamageDetector(cascade=False)
+    detector.load_model()
+    detections, detr_ms = time_per_image(detector.detect_objects_batch, images)
+    detr_cars = np.array([any(obj["label"] == "car" for obj in d["objects"]) for d in detections])
+    if labels is None:
+        labels = detr_cars
+    detr_mean = float(np.mean(detr_ms))
+
+    print(f"{len(images)} photos, {int(labels.sum())} with a car; full DETR {detr_mean:.1f} ms/photo")
+    if args.positives or args.negatives:
+        print(f"DETR alone: recall {detr_cars[labels].mean() if labels.any() else 1.0:.3f}")
+    print()
+    print(f"{'edge':>5s} {'thresh':>7s} {'pre ms':>7s} {'skip':>6s} {'recall':>7s} {'spec.':>6s} "
+          f"{'ms/photo':>9s} {'speedup':>8s}")
+
+    for short_edge in (int(v) for v in args.short_edges.split(",")):
+        prefilter = CarPrefilter(args.model, short_edge=short_edge, threshold=0.0)
+        verdicts, prefilter_ms = time_per_image(prefilter.vehicle_scores, images)
+        scores = np.array([score for score, _ in verdicts])
+        prefilter_mean = float(np.mean(prefilter_ms))
+
+        for threshold in (float(v) for v in args.thresholds.split(",")):
+            passed = scores >= threshold
+            recall = passed[labels].mean() if labels.any() else 1.0
+            specificity = (~passed[~labels]).mean() if (~labels).any() else 1.0
+            expected_ms = prefilter_mean + passed.mean() * detr_mean
+            print(f"{short_edge:5d} {threshold:7.2f} {prefilter_mean:7.1f} {1 - passed.mean():6.1%} "
+                  f"{recall:7.3f} {specificity:6.3f} {expected_ms:9.1f} {detr_mean / expected_ms:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Parity checks and latency/RSS benchmark for damage detector backends
+
+parity: runs every image through eager torch and each other backend and
+checks that detections agree (same labels, box IoU and score within
+tolerance). Exits with status 1 when a backend is out of tolerance.
+
+bench: loads each backend in a fresh process and reports model load
+time, per-image latency and resident memory.
+
+Usage:
+    python -m benchmarks.damage_backends parity --images photos/
+    python -m benchmarks.damage_backends bench --images photos/ --backends torch,onnx,onnx-int8
+
+The parity check also runs under pytest (tests/test_damage_backends.py)
+wherever the model is exported and the torch checkpoint is cached.
+"""
+
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Minimum IoU, maximum score difference and minimum share of matched
+# reference detections per backend
+TOLERANCES = {
+    "onnx": {"iou": 0.99, "score": 0.01, "recall": 1.0},
+    "onnx-int8": {"iou": 0.85, "score": 0.1, "recall": 0.9},
+}
+
+
+def load_images(path: str, count: int = 8) -> List[bytes]:
+    """Encoded images from a directory, or synthetic JPEGs when none is given"""
+    if path:
+        files = sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+        )
+        images = []
+        for file in files:
+            with open(file, "rb") as f:
+                images.append(f.read())
+        return images
+
+    from PIL import Image
+
+    print("No --images given, using synthetic images (few or no detections expected)")
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (960, 1280, 3), dtype=np.uint8)).save(buffer, "JPEG")
+        images.append(buffer.getvalue())
+    return images
+
+
+def iou(a: List[float], b: List[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference: List[Dict], candidate: List[Dict]) -> Dict[str, float]:
+    """Greedily match candidate detections to reference ones of the same label"""
+    unmatched = list(candidate)
+    ious, score_diffs = [], []
+
+    for ref in sorted(reference, key=lambda d: -d["score"]):
+        same_label = [c for c in unmatched if c["label"] == ref["label"]]
+        if not same_label:
+            continue
+        best = max(same_label, key=lambda c: iou(ref["bbox"], c["bbox"]))
+        unmatched.remove(best)
+        ious.append(iou(ref["bbox"], best["bbox"]))
+        score_diffs.append(abs(ref["score"] - best["score"]))
+
+    return {
+        "recall": len(ious) / len(reference) if reference else 1.0,
+        "min_iou": min(ious) if ious else 1.0,
+        "max_score_diff": max(score_diffs) if score_diffs else 0.0,
+        "extra": len(unmatched),
+    }
+
+
+def check_parity(images: List[bytes], backends: List[str]) -> Dict[str, Dict]:
+    """Worst-case agreement of each backend with eager torch, and whether it is within tolerance"""
+    from hf_damage_detector import HuggingFaceDamageDetector
+
+    reference = HuggingFaceDamageDetector("torch")
+    expected = [reference.detect_objects(image)["objects"] for image in images]
+    report = {}
+
+    for name in backends:
+        tolerance = TOLERANCES[name]
+        detector = HuggingFaceDamageDetector(name)
+        results = [
+            compare(ref, detector.detect_objects(image)["objects"])
+            for ref, image in zip(expected, images)
+        ]
+
+        recall = min(r["recall"] for r in results)
+        min_iou = min(r["min_iou"] for r in results)
+        score_diff = max(r["max_score_diff"] for r in results)
+        report[name] = {
+            "ok": recall >= tolerance["recall"] and min_iou >= tolerance["iou"] and score_diff <= tolerance["score"],
+            "recall": recall,
+            "min_iou": min_iou,
+            "max_score_diff": score_diff,
+            "extra": sum(r["extra"] for r in results),
+        }
+
+    return report
+
+
+def run_parity(images: List[bytes], backends: List[str]) -> bool:
+    report = check_parity(images, backends)
+    for name, r in report.items():
+        print(f"{name:10s} {'PASS' if r['ok'] else 'FAIL'}  recall={r['recall']:.3f} min_iou={r['min_iou']:.4f} "
+              f"max_score_diff={r['max_score_diff']:.4f} extra={r['extra']}")
+    return all(r["ok"] for r in report.values())
+
+
+def rss_mb() -> float:
+    """Current resident set size"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def measure_backend(name: str, images: List[bytes], repeat: int) -> Dict[str, float]:
+    """Load one backend and time it (run in a fresh process)"""
+    from hf_damage_detector import HuggingFaceDamageDetector
+
+    start = time.perf_counter()
+    detector = HuggingFaceDamageDetector(name)
+    detector.load_model()
+    load_time = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    detector.detect_objects(images[0])  # warm-up
+    timings = []
+    for _ in range(repeat):
+        for image in images:
+            start = time.perf_counter()
+            detector.detect_objects(image)
+            timings.append(time.perf_counter() - start)
+
+    return {
+        "load_s": load_time,
+        "p50_ms": float(np.percentile(timings, 50) * 1000),
+        "p95_ms": float(np.percentile(timings, 95) * 1000),
+        "rss_loaded_mb": rss_loaded,
+        "rss_peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_bench(images_path: str, backends: List[str], repeat: int) -> None:
+    print(f"{'backend':10s} {'load s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'RSS MB':>8s} {'peak MB':>8s}")
+    for name in backends:
+        # Fresh interpreter per backend so memory figures don't mix
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.damage_backends", "_measure",
+             "--backend", name, "--images", images_path or "", "--repeat", str(repeat)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:10s} {stats['load_s']:8.2f} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} "
+              f"{stats['rss_loaded_mb']:8.0f} {stats['rss_peak_mb']:8.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["parity", "bench", "_measure"])
+    parser.add_argument("--images", default="", help="Directory with test photos")
+    parser.add_argument("--backends", default=None, help="Comma-separated backends")
+    parser.add_argument("--backend", default="torch", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=3, help="Benchmark passes over the images")
+    args = parser.parse_args()
+
+    if args.command == "parity":
+        backends = (args.backends or "onnx,onnx-int8").split(",")
+        sys.exit(0 if run_parity(load_images(args.images), backends) else 1)
+    elif args.command == "bench":
+        run_bench(args.images, (args.backends or "torch,onnx,onnx-int8").split(","), args.repeat)
+    else:
+        print(json.dumps(measure_backend(args.backend, load_images(args.images), args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
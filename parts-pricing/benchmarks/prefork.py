@@ -0,0 +1,144 @@
+"""
+Benchmark: memory and throughput of preforked damage workers
+
+Starts ``serve_prefork.py`` with the model loaded once in the master
+(prefork) and once per worker (independent, like ``uvicorn --workers``),
+sends concurrent /api/damage/detect requests for a fixed time and
+reports per worker RSS / PSS / USS and aggregate throughput.
+
+PSS divides shared pages among the processes sharing them, so the total
+PSS is the memory the deployment really uses; USS is what one more
+worker would add.
+
+Usage:
+    python -m benchmarks.prefork --workers 1,2,4 --duration 20 --concurrency 8
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks.damage_backends import load_images
+from serve_prefork import memory_usage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def post_image(url: str, image_data: bytes) -> float:
+    """POST one image as multipart; returns the latency in seconds"""
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"car.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + image_data + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body, headers={
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+    })
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=300) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_ready(base_url: str, timeout: float) -> float:
+    deadline = time.monotonic() + timeout
+    start = time.perf_counter()
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/health", timeout=2).read()
+            return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise TimeoutError(f"{base_url} did not start")
+
+
+def run(mode: str, workers: int, port: int, images: List[bytes], args) -> dict:
+    command = [sys.executable, "serve_prefork.py", "--app", "damage_service:app", "--port", str(port),
+               "--host", "127.0.0.1", "--workers", str(workers), "--memory-interval", "0", "--log-level", "warning"]
+    if mode == "independent":
+        command.append("--no-preload")
+    # Distinct images defeat the result cache
+    env = {**os.environ, "DAMAGE_CACHE_ENABLED": "false"}
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    url = f"{base_url}/api/damage/detect"
+    try:
+        wait_ready(base_url, args.timeout)
+        # Warm-up: every worker runs the model at least once
+        with ThreadPoolExecutor(workers * 2) as pool:
+            list(pool.map(lambda i: post_image(url, images[i % len(images)]), range(workers * 4)))
+
+        latencies = []
+        deadline = time.monotonic() + args.duration
+
+        def client(offset: int):
+            i = offset
+            while time.monotonic() < deadline:
+                latencies.append(post_image(url, images[i % len(images)]))
+                i += args.concurrency
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(client, range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        master = memory_usage(server.pid) or {"rss": 0.0, "pss": 0.0, "uss": 0.0}
+        usage = [u for u in (memory_usage(pid) for pid in children(server.pid)) if u]
+        return {
+            "throughput": len(latencies) / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "master_rss": master["rss"],
+            "worker_rss": statistics.mean(u["rss"] for u in usage),
+            "worker_pss": statistics.mean(u["pss"] for u in usage),
+            "worker_uss": statistics.mean(u["uss"] for u in usage),
+            "total_pss": master["pss"] + sum(u["pss"] for u in usage),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default="", help="Directory of test photos (synthetic if empty)")
+    parser.add_argument("--count", type=int, default=32, help="Number of images")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts")
+    parser.add_argument("--modes", default="prefork,independent")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load per run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds to wait for startup")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    print(f"{len(images)} images, {args.concurrency} clients, {args.duration:.0f} s per run, "
+          f"{os.cpu_count()} cores")
+    print(f"{'mode':>12s} {'workers':>7s} {'img/s':>7s} {'p50 ms':>8s} {'master rss':>11s} "
+          f"{'worker rss':>11s} {'worker pss':>11s} {'worker uss':>11s} {'total pss':>10s}")
+
+    for workers in (int(v) for v in args.workers.split(",")):
+        for mode in args.modes.split(","):
+            result = run(mode, workers, args.port, images, args)
+            print(f"{mode:>12s} {workers:7d} {result['throughput']:7.2f} {result['p50_ms']:8.0f} "
+                  f"{result['master_rss']:9.0f}MB {result['worker_rss']:9.0f}MB {result['worker_pss']:9.0f}MB "
+                  f"{result['worker_uss']:9.0f}MB {result['total_pss']:8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
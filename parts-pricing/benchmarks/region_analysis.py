@@ -0,0 +1,100 @@
+"""
+Benchmark: per-box region analysis vs. integral-image region_statistics
+
+Compares the original implementation (crop, float64 grayscale, separate
+var/diff passes per box) with region_statistics using direct sums over
+shared float32 maps and using summed-area tables, and checks that all
+produce the same statistics.
+
+Usage:
+    python -m benchmarks.region_analysis --size 1067x800 --boxes 8
+    python -m benchmarks.region_analysis --boxes 100 --overlap
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from hf_damage_detector import region_statistics
+
+
+def reference_statistics(image: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """Original per-box computation"""
+    stats = []
+    for x1, y1, x2, y2 in boxes:
+        car_array = np.array(image[y1:y2, x1:x2])
+        gray = np.mean(car_array, axis=2)
+        dark_ratio = np.sum(gray < 50) / gray.size
+        variance = np.var(gray)
+        grad_x = np.abs(np.diff(gray, axis=1))
+        grad_y = np.abs(np.diff(gray, axis=0))
+        edge_density = (np.mean(grad_x) + np.mean(grad_y)) / 2
+        stats.append((dark_ratio, variance, edge_density))
+    return np.array(stats)
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Smooth gradient with noise and dark blobs, roughly photo-like statistics"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    base = 120 + 60 * np.sin(xx / 70) * np.cos(yy / 50)
+    image = base[..., None] + rng.normal(0, 20, (height, width, 3))
+    for _ in range(20):
+        cx, cy, r = rng.integers(0, width), rng.integers(0, height), rng.integers(5, 40)
+        image[(xx - cx) ** 2 + (yy - cy) ** 2 < r * r] = 15
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def random_boxes(width: int, height: int, count: int, overlap: bool = False, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if overlap:
+        # DETR-style near-duplicate boxes around one car
+        jitter = rng.integers(-10, 10, (count, 4))
+        car = np.array([width // 6, height // 4, width * 5 // 6, height * 3 // 4])
+        return np.clip(car + jitter, 0, [width, height, width, height])
+    x1 = rng.integers(0, width // 2, count)
+    y1 = rng.integers(0, height // 2, count)
+    x2 = x1 + rng.integers(width // 8, width // 2, count)
+    y2 = y1 + rng.integers(height // 8, height // 2, count)
+    return np.stack([x1, y1, x2, y2], axis=1)
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="1067x800", help="Image size WxH")
+    parser.add_argument("--boxes", type=int, default=8, help="Number of car boxes")
+    parser.add_argument("--overlap", action="store_true", help="Near-duplicate boxes around one car")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    image = synthetic_image(width, height)
+    boxes = random_boxes(width, height, args.boxes, args.overlap)
+
+    expected = reference_statistics(image, boxes)
+    reference_time = best_of(lambda: reference_statistics(image, boxes), args.repeat)
+
+    print(f"Image {width}x{height}, {args.boxes} {'overlapping ' if args.overlap else ''}boxes")
+    print(f"  per-box float64 (original): {reference_time * 1000:8.2f} ms")
+
+    for label, use_integral in [("shared maps, direct sums", False), ("summed-area tables", True), ("auto", None)]:
+        actual = region_statistics(image, boxes, use_integral)
+        rel_error = np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-12)
+        elapsed = best_of(lambda: region_statistics(image, boxes, use_integral), args.repeat)
+        print(f"  {label + ':':27s} {elapsed * 1000:8.2f} ms  ({reference_time / elapsed:5.2f}x)  "
+              f"max rel. error dark={rel_error[:, 0].max():.1e} "
+              f"var={rel_error[:, 1].max():.1e} edges={rel_error[:, 2].max():.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Record/replay harness for the scrapers
+
+Recordings live in ``benchmarks/fixtures/scrapers/<source>/``: the
+captured response bodies plus a ``manifest.json`` listing, per request
+path (with its sorted query string), the status, content type and body
+file, and per recorded query the number of search results and prices
+the scraper parsed when it was recorded.
+
+Replay serves them from a local HTTP stand-in (``ReplayServer``, scrapers
+pointed at it with SCRAPER_<SOURCE>_BASE_URL) or in memory
+(``replay_transport``), so benchmarks and selector checks run offline.
+
+Record (needs network; overwrites the source's recordings):
+    python -m benchmarks.replay record autodoc W7008 OC90
+Serve for manual checks:
+    python -m benchmarks.replay serve autodoc --port 8900
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import httpx
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scrapers")
+
+
+def request_key(url: str) -> str:
+    """Path and sorted query of a URL, independent of the host it was sent to"""
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return parts.path + (f"?{query}" if query else "")
+
+
+@dataclass
+class RecordedResponse:
+    status: int
+    content_type: str
+    body: bytes
+
+
+@dataclass
+class Recording:
+    """Captured responses and expected parse results of one source"""
+    source: str
+    responses: Dict[str, RecordedResponse] = field(default_factory=dict)
+    cases: List[dict] = field(default_factory=list)
+    # Built by benchmarks/synthetic.py rather than captured from the site
+    synthetic: bool = False
+
+    @classmethod
+    def load(cls, source: str, directory: str = FIXTURES_DIR) -> "Recording":
+        root = os.path.join(directory, source)
+        with open(os.path.join(root, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        recording = cls(source, cases=manifest["cases"], synthetic=manifest.get("synthetic", False))
+        for key, entry in manifest["responses"].items():
+            with open(os.path.join(root, entry["body"]), "rb") as f:
+                recording.responses[key] = RecordedResponse(entry["status"], entry["content_type"], f.read())
+        return recording
+
+    def save(self, directory: str = FIXTURES_DIR) -> None:
+        root = os.path.join(directory, self.source)
+        os.makedirs(root, exist_ok=True)
+        responses = {}
+        for index, (key, response) in enumerate(sorted(self.responses.items())):
+            extension = "json" if "json" in response.content_type else "html"
+            name = f"{index:03d}.{extension}"
+            with open(os.path.join(root, name), "wb") as f:
+                f.write(response.body)
+            responses[key] = {"status": response.status, "content_type": response.content_type, "body": name}
+        with open(os.path.join(root, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {"source": self.source, "synthetic": self.synthetic, "responses": responses, "cases": self.cases},
+                f, ensure_ascii=False, indent=2,
+            )
+
+    def respond(self, url: str) -> Optional[RecordedResponse]:
+        return self.responses.get(request_key(url))
+
+
+def available_sources(directory: str = FIXTURES_DIR) -> List[str]:
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.exists(os.path.join(directory, name, "manifest.json"))
+    )
+
+
+class ReplayServer:
+    """Local HTTP stand-in serving a recording; unknown paths get 404"""
+
+    def __init__(self, recording: Recording, port: int = 0):
+        self.recording = recording
+        self.requests = 0
+        self.misses: List[str] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                server.requests += 1
+                response = server.recording.respond(self.path)
+                if response is None:
+                    server.misses.append(self.path)
+                    response = RecordedResponse(404, "text/plain", b"not recorded")
+                self.send_response(response.status)
+                self.send_header("Content-Type", response.content_type)
+                self.send_header("Content-Length", str(len(response.body)))
+                self.end_headers()
+                self.wfile.write(response.body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "ReplayServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def replay_transport(recording: Recording) -> httpx.MockTransport:
+    """In-memory replay: no sockets, only the scraper's own work is left"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        response = recording.respond(str(request.url))
+        if response is None:
+            return httpx.Response(404, text="not recorded")
+        return httpx.Response(response.status, headers={"Content-Type": response.content_type}, content=response.body)
+    return httpx.MockTransport(handler)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes requests through and keeps every response in a recording"""
+
+    def __init__(self, recording: Recording):
+        self.recording = recording
+        self._inner = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._inner.handle_async_request(request)
+        body = await response.aread()
+        self.recording.responses[request_key(str(request.url))] = RecordedResponse(
+            response.status_code, response.headers.get("content-type", "text/html"), body
+        )
+        return httpx.Response(response.status_code, headers=response.headers, content=body)
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+def create_scraper(source: str, base_url: Optional[str] = None):
+    """A scraper for the source, optionally pointed at a stand-in"""
+    from scrapers.registry import get_source
+
+    if base_url:
+        os.environ[f"SCRAPER_{source.upper()}_BASE_URL"] = base_url
+        # Recordings need no real credentials
+        os.environ.setdefault("UMAPI_API_KEY", "replay")
+    return get_source(source).create()
+
+
+async def run_case(scraper, query: str) -> dict:
+    """Search a query and fetch the prices of every result"""
+    found = await scraper.search(query)
+    prices = 0
+    for part in found:
+        prices += len(await scraper.get_prices(part))
+    return {"query": query, "search": len(found), "prices": prices}
+
+
+async def record(source: str, queries: List[str]) -> Recording:
+    """Run the live scraper for the queries and capture what it fetched"""
+    recording = Recording(source)
+    async with create_scraper(source) as scraper:
+        scraper.session = httpx.AsyncClient(
+            transport=RecordingTransport(recording),
+            headers=scraper._get_headers(),
+            timeout=scraper.session.timeout,
+        )
+        for query in queries:
+            recording.cases.append(await run_case(scraper, query))
+    recording.save()
+    return recording
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Capture live responses")
+    record_parser.add_argument("source")
+    record_parser.add_argument("queries", nargs="+")
+    serve_parser = commands.add_parser("serve", help="Serve a recording")
+    serve_parser.add_argument("source")
+    serve_parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        recording = asyncio.run(record(args.source, args.queries))
+        for case in recording.cases:
+            print(f"{case['query']}: {case['search']} results, {case['prices']} prices")
+        print(f"{len(recording.responses)} responses saved to {os.path.join(FIXTURES_DIR, args.source)}")
+    else:
+        with ReplayServer(Recording.load(args.source), args.port) as server:
+            print(f"Serving {args.source} recording at {server.url} (Ctrl+C to stop)")
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == "__main__":
+    main()
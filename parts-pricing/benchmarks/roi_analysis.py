@@ -0,0 +1,70 @@
+"""
+Benchmark: region analysis cost vs. car area for high-resolution photos
+
+For a synthetic phone-sized JPEG and car boxes covering a growing share
+of it, times damage statistics computed:
+
+- reduced:  on the photo as decoded for DETR (default mode)
+- full-res: on the car box of the fully decoded photo
+- roi:      on the car box re-sampled at ROI resolution, in parallel tiles
+            (also shown without the decode)
+
+Usage:
+    python -m benchmarks.roi_analysis --size 4000x3000 --resolution 1024
+"""
+
+import argparse
+import io
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.region_analysis import best_of, synthetic_image
+from damage_roi import decode_regions, roi_statistics
+from hf_damage_detector import decode_image, region_statistics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="4000x3000", help="Photo size WxH")
+    parser.add_argument("--resolution", type=int, default=1024, help="ROI shortest side")
+    parser.add_argument("--tile", type=int, default=512, help="ROI tile size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    buffer = io.BytesIO()
+    Image.fromarray(synthetic_image(width, height)).save(buffer, "JPEG", quality=90)
+    image_data = buffer.getvalue()
+    print(f"Photo {width}x{height} ({width * height / 1e6:.1f} MP), ROI resolution {args.resolution}")
+    print(f"{'car area':>9s} {'reduced ms':>11s} {'full-res ms':>12s} {'roi ms':>8s} {'roi stats ms':>13s} {'roi px':>10s}")
+
+    for share in (0.05, 0.15, 0.35, 0.7):
+        side = np.sqrt(share)
+        box = [width * (1 - side) / 2, height * (1 - side) / 2, width * (1 + side) / 2, height * (1 + side) / 2]
+
+        def reduced():
+            image, (original_width, _) = decode_image(image_data)
+            scale = image.shape[1] / original_width
+            boxes = np.array([[int(v * scale) for v in box]])
+            return region_statistics(image, boxes)
+
+        def full_resolution():
+            image = np.asarray(Image.open(io.BytesIO(image_data)).convert("RGB"))
+            return region_statistics(image, np.array([[int(v) for v in box]]))
+
+        def roi():
+            return roi_statistics(decode_regions(image_data, [box], args.resolution), args.tile)
+
+        # Tile statistics alone, without decoding
+        regions = decode_regions(image_data, [box], args.resolution)
+        roi_stats = best_of(lambda: roi_statistics(regions, args.tile), args.repeat)
+
+        roi_height, roi_width = regions[0].shape[:2]
+        print(f"{share:9.0%} {best_of(reduced, args.repeat) * 1000:11.1f} "
+              f"{best_of(full_resolution, args.repeat) * 1000:12.1f} {best_of(roi, args.repeat) * 1000:8.1f} "
+              f"{roi_stats * 1000:13.1f} {roi_width:>5d}x{roi_height:<4d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Benchmark: scraper parse cost and throughput on recorded pages
+
+Runs offline against the recordings in benchmarks/fixtures/scrapers
+(see benchmarks/replay.py), or with --synthetic against full-size
+synthetic pages (see benchmarks/synthetic.py). For every scraper it
+reports:
+
+- parse ms:    BeautifulSoup parse of a recorded page
+- search ms / prices ms:  ``search`` and ``get_prices`` with responses
+               replayed in memory (parsing and selection only)
+- e2e ms:      the same through the local HTTP stand-in
+- pages/s:     pages fetched and parsed per second over HTTP with
+               --concurrency searches in flight
+- peak KB:     tracemalloc peak per page of one in-memory query
+
+With --check it compares the number of results and prices parsed per
+recorded query with the numbers recorded, and exits with status 1 on
+any difference. The committed recordings are synthetic samples built to
+fit the current selectors (benchmarks/synthetic.py), so against them
+this is only a smoke test of parsing and the harness: it cannot detect a
+selector regression against the real sites until they are replaced
+with captures from ``python -m benchmarks.replay record``.
+
+Usage:
+    python -m benchmarks.scrapers
+    python -m benchmarks.scrapers --check --sources exist
+    python -m benchmarks.scrapers --synthetic
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List
+
+# Measure the scrapers, not hedged duplicates
+os.environ.setdefault("SCRAPER_HEDGE", "false")
+
+import httpx
+from bs4 import BeautifulSoup
+
+from benchmarks.replay import Recording, ReplayServer, available_sources, create_scraper, replay_transport, run_case
+from benchmarks.synthetic import GENERATORS, synthesize
+
+
+async def timed_case(scraper, query: str, search_ms: List[float], prices_ms: List[float]) -> dict:
+    """run_case with per-call timings"""
+    start = time.perf_counter()
+    found = await scraper.search(query)
+    search_ms.append((time.perf_counter() - start) * 1000)
+    prices = 0
+    for part in found:
+        start = time.perf_counter()
+        prices += len(await scraper.get_prices(part))
+        prices_ms.append((time.perf_counter() - start) * 1000)
+    return {"query": query, "search": len(found), "prices": prices}
+
+
+def parse_ms(recording: Recording, repeat: int) -> float:
+    bodies = [response.body for response in recording.responses.values()]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for body in bodies:
+            BeautifulSoup(body, "lxml")
+    return (time.perf_counter() - start) * 1000 / (repeat * len(bodies))
+
+
+async def in_memory(recording: Recording, repeat: int) -> dict:
+    search_ms: List[float] = []
+    prices_ms: List[float] = []
+    async with create_scraper(recording.source, "http://replay.local") as scraper:
+        scraper.session = httpx.AsyncClient(transport=replay_transport(recording))
+        for _ in range(repeat):
+            for case in recording.cases:
+                await timed_case(scraper, case["query"], search_ms, prices_ms)
+
+        # Allocations of one pass over the recorded queries
+        pages = sum(1 + case["search"] for case in recording.cases)
+        tracemalloc.start()
+        results = [await run_case(scraper, case["query"]) for case in recording.cases]
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "search_ms": statistics.median(search_ms),
+        "prices_ms": statistics.median(prices_ms) if prices_ms else 0.0,
+        "peak_kb": peak / 1024 / max(1, pages),
+        "results": results,
+    }
+
+
+async def over_http(recording: Recording, repeat: int, concurrency: int) -> dict:
+    search_ms: List[float] = []
+    prices_ms: List[float] = []
+    with ReplayServer(recording) as server:
+        async with create_scraper(recording.source, server.url) as scraper:
+            for case in recording.cases:
+                await timed_case(scraper, case["query"], search_ms, prices_ms)
+
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(query: str) -> None:
+                async with slots:
+                    await run_case(scraper, query)
+
+            requests = server.requests
+            start = time.perf_counter()
+            await asyncio.gather(*(one(case["query"]) for _ in range(repeat) for case in recording.cases))
+            elapsed = time.perf_counter() - start
+            pages = server.requests - requests
+
+        if server.misses:
+            print(f"  {recording.source}: not recorded: {', '.join(sorted(set(server.misses))[:5])}")
+
+    return {
+        "search_ms": statistics.median(search_ms),
+        "prices_ms": statistics.median(prices_ms) if prices_ms else 0.0,
+        "pages_per_s": pages / elapsed,
+    }
+
+
+def check(recording: Recording, results: List[dict]) -> List[str]:
+    problems = []
+    for expected, actual in zip(recording.cases, results):
+        for key in ("search", "prices"):
+            if expected[key] != actual[key]:
+                problems.append(f"{recording.source} {expected['query']!r}: {key} {actual[key]}, recorded {expected[key]}")
+    return problems
+
+
+async def main_async(args) -> int:
+    if args.sources:
+        sources = args.sources.split(",")
+    else:
+        sources = sorted(GENERATORS) if args.synthetic else available_sources()
+    print(f"{'source':>8s} {'parse ms':>9s} {'search ms':>10s} {'prices ms':>10s} {'e2e search':>11s} "
+          f"{'e2e prices':>11s} {'pages/s':>8s} {'peak KB':>8s}")
+
+    problems = []
+    synthetic = []
+    for source in sources:
+        recording = await synthesize(source) if args.synthetic else Recording.load(source)
+        memory = await in_memory(recording, args.repeat)
+        http = await over_http(recording, args.repeat, args.concurrency)
+        print(f"{source:>8s} {parse_ms(recording, args.repeat):9.2f} {memory['search_ms']:10.2f} "
+              f"{memory['prices_ms']:10.2f} {http['search_ms']:11.2f} {http['prices_ms']:11.2f} "
+              f"{http['pages_per_s']:8.0f} {memory['peak_kb']:8.0f}")
+        problems += check(recording, memory["results"])
+        if recording.synthetic:
+            synthetic.append(source)
+
+    if args.check:
+        for problem in problems:
+            print(f"MISMATCH {problem}")
+        print("Parse results match the recordings" if not problems else f"{len(problems)} mismatches")
+        if synthetic:
+            print(f"Smoke test only for {', '.join(synthetic)}: synthetic recordings cannot catch selector "
+                  f"regressions; capture real pages with python -m benchmarks.replay record")
+        return 1 if problems else 0
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", default="", help="Comma-separated sources (default: all recorded)")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the recorded queries")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent queries for pages/s")
+    parser.add_argument("--check", action="store_true", help="Fail if parse results differ from the recordings "
+                        "(a smoke test only while the recordings are synthetic)")
+    parser.add_argument("--synthetic", action="store_true", help="Use full-size synthetic pages instead of the recordings")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark: API worker startup time and memory with and without the damage subsystem
+
+Imports ``main`` in a fresh interpreter per configuration and reports
+import time, resident memory and whether the damage routes and torch
+ended up loaded:
+
+- pricing:  DAMAGE_ENABLED=false (price-only worker)
+- lazy:     damage routes mounted, torch loaded on first damage request
+- eager:    torch and transformers imported at startup, as the damage
+            routes used to do
+
+Usage:
+    python -m benchmarks.startup --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CONFIGURATIONS = {
+    "pricing": {"DAMAGE_ENABLED": "false"},
+    "lazy": {"DAMAGE_ENABLED": "true"},
+    "eager": {"DAMAGE_ENABLED": "true", "_PRELOAD_TORCH": "1"},
+}
+
+# Runs in the child interpreter
+_PROBE = """
+import json, os, sys, time
+start = time.perf_counter()
+if os.environ.get("_PRELOAD_TORCH"):
+    import torch, transformers
+import main
+elapsed = time.perf_counter() - start
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+print(json.dumps({"import_s": elapsed, "rss_mb": rss, "torch": "torch" in sys.modules,
+                  "damage": "api.routes.damage" in sys.modules}))
+"""
+
+
+def measure(env: dict) -> dict:
+    """Import main once in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        env={**os.environ, **env},
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per configuration")
+    parser.add_argument("--configs", default=",".join(CONFIGURATIONS), help="Comma-separated configurations")
+    args = parser.parse_args()
+
+    print(f"{'config':8s} {'import s':>9s} {'RSS MB':>8s} {'damage':>7s} {'torch':>6s}")
+    for name in args.configs.split(","):
+        runs = [measure(CONFIGURATIONS[name]) for _ in range(args.repeat)]
+        print(f"{name:8s} {statistics.median(r['import_s'] for r in runs):9.2f} "
+              f"{statistics.median(r['rss_mb'] for r in runs):8.0f} "
+              f"{'yes' if runs[0]['damage'] else 'no':>7s} {'yes' if runs[0]['torch'] else 'no':>6s}")
+
+
+if __name__ == "__main__":
+    main()
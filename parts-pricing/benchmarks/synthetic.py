@@ -0,0 +1,156 @@
+"""
+Synthetic scraper recordings
+
+Builds pages shaped like the ones each scraper's selectors expect (a
+search page of results, a product page of several offers per result),
+wrapped in the navigation, footer and inline state of a real storefront
+so parse costs are realistic. They exercise the parsing and benchmark
+plumbing but cannot catch a regression against the real sites: only
+recordings captured with ``python -m benchmarks.replay record`` can.
+
+The small samples in benchmarks/fixtures/scrapers are written by this
+module until real captures replace them; ``benchmarks.scrapers
+--synthetic`` benchmarks the full-size pages in memory.
+
+Usage:
+    python -m benchmarks.synthetic samples
+"""
+
+import argparse
+import asyncio
+import random
+from typing import Callable, Dict, Sequence
+from urllib.parse import quote
+
+import httpx
+
+from benchmarks.replay import FIXTURES_DIR, RecordedResponse, Recording, create_scraper, replay_transport, request_key, run_case
+
+BRANDS = ["MANN", "BOSCH", "MAHLE", "FILTRON", "KNECHT", "FEBI", "SACHS", "LEMFORDER", "TRW", "ATE"]
+NAMES = [
+    "Фильтр масляный", "Фильтр воздушный", "Колодки тормозные передние", "Амортизатор передний",
+    "Свеча зажигания", "Ремень ГРМ", "Фильтр салона", "Диск тормозной", "Рычаг подвески", "Помпа водяная",
+]
+HTML = "text/html; charset=utf-8"
+
+# Queries and results per query of the full-size and the sample recordings
+QUERIES = {"W7008": 10, "OC90": 6}
+SAMPLE_QUERIES = {"W7008": 2}
+
+
+def storefront(body: str, title: str, links: int) -> bytes:
+    """A page with ``links`` navigation entries (and proportionate footer and state)"""
+    nav = "\n".join(f'<li class="menu__item"><a href="/catalog/{i}">Категория {i}</a></li>' for i in range(links))
+    footer = "\n".join(f'<a class="footer__link" href="/info/{i}">Информация {i}</a>' for i in range(links // 2))
+    state = ",".join(f'"k{i}":{i}' for i in range(links * 7))
+    return f"""<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8"><title>{title}</title>
+<link rel="stylesheet" href="/static/app.css"><script>window.__STATE__={{{state}}}</script></head><body>
+<header class="header"><nav><ul class="menu">{nav}</ul></nav></header>
+<main class="content">{body}</main><footer class="footer">{footer}</footer></body></html>""".encode()
+
+
+def rub(value: int) -> str:
+    return f"{value:,}".replace(",", " ") + " ₽"
+
+
+def autodoc_pages(recording: Recording, query: str, results: int, rng: random.Random, links: int) -> None:
+    items = []
+    for i in range(results):
+        brand, sku = rng.choice(BRANDS), f"{query}{i}"
+        href = f"/part/{brand.lower()}-{sku.lower()}"
+        items.append(f"""<a class="product-card" href="{href}">
+  <h3>{rng.choice(NAMES)} {brand} {sku}</h3>
+  <div class="card-sku">{sku}</div><div class="card-brand">{brand}</div>
+</a>""")
+        offers = "".join(
+            f'<div class="offer"><span class="offer__price">{rub(rng.randint(300, 9000))}</span>'
+            f'<span class="stock">в наличии</span></div>'
+            for _ in range(rng.randint(2, 5))
+        )
+        body = f'<h1>{brand} {sku}</h1><section class="offers">{offers}</section>'
+        recording.responses[href] = RecordedResponse(200, HTML, storefront(body, sku, links))
+    body = '<div class="results">' + "\n".join(items) + "</div>"
+    recording.responses[request_key(f"/search?query={quote(query)}")] = RecordedResponse(200, HTML, storefront(body, query, links))
+
+
+def exist_pages(recording: Recording, query: str, results: int, rng: random.Random, links: int) -> None:
+    items = []
+    for i in range(results):
+        brand, sku = rng.choice(BRANDS), f"{query}{i}"
+        href = f"/Price/?pcode={sku}"
+        items.append(f"""<a class="goods-item" href="{href}">
+  <h3>{rng.choice(NAMES)}</h3><span class="articul">{sku}</span><span class="maker">{brand}</span>
+</a>""")
+        offers = "".join(
+            f'<tr><td class="cost">{rub(rng.randint(300, 9000))}</td><td class="availability">под заказ</td></tr>'
+            for _ in range(rng.randint(2, 6))
+        )
+        body = f'<table class="offers">{offers}</table>'
+        recording.responses[request_key(href)] = RecordedResponse(200, HTML, storefront(body, sku, links))
+    recording.responses[request_key(f"/catalog?kw={quote(query)}")] = RecordedResponse(
+        200, HTML, storefront("\n".join(items), query, links)
+    )
+
+
+def umapi_pages(recording: Recording, query: str, results: int, rng: random.Random, links: int) -> None:
+    # An API: no storefront around the answers
+    items = []
+    for i in range(results):
+        brand, sku = rng.choice(BRANDS), f"{query}{i}"
+        items.append(
+            f'<div class="product" data-url="/v1/parts/{sku}"><span class="name">{rng.choice(NAMES)}</span>'
+            f'<span class="sku">{sku}</span><span class="brand">{brand}</span></div>'
+        )
+        body = f'<div class="offer"><span class="price">{rub(rng.randint(300, 9000))}</span><span class="stock">в наличии</span></div>'
+        recording.responses[f"/v1/price/{sku}"] = RecordedResponse(200, HTML, body.encode())
+    body = '<div class="results">' + "".join(items) + "</div>"
+    recording.responses[request_key(f"/v1/search?query={quote(query)}&limit=10")] = RecordedResponse(200, HTML, body.encode())
+
+
+GENERATORS: Dict[str, Callable[..., None]] = {
+    "autodoc": autodoc_pages,
+    "exist": exist_pages,
+    "umapi": umapi_pages,
+}
+
+
+async def synthesize(
+    source: str,
+    queries: Dict[str, int] = QUERIES,
+    links: int = 120,
+    seed: int = 7,
+) -> Recording:
+    """
+    A recording of synthetic pages for ``queries`` (query -> results),
+    with the parse results of the current scraper as its cases
+    """
+    recording = Recording(source, synthetic=True)
+    rng = random.Random(seed)
+    for query, results in queries.items():
+        GENERATORS[source](recording, query, results, rng, links)
+
+    async with create_scraper(source, "http://replay.local") as scraper:
+        scraper.session = httpx.AsyncClient(transport=replay_transport(recording))
+        for query in queries:
+            recording.cases.append(await run_case(scraper, query))
+    return recording
+
+
+async def write_samples(sources: Sequence[str], directory: str = FIXTURES_DIR) -> None:
+    for source in sources:
+        recording = await synthesize(source, SAMPLE_QUERIES, links=10)
+        recording.save(directory)
+        print(f"{source}: {len(recording.responses)} pages, {recording.cases}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    samples_parser = commands.add_parser("samples", help="Write the sample recordings (overwrites them)")
+    samples_parser.add_argument("sources", nargs="*", default=sorted(GENERATORS))
+    args = parser.parse_args()
+    asyncio.run(write_samples(args.sources))
+
+
+if __name__ == "__main__":
+    main()
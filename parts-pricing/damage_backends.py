@@ -0,0 +1,182 @@
+"""
+Inference backends for the DETR damage detector
+
+- torch:     eager PyTorch (default)
+- onnx:      exported ONNX graph run by ONNX Runtime
+- onnx-int8: the same graph with dynamically INT8-quantized weights
+
+Select with DAMAGE_BACKEND. ONNX models are exported once with:
+
+    python damage_backends.py export --out onnx_models/detr-resnet-50
+
+which writes model.onnx, model.int8.onnx and the model/processor configs,
+so ONNX workers can start without downloading the PyTorch checkpoint.
+
+torch, transformers and onnxruntime are imported only when a backend is
+created or a model exported.
+"""
+
+import argparse
+import os
+
+MODEL_NAME = "facebook/detr-resnet-50"
+
+DAMAGE_BACKEND = os.getenv("DAMAGE_BACKEND", "torch")
+DAMAGE_ONNX_DIR = os.getenv("DAMAGE_ONNX_DIR", "onnx_models/detr-resnet-50")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_ONNX_FILES = {
+    "onnx": "model.onnx",
+    "onnx-int8": "model.int8.onnx",
+}
+
+
+class TorchBackend:
+    """Eager PyTorch forward pass"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str = MODEL_NAME, device: str = "cpu"):
+        from transformers import DetrForObjectDetection, DetrImageProcessor
+
+        self.processor = DetrImageProcessor.from_pretrained(model_name)
+        self.model = DetrForObjectDetection.from_pretrained(model_name)
+        self.model.to(device)
+        self.model.eval()
+        self.device = device
+        self.id2label = self.model.config.id2label
+
+    def __call__(self, pixel_values, pixel_mask):
+        import torch
+
+        with torch.no_grad():
+            return self.model(
+                pixel_values=pixel_values.to(self.device),
+                pixel_mask=pixel_mask.to(self.device),
+            )
+
+
+class OnnxBackend:
+    """ONNX Runtime session over an exported (optionally quantized) graph"""
+
+    def __init__(self, name: str = "onnx", model_dir: str = DAMAGE_ONNX_DIR, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import DetrConfig, DetrImageProcessor
+
+        path = os.path.join(model_dir, _ONNX_FILES[name])
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"{path} not found - export it with: python damage_backends.py export --out {model_dir}"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+
+        self.name = name
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.processor = DetrImageProcessor.from_pretrained(model_dir)
+        self.id2label = DetrConfig.from_pretrained(model_dir).id2label
+
+    def __call__(self, pixel_values, pixel_mask):
+        import torch
+        from transformers.models.detr.modeling_detr import DetrObjectDetectionOutput
+
+        logits, pred_boxes = self.session.run(
+            ["logits", "pred_boxes"],
+            {
+                "pixel_values": pixel_values.numpy(),
+                "pixel_mask": pixel_mask.numpy().astype("int64"),
+            },
+        )
+        return DetrObjectDetectionOutput(
+            logits=torch.from_numpy(logits),
+            pred_boxes=torch.from_numpy(pred_boxes),
+        )
+
+
+def create_backend(name: str = DAMAGE_BACKEND, device: str = "cpu", threads: int = 0):
+    """
+    Create an inference backend by name
+
+    ``threads`` caps ONNX Runtime's intra-op threads (0 - its default, one
+    per core); torch threads are set process-wide with torch.set_num_threads.
+    """
+    if name == "torch":
+        return TorchBackend(device=device)
+    if name in _ONNX_FILES:
+        return OnnxBackend(name, threads=threads)
+    raise ValueError(f"Unknown damage backend {name!r}, expected one of {BACKENDS}")
+
+
+def export_onnx(out_dir: str, model=None, opset: int = 17) -> str:
+    """Export DETR to ONNX with dynamic batch size and image size"""
+    import torch
+    from transformers import DetrForObjectDetection, DetrImageProcessor
+
+    class _DetrExportWrapper(torch.nn.Module):
+        """Returns plain tensors so the ONNX graph has named outputs"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values, pixel_mask):
+            outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+            return outputs.logits, outputs.pred_boxes
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, _ONNX_FILES["onnx"])
+
+    if model is None:
+        model = DetrForObjectDetection.from_pretrained(MODEL_NAME)
+        DetrImageProcessor.from_pretrained(MODEL_NAME).save_pretrained(out_dir)
+    model.eval()
+    model.config.save_pretrained(out_dir)
+
+    pixel_values = torch.randn(1, 3, 800, 1066)
+    pixel_mask = torch.ones(1, 800, 1066, dtype=torch.int64)
+
+    torch.onnx.export(
+        _DetrExportWrapper(model),
+        (pixel_values, pixel_mask),
+        path,
+        input_names=["pixel_values", "pixel_mask"],
+        output_names=["logits", "pred_boxes"],
+        dynamic_axes={
+            "pixel_values": {0: "batch", 2: "height", 3: "width"},
+            "pixel_mask": {0: "batch", 1: "height", 2: "width"},
+            "logits": {0: "batch"},
+            "pred_boxes": {0: "batch"},
+        },
+        opset_version=opset,
+        dynamo=False,
+    )
+    return path
+
+
+def quantize_int8(out_dir: str) -> str:
+    """Dynamically quantize the exported graph's weights to INT8"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = os.path.join(out_dir, _ONNX_FILES["onnx"])
+    target = os.path.join(out_dir, _ONNX_FILES["onnx-int8"])
+    # Only the transformer's MatMul/Gemm; ONNX Runtime's ConvInteger kernels
+    # are slower on CPU than the float convolutions they would replace
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm"])
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the DETR damage model to ONNX")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--out", default=DAMAGE_ONNX_DIR, help="Output directory")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--no-int8", action="store_true", help="Skip the INT8-quantized variant")
+    args = parser.parse_args()
+
+    print(f"Exported {export_onnx(args.out, opset=args.opset)}")
+    if not args.no_int8:
+        print(f"Quantized {quantize_int8(args.out)}")
@@ -0,0 +1,123 @@
+"""
+Cheap first stage for the damage detector cascade
+
+A small detector (YOLOS-tiny by default) looks at a low-resolution copy
+of each photo and decides whether a vehicle is present and roughly
+where. Photos without one (documents, interiors, blurry shots) skip the
+full DETR-ResNet-50 pass; with DAMAGE_CASCADE_CROP the full model only
+sees the vehicle's surroundings.
+
+Enable with DAMAGE_CASCADE=true. Measure the accuracy/latency trade-off
+of the thresholds with ``python -m benchmarks.cascade_eval``.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+DAMAGE_CASCADE = os.getenv("DAMAGE_CASCADE", "false").lower() in ("1", "true", "yes")
+DAMAGE_CASCADE_MODEL = os.getenv("DAMAGE_CASCADE_MODEL", "hustvl/yolos-tiny")
+# Shortest edge the pre-filter sees
+DAMAGE_CASCADE_SHORT_EDGE = int(os.getenv("DAMAGE_CASCADE_SHORT_EDGE", "320"))
+# Minimum vehicle score for a photo to go on to DETR; keep it well below
+# DETR's own 0.3 so the cascade costs little recall
+DAMAGE_CASCADE_THRESHOLD = float(os.getenv("DAMAGE_CASCADE_THRESHOLD", "0.1"))
+# Run DETR on the vehicle region only (plus a margin, as a share of the box)
+DAMAGE_CASCADE_CROP = os.getenv("DAMAGE_CASCADE_CROP", "false").lower() in ("1", "true", "yes")
+DAMAGE_CASCADE_MARGIN = float(os.getenv("DAMAGE_CASCADE_MARGIN", "0.2"))
+
+# COCO classes the pre-filter treats as "a car may be here"
+VEHICLE_LABELS = {"car", "truck", "bus"}
+
+
+class CarPrefilter:
+    """Low-resolution vehicle detector deciding which photos need DETR"""
+
+    def __init__(
+        self,
+        model_name: str = DAMAGE_CASCADE_MODEL,
+        short_edge: int = DAMAGE_CASCADE_SHORT_EDGE,
+        threshold: float = DAMAGE_CASCADE_THRESHOLD,
+        margin: float = DAMAGE_CASCADE_MARGIN,
+    ):
+        self.model_name = model_name
+        self.short_edge = short_edge
+        self.threshold = threshold
+        self.margin = margin
+        self.processor = None
+        self.model = None
+
+    def load_model(self):
+        """Load the pre-filter model (imports torch/transformers)"""
+        if self.model is None:
+            from transformers import AutoImageProcessor, AutoModelForObjectDetection
+
+            print(f"Loading cascade pre-filter {self.model_name}...")
+            self.processor = AutoImageProcessor.from_pretrained(self.model_name)
+            self.model = AutoModelForObjectDetection.from_pretrained(self.model_name)
+            self.model.eval()
+        return self.model
+
+    def _downscale(self, image: np.ndarray) -> np.ndarray:
+        height, width = image.shape[:2]
+        scale = self.short_edge / min(width, height)
+        if scale >= 1:
+            return image
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return np.asarray(Image.fromarray(image).resize(size, Image.Resampling.BILINEAR))
+
+    def vehicle_scores(self, images: List[np.ndarray]) -> List[Tuple[float, Optional[List[int]]]]:
+        """
+        Best vehicle score and the union box of vehicles above the threshold
+
+        Args:
+            images: Decoded RGB arrays
+
+        Returns:
+            (score, [x1, y1, x2, y2] in array coordinates or None) per image
+        """
+        import torch
+
+        self.load_model()
+        small = [self._downscale(image) for image in images]
+        size = {"shortest_edge": self.short_edge, "longest_edge": self.short_edge * 2}
+        inputs = self.processor(images=small, size=size, return_tensors="pt")
+
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+
+        # Boxes straight in the coordinates of the arrays passed in
+        target_sizes = torch.tensor([image.shape[:2] for image in images])
+        detections = self.processor.post_process_object_detection(
+            outputs, target_sizes=target_sizes, threshold=0.0
+        )
+
+        id2label = self.model.config.id2label
+        results = []
+        for image, detection in zip(images, detections):
+            vehicles = [
+                (score.item(), box.tolist())
+                for score, label, box in zip(detection["scores"], detection["labels"], detection["boxes"])
+                if id2label[label.item()] in VEHICLE_LABELS
+            ]
+            score = max((s for s, _ in vehicles), default=0.0)
+            boxes = [box for s, box in vehicles if s >= self.threshold]
+            results.append((score, self._region(image, boxes) if boxes else None))
+        return results
+
+    def _region(self, image: np.ndarray, boxes: List[List[float]]) -> List[int]:
+        """Union of the boxes widened by the margin, clipped to the image"""
+        height, width = image.shape[:2]
+        x1 = min(b[0] for b in boxes)
+        y1 = min(b[1] for b in boxes)
+        x2 = max(b[2] for b in boxes)
+        y2 = max(b[3] for b in boxes)
+        pad_x, pad_y = (x2 - x1) * self.margin, (y2 - y1) * self.margin
+        return [
+            max(0, int(x1 - pad_x)),
+            max(0, int(y1 - pad_y)),
+            min(width, int(np.ceil(x2 + pad_x))),
+            min(height, int(np.ceil(y2 + pad_y))),
+        ]
@@ -0,0 +1,151 @@
+"""
+Region-of-interest mode for damage region analysis
+
+By default the damage statistics are computed on the photo as decoded
+for DETR (shortest edge ~800 px), so small damage on a car that fills
+part of a 12 MP photo is averaged away. In ROI mode (DAMAGE_ROI=true)
+the car is still detected at low resolution, but the statistics come
+from each car box re-sampled from the original photo so that its
+shortest side is DAMAGE_ROI_RESOLUTION pixels (never upscaled):
+
+- JPEGs are decoded once at the smallest DCT scale that still gives the
+  needed detail, and only the box is resampled from that
+- every box is split into DAMAGE_ROI_TILE-pixel tiles whose partial sums
+  (pixels, dark pixels, sum, sum of squares, gradient sums) merge
+  exactly, so tiles are processed in parallel threads
+
+Region-analysis work therefore scales with the car area at the chosen
+resolution, not with the photo's megapixels.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Sequence
+
+import numpy as np
+from PIL import Image
+
+DAMAGE_ROI = os.getenv("DAMAGE_ROI", "false").lower() in ("1", "true", "yes")
+# Shortest side of a car box, in pixels, for region analysis
+DAMAGE_ROI_RESOLUTION = int(os.getenv("DAMAGE_ROI_RESOLUTION", "1024"))
+DAMAGE_ROI_TILE = int(os.getenv("DAMAGE_ROI_TILE", "512"))
+DAMAGE_ROI_THREADS = int(os.getenv("DAMAGE_ROI_THREADS", str(min(4, os.cpu_count() or 1))))
+
+_tile_pool = None
+
+
+def decode_regions(image_data: bytes, boxes: Sequence[Sequence[float]], resolution: int = DAMAGE_ROI_RESOLUTION) -> List[np.ndarray]:
+    """
+    Decode car boxes from the original photo at ROI resolution
+
+    Args:
+        image_data: Encoded photo
+        boxes: x1, y1, x2, y2 per box in original-photo pixels
+        resolution: Target shortest side of each box
+
+    Returns:
+        RGB uint8 array per box (empty for degenerate boxes)
+    """
+    from hf_damage_detector import BufferReader
+
+    image = Image.open(BufferReader(image_data))
+    width, height = image.size
+    scales = [
+        min(1.0, resolution / max(1.0, min(x2 - x1, y2 - y1)))
+        for x1, y1, x2, y2 in boxes
+    ]
+
+    # One decode at the scale the most demanding box needs
+    scale = max(scales, default=1.0)
+    if image.format == "JPEG" and scale < 1:
+        image.draft("RGB", (int(width * scale + 0.5), int(height * scale + 0.5)))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    factor_x, factor_y = image.size[0] / width, image.size[1] / height
+
+    regions = []
+    for (x1, y1, x2, y2), box_scale in zip(boxes, scales):
+        size = (round((x2 - x1) * box_scale), round((y2 - y1) * box_scale))
+        if size[0] < 2 or size[1] < 2:
+            regions.append(np.empty((0, 0, 3), dtype=np.uint8))
+            continue
+        source_box = (x1 * factor_x, y1 * factor_y, x2 * factor_x, y2 * factor_y)
+        regions.append(np.asarray(image.resize(size, Image.Resampling.BOX, box=source_box)))
+    return regions
+
+
+def tile_sums(region: np.ndarray, y0: int, y1: int, x0: int, x1: int) -> np.ndarray:
+    """
+    Mergeable sums for pixels [y0:y1, x0:x1] of a region
+
+    Gradients pair each pixel with its right/lower neighbour, which may
+    lie in the next tile, so one extra row and column are read.
+
+    Returns:
+        pixels, dark pixels, sum, sum of squares, |dx| sum, dx count,
+        |dy| sum, dy count
+    """
+    height, width = region.shape[:2]
+    block = region[y0:min(y1 + 1, height), x0:min(x1 + 1, width)]
+    gray = block[..., 0].astype(np.float32)
+    gray += block[..., 1]
+    gray += block[..., 2]
+    gray /= 3
+
+    core = gray[:y1 - y0, :x1 - x0]
+    values = core.astype(np.float64)
+    grad_x = np.abs(np.diff(gray[:y1 - y0], axis=1))
+    grad_y = np.abs(np.diff(gray[:, :x1 - x0], axis=0))
+
+    return np.array([
+        core.size,
+        np.count_nonzero(core < 50),
+        values.sum(),
+        np.dot(values.ravel(), values.ravel()),
+        grad_x.sum(dtype=np.float64),
+        grad_x.size,
+        grad_y.sum(dtype=np.float64),
+        grad_y.size,
+    ])
+
+
+def roi_statistics(regions: List[np.ndarray], tile: int = DAMAGE_ROI_TILE) -> np.ndarray:
+    """
+    Damage statistics of whole regions from parallel tile sums
+
+    Returns:
+        Array (n, 3) of dark_ratio, variance, edge_density per region
+        (NaN for regions smaller than 2x2 pixels), as ``region_statistics``
+    """
+    global _tile_pool
+
+    jobs = []
+    for index, region in enumerate(regions):
+        height, width = region.shape[:2]
+        if height < 2 or width < 2:
+            continue
+        for y0 in range(0, height, tile):
+            for x0 in range(0, width, tile):
+                jobs.append((index, region, y0, min(y0 + tile, height), x0, min(x0 + tile, width)))
+
+    if len(jobs) > 1 and DAMAGE_ROI_THREADS > 1:
+        if _tile_pool is None:
+            _tile_pool = ThreadPoolExecutor(DAMAGE_ROI_THREADS, thread_name_prefix="roi")
+        sums = list(_tile_pool.map(lambda job: tile_sums(*job[1:]), jobs))
+    else:
+        sums = [tile_sums(*job[1:]) for job in jobs]
+
+    totals = np.zeros((len(regions), 8))
+    for (index, *_), tile_result in zip(jobs, sums):
+        totals[index] += tile_result
+
+    stats = np.full((len(regions), 3), np.nan)
+    valid = totals[:, 0] > 0
+    pixels, dark, total, squares, dx_sum, dx_count, dy_sum, dy_count = totals[valid].T
+    mean = total / pixels
+    stats[valid] = np.stack([
+        dark / pixels,
+        np.maximum(squares / pixels - mean * mean, 0.0),
+        (dx_sum / dx_count + dy_sum / dy_count) / 2,
+    ], axis=1)
+    return stats
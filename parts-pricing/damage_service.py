@@ -0,0 +1,60 @@
+"""
+Damage Detection Service - standalone deployment of the damage routes
+
+Runs only the DETR damage API, so the model's CPU and memory can be
+scaled independently of the pricing API (start that with
+DAMAGE_ENABLED=false):
+
+    uvicorn damage_service:app --port 8001
+"""
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import logging
+
+from api.routes import damage
+from services.cache import init_redis, close_redis
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan - result cache connection and inference workers"""
+    await init_redis()
+    
+    yield
+    
+    damage.shutdown_damage_inference()
+    await close_redis()
+
+
+app = FastAPI(
+    title="Damage Detection API",
+    description="Car damage detection with DETR",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # In production, specify exact origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(damage.router, prefix="/api/damage", tags=["Damage"])
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint"""
+    return {"status": "healthy"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
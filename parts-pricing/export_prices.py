@@ -0,0 +1,214 @@
+"""
+Incremental columnar export of price records for analytics
+
+Copies new ``price_records`` rows into date-partitioned Parquet files so
+analysts can query them without touching the API database:
+
+    exports/
+    ├── _watermark.json
+    ├── price_records/date=2024-05-01/part-000000001-000050000.parquet
+    └── price_rollups/date=2024-05-01/part-000000001-000050000.parquet
+
+Rows are read in keyset-paginated batches (``id > cursor LIMIT n``), each
+batch in its own short transaction, so memory stays constant and the
+SQLite lock is released between batches. Rollups are partial per batch
+(count/sum/min/max per day, part and source) and can be re-aggregated.
+Records are price changes: a scrape that finds an offer unchanged only
+bumps ``offer_states.last_seen_at`` and exports nothing.
+
+Ids are assigned before commit, so a record may become visible after
+higher ones were exported. As in the price index (services/price_index.py),
+ids skipped below the watermark are kept in the watermark file as gaps
+and looked up again on every run for EXPORT_GAP_SECONDS; a record
+filling a gap is exported in its own file.
+
+Usage:
+    python export_prices.py --out exports
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from models import PriceRecord, async_session
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WATERMARK_FILE = "_watermark.json"
+# How long ids skipped below the watermark are waited for (rolled back
+# or deleted records never show up)
+EXPORT_GAP_SECONDS = float(os.getenv("EXPORT_GAP_SECONDS", "3600"))
+
+RECORD_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("part_id", pa.int64()),
+    ("source", pa.string()),
+    ("price", pa.float64()),
+    ("currency", pa.string()),
+    ("url", pa.string()),
+    ("availability", pa.string()),
+    ("delivery_days", pa.int32()),
+    ("offer", pa.string()),
+    ("scraped_at", pa.timestamp("us")),
+])
+
+RECORD_COLUMNS = (
+    PriceRecord.id, PriceRecord.part_id, PriceRecord.source, PriceRecord.price,
+    PriceRecord.currency, PriceRecord.url, PriceRecord.availability,
+    PriceRecord.delivery_days, PriceRecord.offer, PriceRecord.scraped_at,
+)
+
+
+def read_watermark(out_dir: str) -> Tuple[int, Dict[int, float]]:
+    """Last exported record id, and the skipped ids below it -> when first missed"""
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return 0, {}
+    with open(path) as f:
+        state = json.load(f)
+    return state["last_id"], {int(i): since for i, since in state.get("gaps", {}).items()}
+
+
+def write_watermark(out_dir: str, last_id: int, gaps: Dict[int, float]) -> None:
+    """Atomically store the last exported record id and the open gaps"""
+    path = os.path.join(out_dir, WATERMARK_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "last_id": last_id,
+            "gaps": {str(i): since for i, since in sorted(gaps.items())},
+            "exported_at": datetime.utcnow().isoformat(),
+        }, f)
+    os.replace(tmp_path, path)
+
+
+async def fetch_batch(after_id: int, batch_size: int) -> List[Any]:
+    """Read the next batch of records in a short transaction"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(*RECORD_COLUMNS)
+            .where(PriceRecord.id > after_id)
+            .order_by(PriceRecord.id)
+            .limit(batch_size)
+        )
+        return result.all()
+
+
+async def fetch_ids(ids: Sequence[int]) -> List[Any]:
+    """Read the records with these ids that are visible by now"""
+    async with async_session() as session:
+        result = await session.execute(
+            select(*RECORD_COLUMNS).where(PriceRecord.id.in_(ids)).order_by(PriceRecord.id)
+        )
+        return result.all()
+
+
+def build_rollups(table: pa.Table) -> pa.Table:
+    """Partial daily rollups per part and source for one batch"""
+    return table.group_by(["date", "part_id", "source"]).aggregate([
+        ("price", "count"),
+        ("price", "sum"),
+        ("price", "min"),
+        ("price", "max"),
+    ])
+
+
+def write_partitioned(table: pa.Table, out_dir: str, dataset: str, file_name: str) -> None:
+    """Write one file per ``date`` partition present in the table"""
+    for date in pc.unique(table["date"]).to_pylist():
+        part = table.filter(pc.equal(table["date"], date)).drop_columns(["date"])
+        partition_dir = os.path.join(out_dir, dataset, f"date={date}")
+        os.makedirs(partition_dir, exist_ok=True)
+        pq.write_table(part, os.path.join(partition_dir, file_name))
+
+
+def write_rows(rows: List[Any], out_dir: str, suffix: str = "") -> None:
+    """Write records and their rollups, in files named after their id range"""
+    columns = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, RECORD_SCHEMA)],
+        schema=RECORD_SCHEMA,
+    )
+    table = table.append_column("date", pc.strftime(table["scraped_at"], format="%Y-%m-%d"))
+
+    file_name = f"part-{rows[0].id:09d}-{rows[-1].id:09d}{suffix}.parquet"
+    write_partitioned(table, out_dir, "price_records", file_name)
+    write_partitioned(build_rollups(table), out_dir, "price_rollups", file_name)
+
+
+async def export_gaps(out_dir: str, gaps: Dict[int, float], batch_size: int) -> int:
+    """Export records that filled gaps; drops filled and expired gaps"""
+    now = time.time()
+    for gap_id in [i for i, since in gaps.items() if now - since >= EXPORT_GAP_SECONDS]:
+        del gaps[gap_id]
+
+    exported = 0
+    ids = sorted(gaps)
+    for start in range(0, len(ids), batch_size):
+        rows = await fetch_ids(ids[start:start + batch_size])
+        if not rows:
+            continue
+        write_rows(rows, out_dir, suffix="-late")
+        for row in rows:
+            del gaps[row.id]
+        exported += len(rows)
+        logger.info(f"Exported {len(rows)} records committed after higher ids")
+    return exported
+
+
+async def export_prices(out_dir: str, batch_size: int = 50_000) -> Dict[str, int]:
+    """
+    Export records written since the last watermark, and late records
+    filling the gaps below it
+
+    Returns:
+        Export statistics (exported rows, new watermark and open gaps)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cursor, gaps = read_watermark(out_dir)
+    exported = await export_gaps(out_dir, gaps, batch_size)
+    if exported:
+        write_watermark(out_dir, cursor, gaps)
+
+    while True:
+        rows = await fetch_batch(cursor, batch_size)
+        if not rows:
+            break
+
+        write_rows(rows, out_dir)
+        now = time.time()
+        # On the first run, ids below the first record are not waited for
+        expected = cursor + 1 if cursor else rows[0].id
+        for row in rows:
+            gaps.update((missing, now) for missing in range(expected, row.id))
+            expected = row.id + 1
+
+        # Advance the watermark per batch so an interrupted run resumes here
+        first_id, last_id = rows[0].id, rows[-1].id
+        write_watermark(out_dir, last_id, gaps)
+        cursor = last_id
+        exported += len(rows)
+        logger.info(f"Exported records {first_id}..{last_id}")
+
+    logger.info(f"Export complete: {exported} records, watermark {cursor}, {len(gaps)} open gaps")
+    return {"exported": exported, "last_id": cursor, "gaps": len(gaps)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export price records to partitioned Parquet")
+    parser.add_argument("--out", default=os.getenv("PRICE_EXPORT_DIR", "exports"), help="Output directory")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="Records per batch")
+    args = parser.parse_args()
+
+    asyncio.run(export_prices(args.out, args.batch_size))
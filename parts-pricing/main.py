@@ -9,13 +9,23 @@ from contextlib import asynccontextmanager
 import os
 import logging
 
-from api.routes import prices, search, damage
+from api.routes import prices, search
 from services.cache import init_redis, close_redis
 from models import init_db
+from services.part_index import part_index
+from services.catalog_search import init_catalog_search
+from services.price_index import price_index
+from services.refresh import start_inprocess_worker, stop_inprocess_worker
+from scrapers.browser import close_browser_pool
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Price-only workers can skip the damage routes entirely; deploy them
+# separately with damage_service.py. The detector itself (torch and the
+# model) is loaded on the first damage request either way.
+DAMAGE_ENABLED = os.getenv("DAMAGE_ENABLED", "true").lower() in ("1", "true", "yes")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -29,12 +39,29 @@ async def lifespan(app: FastAPI):
     # Initialize database
     await init_db()
     
+    # Load SKU/OEM cross-reference index
+    await part_index.load()
+    
+    # Create local full-text catalog index
+    await init_catalog_search()
+    
+    # Map the latest-price snapshot, if one has been built
+    price_index.open()
+    
+    # Run queued price refreshes here too (REFRESH_INPROCESS_WORKERS)
+    start_inprocess_worker()
+    
     logger.info("Application started successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
+    await stop_inprocess_worker()
+    await close_browser_pool()
+    if DAMAGE_ENABLED:
+        from api.routes import damage
+        damage.shutdown_damage_inference()
     await close_redis()
     logger.info("Application shutdown complete")
 
@@ -59,7 +86,10 @@ app.add_middleware(
 # Include routers
 app.include_router(prices.router, prefix="/api/parts", tags=["Parts"])
 app.include_router(search.router, prefix="/api/search", tags=["Search"])
-app.include_router(damage.router, prefix="/api/damage", tags=["Damage"])
+
+if DAMAGE_ENABLED:
+    from api.routes import damage
+    app.include_router(damage.router, prefix="/api/damage", tags=["Damage"])
 
 
 @app.get("/")
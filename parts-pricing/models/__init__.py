@@ -6,7 +6,7 @@ import os
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, UniqueConstraint, inspect
 from datetime import datetime
 
 Base = declarative_base()
@@ -39,9 +39,80 @@ class PriceRecord(Base):
     availability = Column(String(50))  # in_stock, out_of_stock, on_order
     delivery_days = Column(Integer)
     raw_data = Column(JSON)  # Store full response for debugging
+    offer = Column(String(200))  # offer on the page at url (seller or row position)
     scraped_at = Column(DateTime, default=datetime.utcnow)
 
 
+class PartKey(Base):
+    """Normalized SKU/OEM cross-reference key pointing at a catalog part"""
+    __tablename__ = "part_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(200), nullable=False, unique=True, index=True)  # e.g. "sku:W6103", "brand_sku:MANN:W6103"
+    part_id = Column(Integer, nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # sku, brand_sku, oem
+
+
+class PartSourceUrl(Base):
+    """Known product page of a catalog part on a given source"""
+    __tablename__ = "part_source_urls"
+    __table_args__ = (UniqueConstraint("part_id", "source", "url"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    part_id = Column(Integer, nullable=False, index=True)
+    source = Column(String(50), nullable=False)
+    url = Column(String(1000), nullable=False)
+    sku = Column(String(100))
+    brand = Column(String(100))
+    last_seen_at = Column(DateTime, default=datetime.utcnow)
+
+
+class OfferState(Base):
+    """Last persisted state of an offer, so unchanged scrapes only bump last_seen_at"""
+    __tablename__ = "offer_states"
+    __table_args__ = (UniqueConstraint("part_id", "source", "url", "offer"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    part_id = Column(Integer, nullable=False, index=True)
+    source = Column(String(50), nullable=False)
+    url = Column(String(1000), nullable=False)
+    offer = Column(String(200), nullable=False, default="")  # as PriceRecord.offer, "" if none
+    fingerprint = Column(String(16), nullable=False)  # price, currency, availability, delivery
+    price_record_id = Column(Integer, nullable=False, index=True)  # record holding this state
+    changed_at = Column(DateTime, default=datetime.utcnow)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class RefreshJob(Base):
+    """Scheduled price refresh of a part on one source (see services/refresh.py)"""
+    __tablename__ = "refresh_jobs"
+    __table_args__ = (UniqueConstraint("part_id", "source"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    part_id = Column(Integer, nullable=False, index=True)
+    source = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, leased, done, dead
+    priority = Column(Float, nullable=False, default=0.0)
+    due_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    lease_owner = Column(String(100))
+    lease_expires_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    scraped_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+
+class RefreshRequest(Base):
+    """Client-requested refresh of a part, tracked through its refresh jobs"""
+    __tablename__ = "refresh_requests"
+
+    id = Column(String(32), primary_key=True)
+    part_id = Column(Integer, nullable=False, index=True)
+    sources = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///parts.db")
 
@@ -49,7 +120,19 @@ engine = create_async_engine(DATABASE_URL, echo=False)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def _add_missing_columns(conn) -> None:
+    """Add nullable columns introduced after a table was created"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+
+
 async def init_db():
     """Initialize database tables"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
@@ -0,0 +1,66 @@
+"""
+Price refresh worker - runs scheduled refresh jobs from the durable queue
+
+Start as many as needed, in any number of processes and on any hosts
+sharing DATABASE_URL (and REDIS_URL for popularity); jobs are leased so
+each one runs once. At least one worker should also run the planner,
+which queues parts whose prices are due (see services/refresh.py).
+
+Usage:
+    python refresh_worker.py --concurrency 4 --plan-interval 300
+    python refresh_worker.py --plan-only
+    python refresh_worker.py --drain      # run available jobs, then exit
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from models import init_db
+from scrapers.browser import close_browser_pool
+from services.cache import init_redis, close_redis
+from services.part_index import part_index
+from services.price_index import price_index
+from services.refresh import REFRESH_SOURCES, RefreshWorker, plan_refreshes, refresh_queue, write_savings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run(args: argparse.Namespace) -> None:
+    await init_redis()
+    await init_db()
+    await part_index.load()
+    price_index.open()
+
+    try:
+        if args.plan_only:
+            queued = await plan_refreshes(refresh_queue, args.sources)
+            logger.info(f"Planned {queued} price refreshes; queue: {await refresh_queue.counts()}")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        worker = RefreshWorker(refresh_queue, args.sources, concurrency=args.concurrency)
+        logger.info(f"Refresh worker {worker.owner}: {args.concurrency} slots, sources {', '.join(args.sources)}")
+        await worker.run(stop, plan_seconds=args.plan_interval, drain=args.drain)
+        logger.info(f"Refresh worker stopped; queue: {await refresh_queue.counts()}; writes: {write_savings()}")
+    finally:
+        await close_browser_pool()
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run scheduled price refresh jobs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs run at once by this process")
+    parser.add_argument("--sources", type=lambda v: v.split(","), default=REFRESH_SOURCES, help="Comma-separated sources")
+    parser.add_argument("--plan-interval", type=float, default=0, help="Also plan refreshes every N seconds (0 - never)")
+    parser.add_argument("--plan-only", action="store_true", help="Queue due refreshes once and exit")
+    parser.add_argument("--drain", action="store_true", help="Exit when no job is available")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
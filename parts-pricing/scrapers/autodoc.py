@@ -6,7 +6,7 @@ import logging
 from typing import List, Optional
 from urllib.parse import quote
 
-from .base import BaseScraper, ScrapedPart, ScrapedPrice
+from .base import FETCH_ERRORS, BaseScraper, ScrapedPart, ScrapedPrice
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +19,9 @@ class AutoDocScraper(BaseScraper):
     API: Has official API available
     """
     
+    capabilities = frozenset({"search", "oem", "prices"})
+    requests_per_second = 1.0
+    
     def __init__(self):
         super().__init__("autodoc", "https://autodoc.ru")
         # AutoDoc has official API - this is preferred over scraping
@@ -41,7 +44,9 @@ class AutoDocScraper(BaseScraper):
             # Parse search results - adjust selectors based on actual site structure
             result_items = soup.select(".product-card, .search-result-item, [class*='product']")
             
-            for item in result_items[:limit]:
+            for item in result_items:
+                if len(parts) >= limit:
+                    break
                 try:
                     # Extract part information
                     name_elem = item.select_one("h3, .product-name, [class*='name']")
@@ -61,6 +66,8 @@ class AutoDocScraper(BaseScraper):
                     logger.warning(f"Failed to parse AutoDoc result: {e}")
                     continue
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"AutoDoc search failed: {e}")
         
@@ -99,10 +106,13 @@ class AutoDocScraper(BaseScraper):
                         price=price,
                         currency="RUB",
                         availability=availability,
-                        url=part.url
+                        url=part.url,
+                        offer=str(len(prices))
                     )
                     prices.append(scraped_price)
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"AutoDoc get_prices failed: {e}")
         
@@ -4,14 +4,24 @@ Base scraper class for auto parts websites
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, FrozenSet
 from datetime import datetime
+import asyncio
 import logging
+import os
+import random
+import time
 import httpx
 from bs4 import BeautifulSoup
 
+from .browser import get_browser_pool
+from .resilience import SCRAPER_HEDGE, SCRAPER_MAX_RETRIES, SCRAPER_TIMEOUT, CircuitOpen, get_resilience
+
 logger = logging.getLogger(__name__)
 
+# Fetch errors a strict scraper raises instead of returning no results
+FETCH_ERRORS = (CircuitOpen, httpx.HTTPError)
+
 
 @dataclass
 class ScrapedPart:
@@ -34,23 +44,56 @@ class ScrapedPrice:
     delivery_days: Optional[int] = None
     url: Optional[str] = None
     raw_data: Optional[Dict[str, Any]] = None
+    # Which offer on the page this is (seller, or row position); a page
+    # usually lists several offers under the same url
+    offer: Optional[str] = None
 
 
 class BaseScraper(ABC):
-    """Base class for all scrapers"""
+    """
+    Base class for all scrapers
+    
+    ``fetch_mode`` is "http" (httpx) or "browser" (a pooled headless
+    browser, see scrapers/browser.py). Both it and ``base_url`` can be
+    overridden per source with SCRAPER_<SOURCE>_FETCH_MODE and
+    SCRAPER_<SOURCE>_BASE_URL, e.g. to point a scraper at a fixture server.
+    
+    ``capabilities`` and ``requests_per_second`` describe the source to
+    the query planner (scrapers/registry.py). Capabilities used so far:
+    search, oem (OEM number queries), prices, brand_article (price by
+    brand and article), batch (several parts per request) and json_api.
+    """
+    
+    fetch_mode = "http"
+    capabilities: FrozenSet[str] = frozenset({"search", "prices"})
+    # Requests per second the source tolerates (None - not limited)
+    requests_per_second: Optional[float] = 1.0
+    # Raise FETCH_ERRORS instead of returning no results, so a failed
+    # fetch can be told from an empty page (scheduled refreshes)
+    strict = False
     
     def __init__(self, source_name: str, base_url: str):
         self.source_name = source_name
-        self.base_url = base_url
+        prefix = f"SCRAPER_{source_name.upper()}_"
+        self.base_url = os.getenv(prefix + "BASE_URL", base_url)
+        self.fetch_mode = os.getenv(prefix + "FETCH_MODE", self.fetch_mode)
         self.session: Optional[httpx.AsyncClient] = None
+        # Circuit breaker, latency and retry budget shared by all
+        # instances for this source
+        self.resilience = get_resilience(source_name)
         
         # Rate limiting
-        self.request_delay = 1.0  # seconds between requests
+        self.request_delay = 1.0 / self.requests_per_second if self.requests_per_second else 0.0
+    
+    @classmethod
+    def is_configured(cls) -> bool:
+        """Whether the source can be queried here (e.g. has its credentials)"""
+        return True
         
     async def __aenter__(self):
         """Async context manager entry"""
         self.session = httpx.AsyncClient(
-            timeout=30.0,
+            timeout=SCRAPER_TIMEOUT,
             headers=self._get_headers()
         )
         return self
@@ -97,16 +140,161 @@ class BaseScraper(ABC):
         """
         pass
     
-    async def _fetch_page(self, url: str) -> Optional[BeautifulSoup]:
+    async def _fetch_page(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Optional[BeautifulSoup]:
         """Fetch and parse HTML page"""
         try:
-            response = await self.session.get(url)
+            response = await self._get(url, params=params, headers=headers)
             response.raise_for_status()
             return BeautifulSoup(response.text, "lxml")
+        except CircuitOpen as e:
+            if self.strict:
+                raise
+            logger.debug(str(e))
+            return None
         except httpx.HTTPError as e:
+            if self.strict:
+                raise
             logger.error(f"Failed to fetch {url}: {e}")
             return None
     
+    async def _get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        GET through the source's circuit breaker, with hedging and retries
+        
+        Timeouts, connection errors, 5xx and 429 count as failures of the
+        source and are retried (with backoff) while the retry budget
+        allows. A request still running after the source's p95 latency
+        is hedged with a second one.
+        
+        Raises:
+            CircuitOpen: if the source is failing and not being probed
+            httpx.HTTPError: if the last attempt failed
+        """
+        resilience = self.resilience
+        breaker = resilience.breaker
+        resilience.budget.deposit()
+        
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                resilience.count("rejected")
+                raise CircuitOpen(self.source_name, breaker.retry_in())
+            
+            resilience.count("requests")
+            try:
+                # A half-open probe is a single request
+                if self.fetch_mode == "browser":
+                    response = await self._browser_get(url, params, headers)
+                else:
+                    response = await self._send(url, params, headers, hedge=breaker.state == "closed")
+                if response.status_code >= 500 or response.status_code == 429:
+                    response.raise_for_status()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                breaker.record_failure()
+                resilience.count("failures")
+                attempt += 1
+                if attempt > SCRAPER_MAX_RETRIES or not resilience.budget.withdraw():
+                    raise
+                resilience.count("retries")
+                logger.info(f"Retrying {url} ({self.source_name}) after {e!r}")
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1) * (0.5 + random.random()))
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            
+            # The source answered (a 4xx is the request's fault, not the source's)
+            breaker.record_success()
+            return response
+    
+    async def _send(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        hedge: bool = True
+    ) -> httpx.Response:
+        """One GET, hedged with a second one if it runs past the p95 latency"""
+        resilience = self.resilience
+        
+        async def timed_get() -> httpx.Response:
+            start = time.perf_counter()
+            response = await self.session.get(url, params=params, headers=headers)
+            if response.status_code < 500:
+                resilience.latency.observe(time.perf_counter() - start)
+            return response
+        
+        delay = resilience.latency.hedge_delay() if hedge and SCRAPER_HEDGE else None
+        if delay is None:
+            return await timed_get()
+        
+        first = asyncio.ensure_future(timed_get())
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done or not resilience.budget.withdraw():
+            return await first
+        
+        resilience.count("hedges")
+        pending = {first, asyncio.ensure_future(timed_get())}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            resilience.count("hedges_won")
+                        return task.result()
+                if not pending:
+                    # Both failed; report the first request's error
+                    return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _browser_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]]
+    ) -> httpx.Response:
+        """
+        Load the page in the pooled headless browser
+        
+        Navigation errors are raised as httpx transport errors, so the
+        circuit breaker and retries treat both fetch modes alike. Browser
+        fetches are never hedged: a second navigation costs too much.
+        """
+        from playwright.async_api import Error as BrowserError, TimeoutError as BrowserTimeout
+        
+        request = httpx.Request("GET", url, params=params)
+        default_headers = self._get_headers()
+        try:
+            start = time.perf_counter()
+            page = await get_browser_pool().fetch(
+                self.source_name,
+                str(request.url),
+                timeout=SCRAPER_TIMEOUT,
+                user_agent=default_headers.get("User-Agent"),
+                headers={**default_headers, **(headers or {})}
+            )
+        except BrowserTimeout as e:
+            raise httpx.ReadTimeout(str(e), request=request) from e
+        except BrowserError as e:
+            raise httpx.TransportError(str(e), request=request) from e
+        
+        if page.status < 500:
+            self.resilience.latency.observe(time.perf_counter() - start)
+        return httpx.Response(page.status, text=page.text, request=httpx.Request("GET", page.url))
+    
     def _parse_price(self, price_str: str) -> Optional[float]:
         """Parse price string to float"""
         if not price_str:
@@ -0,0 +1,207 @@
+"""
+Pooled headless-browser fetching for sources behind anti-bot protection
+
+A scraper with ``fetch_mode = "browser"`` (or SCRAPER_<SOURCE>_FETCH_MODE=
+browser) loads pages in Chromium instead of httpx. One browser is
+launched per process and kept warm:
+
+- every source gets up to SCRAPER_BROWSER_CONTEXTS browser contexts, each
+  with one open page; contexts are reused, so cookies and sessions set
+  by the site (including anti-bot challenges already passed) persist
+  across fetches
+- at most SCRAPER_BROWSER_CONCURRENCY navigations run at once per browser;
+  a fetch takes one of these slots only once it has a page of its source,
+  so fetches queued behind a busy source never hold slots other sources
+  could use
+- images, fonts and media (SCRAPER_BROWSER_BLOCK) are aborted before they
+  are requested, so a fetch only loads the document and its scripts
+
+A fetch therefore costs one page navigation, not a browser launch.
+Requires ``playwright`` and ``playwright install chromium``; measure
+with ``python -m benchmarks.browser_fetch``.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_BROWSER_CONTEXTS = int(os.getenv("SCRAPER_BROWSER_CONTEXTS", "2"))
+SCRAPER_BROWSER_CONCURRENCY = int(os.getenv("SCRAPER_BROWSER_CONCURRENCY", "4"))
+SCRAPER_BROWSER_BLOCK = set(os.getenv("SCRAPER_BROWSER_BLOCK", "image,font,media").split(","))
+# "domcontentloaded" is enough for server-rendered listings; "load" or
+# "networkidle" for pages that render results with scripts
+SCRAPER_BROWSER_WAIT_UNTIL = os.getenv("SCRAPER_BROWSER_WAIT_UNTIL", "domcontentloaded")
+
+
+@dataclass
+class BrowserPage:
+    """A warm page and the context (cookies, storage) it belongs to"""
+    context: object
+    page: object
+    fetches: int = 0
+
+
+@dataclass
+class BrowserResponse:
+    status: int
+    text: str
+    url: str
+
+
+class BrowserPool:
+    """One headless Chromium with reusable per-source contexts"""
+
+    def __init__(
+        self,
+        contexts: int = SCRAPER_BROWSER_CONTEXTS,
+        concurrency: int = SCRAPER_BROWSER_CONCURRENCY,
+        block: Set[str] = SCRAPER_BROWSER_BLOCK,
+        headless: bool = True,
+    ):
+        self.contexts = contexts
+        self.block = block
+        self.headless = headless
+        self._slots = asyncio.Semaphore(concurrency)
+        self._idle: Dict[str, asyncio.Queue] = {}
+        self._opened: Dict[str, int] = {}
+        self._pages: List[BrowserPage] = []
+        self._playwright = None
+        self._browser = None
+        self._starting: Optional[asyncio.Lock] = None
+        self.blocked_requests = 0
+
+    async def start(self) -> None:
+        """Launch the browser (once)"""
+        if self._starting is None:
+            self._starting = asyncio.Lock()
+        async with self._starting:
+            if self._browser is not None:
+                return
+            from playwright.async_api import async_playwright
+
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            logger.info("Headless browser started")
+
+    async def close(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+            await self._playwright.stop()
+        self._browser = self._playwright = None
+        self._idle.clear()
+        self._opened.clear()
+        self._pages.clear()
+
+    async def _block_resources(self, route) -> None:
+        if route.request.resource_type in self.block:
+            self.blocked_requests += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _open_page(self, user_agent: Optional[str]) -> BrowserPage:
+        context = await self._browser.new_context(user_agent=user_agent)
+        if self.block:
+            await context.route("**/*", self._block_resources)
+        page = BrowserPage(context, await context.new_page())
+        self._pages.append(page)
+        return page
+
+    async def _acquire(self, source: str, user_agent: Optional[str]) -> BrowserPage:
+        """
+        An idle page of the source
+
+        The queue holds idle pages and ``None`` for each page that may
+        still be opened, up to ``contexts`` per source.
+        """
+        idle = self._idle.setdefault(source, asyncio.Queue())
+        if idle.empty() and self._opened.get(source, 0) < self.contexts:
+            self._opened[source] = self._opened.get(source, 0) + 1
+            idle.put_nowait(None)
+
+        page = await idle.get()
+        if page is None:
+            try:
+                page = await self._open_page(user_agent)
+            except BaseException:
+                idle.put_nowait(None)
+                raise
+        return page
+
+    async def _discard(self, source: str, page: BrowserPage) -> None:
+        """Drop a broken page and its context; the next fetch opens a fresh one"""
+        self._pages.remove(page)
+        self._idle[source].put_nowait(None)
+        try:
+            await page.context.close()
+        except Exception:
+            pass
+
+    async def fetch(
+        self,
+        source: str,
+        url: str,
+        timeout: float,
+        user_agent: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> BrowserResponse:
+        """
+        Navigate a warm page of the source to ``url`` and return the HTML
+
+        Raises:
+            playwright.async_api.Error (TimeoutError on timeout)
+        """
+        await self.start()
+        headers = {k: v for k, v in (headers or {}).items() if k.lower() not in ("user-agent", "accept-encoding")}
+
+        # The source's page first: waiting for it must not hold a slot
+        page = await self._acquire(source, user_agent)
+        try:
+            await self._slots.acquire()
+        except BaseException:
+            self._idle[source].put_nowait(page)
+            raise
+
+        try:
+            await page.page.set_extra_http_headers(headers)
+            response = await page.page.goto(url, wait_until=SCRAPER_BROWSER_WAIT_UNTIL, timeout=timeout * 1000)
+            text = await page.page.content()
+            final_url = page.page.url
+        except BaseException:
+            await self._discard(source, page)
+            raise
+        finally:
+            self._slots.release()
+        page.fetches += 1
+        self._idle[source].put_nowait(page)
+
+        return BrowserResponse(status=response.status if response else 200, text=text, url=final_url)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "contexts": len(self._pages),
+            "fetches": sum(page.fetches for page in self._pages),
+            "blocked_requests": self.blocked_requests,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide browser pool (the browser starts on the first fetch)"""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+async def close_browser_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -6,7 +6,7 @@ import logging
 from typing import List, Optional
 from urllib.parse import quote
 
-from .base import BaseScraper, ScrapedPart, ScrapedPrice
+from .base import FETCH_ERRORS, BaseScraper, ScrapedPart, ScrapedPrice
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +17,12 @@ class ExistScraper(BaseScraper):
     
     Website: https://exist.ru
     Note: Has strong anti-bot protection, consider using official API
+    or the headless browser (SCRAPER_EXIST_FETCH_MODE=browser)
     """
     
+    capabilities = frozenset({"search", "oem", "prices"})
+    requests_per_second = 0.5
+    
     def __init__(self):
         super().__init__("exist", "https://exist.ru")
         # Exist has API but requires authentication
@@ -41,7 +45,11 @@ class ExistScraper(BaseScraper):
             # Parse search results - adjust selectors based on actual site
             result_items = soup.select(".goods-item, .catalog-item, [class*='item']")
             
-            for item in result_items[:limit]:
+            # Broad selectors also match navigation and widgets, so the
+            # limit applies to parsed results, not to matched elements
+            for item in result_items:
+                if len(parts) >= limit:
+                    break
                 try:
                     name_elem = item.select_one("h3, .name, [class*='name']")
                     sku_elem = item.select_one("[class*='article'], .articul, .sku")
@@ -60,6 +68,8 @@ class ExistScraper(BaseScraper):
                     logger.warning(f"Failed to parse Exist result: {e}")
                     continue
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Exist search failed: {e}")
         
@@ -97,10 +107,13 @@ class ExistScraper(BaseScraper):
                         price=price,
                         currency="RUB",
                         availability=availability,
-                        url=part.url
+                        url=part.url,
+                        offer=str(len(prices))
                     )
                     prices.append(scraped_price)
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Exist get_prices failed: {e}")
         
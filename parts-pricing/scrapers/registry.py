@@ -0,0 +1,189 @@
+"""
+Source registry and latency-aware query planner
+
+Every price source is registered here once, with the stable code the
+price index stores for it. What a source can do is declared on its
+scraper class (``capabilities``, ``requests_per_second``,
+``is_configured``); how it has been doing comes from its resilience
+state (circuit, latency percentiles, failures).
+
+``plan_sources`` chooses which sources to query for a request and in what
+order: sources lacking a needed capability, not configured or with an
+open circuit are skipped, the rest are ranked by expected time per
+successful answer, and sources expected to exceed the latency budget
+are dropped (unless none would be left).
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Type
+
+from .autodoc import AutoDocScraper
+from .base import BaseScraper
+from .exist import ExistScraper
+from .resilience import SCRAPER_TIMEOUT, get_resilience
+from .umapi import UmapiScraper
+
+# Latency assumed for a source until PLANNER_MIN_SAMPLES were observed (s)
+SCRAPER_PLANNER_DEFAULT_LATENCY = float(os.getenv("SCRAPER_PLANNER_DEFAULT_LATENCY", "2"))
+PLANNER_MIN_SAMPLES = 5
+# Skip reasons that may clear on their own; a plan with one is partial
+TRANSIENT_SKIPS = ("circuit open", "over budget")
+
+
+@dataclass(frozen=True)
+class SourceInfo:
+    """A registered source; ``scraper`` is None for sources kept only for their records"""
+    name: str
+    code: int
+    scraper: Optional[Type[BaseScraper]] = None
+
+    @property
+    def capabilities(self) -> FrozenSet[str]:
+        return self.scraper.capabilities if self.scraper else frozenset()
+
+    @property
+    def requests_per_second(self) -> Optional[float]:
+        return self.scraper.requests_per_second if self.scraper else None
+
+    def is_configured(self) -> bool:
+        return self.scraper is not None and self.scraper.is_configured()
+
+    def create(self) -> BaseScraper:
+        """A new scraper instance (use it as an async context manager)"""
+        if self.scraper is None:
+            raise ValueError(f"Source {self.name} has no scraper")
+        return self.scraper()
+
+    def expected_latency(self, requests: int = 1) -> float:
+        """
+        Expected seconds for ``requests`` sequential requests: the observed
+        p95 latency (a default until enough samples) each, but no closer
+        together than the source's rate limit allows
+        """
+        latency = get_resilience(self.name).latency
+        per_request = latency.percentile(95) if len(latency) >= PLANNER_MIN_SAMPLES else SCRAPER_PLANNER_DEFAULT_LATENCY
+        per_request = min(per_request, SCRAPER_TIMEOUT)
+        interval = max(per_request, 1 / self.requests_per_second) if self.requests_per_second else per_request
+        return per_request + (requests - 1) * interval
+
+    def success_rate(self) -> float:
+        """Share of requests that succeeded, smoothed towards 1/2 while few were made"""
+        counters = get_resilience(self.name).counters
+        requests = counters.get("requests", 0)
+        return (requests - counters.get("failures", 0) + 1) / (requests + 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "code": self.code,
+            "scraper": self.scraper.__name__ if self.scraper else None,
+            "configured": self.is_configured(),
+            "capabilities": sorted(self.capabilities),
+            "requests_per_second": self.requests_per_second,
+            "expected_ms": round(self.expected_latency() * 1000, 1) if self.scraper else None,
+            "success_rate": round(self.success_rate(), 3),
+            **get_resilience(self.name).snapshot(),
+        }
+
+
+SOURCES: Dict[str, SourceInfo] = {
+    "autodoc": SourceInfo("autodoc", 1, AutoDocScraper),
+    "exist": SourceInfo("exist", 2, ExistScraper),
+    # No scraper any more; its price records are still served
+    "partsreview": SourceInfo("partsreview", 3),
+    "umapi": SourceInfo("umapi", 4, UmapiScraper),
+}
+
+
+def register(name: str, code: int, scraper: Optional[Type[BaseScraper]] = None) -> SourceInfo:
+    """Register a source; codes are persisted in price index snapshots and must never be reused"""
+    if name in SOURCES or code == 0 or code in {info.code for info in SOURCES.values()}:
+        raise ValueError(f"Source {name} (code {code}) is already registered")
+    info = SOURCES[name] = SourceInfo(name, code, scraper)
+    return info
+
+
+def get_source(name: str) -> SourceInfo:
+    """
+    Raises:
+        KeyError: if the source is not registered
+    """
+    return SOURCES[name]
+
+
+def source_names(capability: Optional[str] = None, configured: bool = False) -> List[str]:
+    """Registered sources, optionally only those with a capability and/or configured here"""
+    return [
+        name for name, info in SOURCES.items()
+        if (capability is None or capability in info.capabilities) and (not configured or info.is_configured())
+    ]
+
+
+@dataclass
+class SourcePlan:
+    """Sources to query, fastest expected first, and why the others are not"""
+    sources: List[str] = field(default_factory=list)
+    skipped: Dict[str, str] = field(default_factory=dict)
+    expected_ms: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """No source was left out for a reason that may pass (worth caching)"""
+        return not any(reason in TRANSIENT_SKIPS for reason in self.skipped.values())
+
+
+def plan_sources(
+    needs: Iterable[str] = ("search",),
+    budget: Optional[float] = None,
+    candidates: Optional[Iterable[str]] = None,
+    requests: int = 1,
+) -> SourcePlan:
+    """
+    Choose and order the sources to query
+
+    Args:
+        needs: Capabilities every chosen source must have
+        budget: Latency budget in seconds (None - no limit)
+        candidates: Sources to choose from (default: all with a scraper)
+        requests: Sequential requests the query makes on each source
+    """
+    needs = frozenset(needs)
+    plan = SourcePlan()
+    ranked = []
+
+    if candidates is None:
+        candidates = [name for name, info in SOURCES.items() if info.scraper]
+
+    for name in candidates:
+        info = SOURCES.get(name)
+        if info is None:
+            plan.skipped[name] = "unknown"
+        elif info.scraper is None:
+            plan.skipped[name] = "no scraper"
+        elif not needs <= info.capabilities:
+            plan.skipped[name] = f"lacks {', '.join(sorted(needs - info.capabilities))}"
+        elif not info.is_configured():
+            plan.skipped[name] = "not configured"
+        elif not get_resilience(name).breaker.available():
+            plan.skipped[name] = "circuit open"
+        else:
+            expected = info.expected_latency(requests)
+            plan.expected_ms[name] = round(expected * 1000, 1)
+            ranked.append((expected / info.success_rate(), expected, name))
+
+    ranked.sort()
+    within = [entry for entry in ranked if budget is None or entry[1] <= budget]
+    # Over budget everywhere: the fastest source is still better than nothing
+    if ranked and not within:
+        within = [min(ranked, key=lambda entry: entry[1])]
+
+    plan.sources = [name for _, _, name in within]
+    for _, _, name in ranked:
+        if name not in plan.sources:
+            plan.skipped[name] = "over budget"
+    return plan
+
+
+def registry_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Declared capabilities and observed statistics of every source"""
+    return {name: info.snapshot() for name, info in SOURCES.items()}
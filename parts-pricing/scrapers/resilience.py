@@ -0,0 +1,191 @@
+"""
+Per-source resilience for scraper requests
+
+Scraper instances are short-lived (one per API request), so the state
+below is kept per source name for the whole process:
+
+- CircuitBreaker: after SCRAPER_BREAKER_FAILURES consecutive failures
+  (timeouts, connection errors, 5xx/429) requests to the source fail
+  immediately for SCRAPER_BREAKER_COOLDOWN seconds; then one probe
+  request is let through (half-open) and its outcome closes or reopens
+  the circuit
+- LatencyTracker: recent successful request latencies; a GET still
+  running after their p95 gets a second, hedged request, and whichever
+  answers first wins
+- RetryBudget: retries and hedges may add at most SCRAPER_RETRY_BUDGET
+  (a share) of extra requests on top of the regular ones, so a failing
+  source is never hammered with retries
+"""
+
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_TIMEOUT = float(os.getenv("SCRAPER_TIMEOUT", "10"))
+SCRAPER_MAX_RETRIES = int(os.getenv("SCRAPER_MAX_RETRIES", "2"))
+SCRAPER_BREAKER_FAILURES = int(os.getenv("SCRAPER_BREAKER_FAILURES", "5"))
+SCRAPER_BREAKER_COOLDOWN = float(os.getenv("SCRAPER_BREAKER_COOLDOWN", "30"))
+# Extra requests (retries and hedges) as a share of regular requests
+SCRAPER_RETRY_BUDGET = float(os.getenv("SCRAPER_RETRY_BUDGET", "0.2"))
+SCRAPER_HEDGE = os.getenv("SCRAPER_HEDGE", "true").lower() in ("1", "true", "yes")
+# Latencies needed before hedging starts, and the shortest hedge delay (s)
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request to a source whose circuit is open"""
+
+    def __init__(self, source: str, retry_in: float):
+        super().__init__(f"Circuit open for {source}, retry in {retry_in:.0f} s")
+        self.source = source
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures -> half-open probe -> closed"""
+
+    def __init__(self, source: str, failures: int = SCRAPER_BREAKER_FAILURES, cooldown: float = SCRAPER_BREAKER_COOLDOWN):
+        self.source = source
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state only one probe is"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = "half_open"
+            logger.info(f"Circuit for {self.source} half-open, probing")
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def available(self) -> bool:
+        """Whether ``allow`` would let a request through, without taking the probe"""
+        if self.state == "open":
+            return self.retry_in() == 0
+        return self.state == "closed" or not self._probing
+
+    def retry_in(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info(f"Circuit for {self.source} closed")
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit for {self.source} open after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a probe that ended without an outcome (e.g. cancelled)"""
+        self._probing = False
+
+
+class LatencyTracker:
+    """Recent successful request latencies (seconds) of a source"""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """When to send a hedged request: the p95 latency, once known"""
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.percentile(95))
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries and hedges to a share of requests
+
+    Every request deposits ``ratio`` tokens (up to ``capacity``); every
+    extra request withdraws one.
+    """
+
+    def __init__(self, ratio: float = SCRAPER_RETRY_BUDGET, capacity: float = 10.0):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def deposit(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class SourceResilience:
+    """Breaker, latency statistics and retry budget of one source"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.breaker = CircuitBreaker(source)
+        self.latency = LatencyTracker()
+        self.budget = RetryBudget()
+        self.counters: Dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.latency.percentile(50), self.latency.percentile(95)
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "retry_tokens": round(self.budget.tokens, 2),
+            **self.counters,
+        }
+
+
+_sources: Dict[str, SourceResilience] = {}
+
+
+def get_resilience(source: str) -> SourceResilience:
+    """Process-wide resilience state of a source"""
+    state = _sources.get(source)
+    if state is None:
+        state = _sources[source] = SourceResilience(source)
+    return state
+
+
+def resilience_snapshot() -> Dict[str, Dict[str, Any]]:
+    """State of every source used so far"""
+    return {source: state.snapshot() for source, state in _sources.items()}
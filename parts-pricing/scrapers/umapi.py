@@ -7,7 +7,7 @@ import logging
 import os
 from typing import List, Optional
 
-from .base import BaseScraper, ScrapedPart, ScrapedPrice
+from .base import FETCH_ERRORS, BaseScraper, ScrapedPart, ScrapedPrice
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +20,17 @@ class UmapiScraper(BaseScraper):
     API: Has official API available
     """
     
+    capabilities = frozenset({"search", "oem", "prices", "brand_article", "json_api"})
+    requests_per_second = 5.0
+    
+    @classmethod
+    def is_configured(cls) -> bool:
+        return bool(os.getenv("UMAPI_API_KEY"))
+    
     def __init__(self, api_key: str = None):
         super().__init__("umapi", "https://api.umapi.ru")
         self.api_key = api_key or os.getenv("UMAPI_API_KEY")
-        self.api_base = "https://api.umapi.ru/v1"
+        self.api_base = f"{self.base_url}/v1"
     
     async def search(self, query: str, limit: int = 10) -> List[ScrapedPart]:
         """
@@ -55,7 +62,9 @@ class UmapiScraper(BaseScraper):
             # Expected response format from UMAPI
             result_items = soup.select(".product, .item, [data-type='product']")
             
-            for item in result_items[:limit]:
+            for item in result_items:
+                if len(parts) >= limit:
+                    break
                 try:
                     name_elem = item.select_one(".name, .title, [class*='name']")
                     sku_elem = item.select_one(".sku, .article, [class*='sku']")
@@ -74,6 +83,8 @@ class UmapiScraper(BaseScraper):
                     logger.warning(f"Failed to parse UMAPI result: {e}")
                     continue
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"UMAPI search failed: {e}")
         
@@ -122,6 +133,8 @@ class UmapiScraper(BaseScraper):
                         )
                         prices.append(scraped_price)
                         
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"UMAPI get_prices failed: {e}")
         
@@ -182,6 +195,8 @@ class UmapiScraper(BaseScraper):
                         url=None
                     )
                     
+        except FETCH_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"UMAPI get_price_by_brand_article failed: {e}")
         
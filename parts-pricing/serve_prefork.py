@@ -0,0 +1,300 @@
+"""
+Preforked serving: the damage model is loaded once and shared by all workers
+
+``uvicorn --workers N`` starts N fresh interpreters and every one loads
+its own DETR copy. Here the master process imports the app and loads the
+detector (``hf_damage_detector.get_detector()``), freezes the garbage
+collector so it never writes to the long-lived objects, and only then
+forks the workers. The weights stay in pages shared copy-on-write: each
+extra worker costs its private memory (interpreter, buffers, activations),
+not another model.
+
+Workers accept connections on one listening socket opened by the
+master, run inference in a thread executor (DAMAGE_EXECUTOR=thread; a
+process pool would load the model again) and use cores / workers torch
+threads each, so they don't oversubscribe the CPU. The master restarts
+workers that die and periodically logs RSS, PSS and USS per worker.
+Workers that die soon after starting are restarted with exponential
+backoff; after --max-restarts such failures in a row the master stops
+the others and exits with status 1 instead of fork-looping.
+
+The master must not run inference before forking: torch's thread pools
+are not fork-safe once started.
+
+Usage:
+    python serve_prefork.py --app damage_service:app --workers 4 --port 8001
+    python serve_prefork.py --app main:app --workers 2 --port 8000
+
+Measure memory and throughput with ``python -m benchmarks.prefork``.
+"""
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("serve_prefork")
+
+# A worker that exits sooner than this after starting failed rapidly
+RAPID_FAILURE_SECONDS = float(os.getenv("PREFORK_RAPID_FAILURE_SECONDS", "30"))
+# Delay before restarting after the first rapid failure, doubled after each
+RESTART_BACKOFF_SECONDS = float(os.getenv("PREFORK_RESTART_BACKOFF_SECONDS", "1"))
+RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("PREFORK_RESTART_BACKOFF_MAX_SECONDS", "60"))
+# Rapid failures in a row of one worker after which the master gives up
+MAX_RAPID_FAILURES = int(os.getenv("PREFORK_MAX_RAPID_FAILURES", "5"))
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def memory_usage(pid: int) -> Optional[Dict[str, float]]:
+    """
+    Memory of a process in MB from /proc (Linux)
+
+    - rss: resident pages, shared ones counted in full
+    - pss: shared pages divided among the processes sharing them
+    - uss: pages private to this process
+
+    Returns None if the process is gone or /proc is unavailable.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0.0),
+        "pss": fields.get("Pss", 0.0),
+        "uss": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def load_app(target: str):
+    """Import ``module:attribute``"""
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+def set_torch_threads(threads: int) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def preload_detector(threads: int) -> None:
+    """Load the damage model in the master, before any worker exists"""
+    from hf_damage_detector import get_detector
+
+    set_torch_threads(threads)
+    get_detector().load_model(threads)
+
+
+class PreforkServer:
+    """Forks uvicorn workers sharing one socket and, optionally, one model"""
+
+    def __init__(
+        self,
+        app,
+        sock: socket.socket,
+        workers: int,
+        threads: int,
+        preload: bool,
+        log_level: str = "info",
+        max_rapid_failures: int = MAX_RAPID_FAILURES,
+    ):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.preload = preload
+        self.log_level = log_level
+        self.max_rapid_failures = max_rapid_failures
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started: Dict[int, float] = {}  # worker index -> monotonic start time
+        self.failures: Dict[int, int] = {}  # worker index -> rapid failures in a row
+        self.restarts: Dict[int, float] = {}  # worker index -> monotonic time to restart at
+        self.exit_code = 0
+        self._stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            self.started[index] = time.monotonic()
+            return
+
+        # Worker
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self.run_worker()
+            code = 0
+        except BaseException:
+            logger.exception("Worker %d failed", index)
+            code = 1
+        os._exit(code)
+
+    def run_worker(self) -> None:
+        import uvicorn
+
+        if self.preload:
+            # The fork keeps the master's setting; set it explicitly anyway
+            set_torch_threads(self.threads)
+        else:
+            # One private model per worker, as with uvicorn --workers
+            preload_detector(self.threads)
+
+        config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def schedule_restart(self, index: int, now: float) -> Optional[float]:
+        """
+        Restart delay for the worker ``index`` that exited at ``now``
+
+        Returns None (and stops the server) once the worker failed rapidly
+        more than ``max_rapid_failures`` times in a row.
+        """
+        if now - self.started.get(index, now) < RAPID_FAILURE_SECONDS:
+            self.failures[index] = self.failures.get(index, 0) + 1
+        else:
+            self.failures[index] = 0
+
+        failures = self.failures[index]
+        if failures > self.max_rapid_failures:
+            logger.error("Worker %d failed %d times in a row within %.0f s of starting, giving up",
+                         index, failures, RAPID_FAILURE_SECONDS)
+            self.exit_code = 1
+            self.stop()
+            return None
+
+        delay = min(RESTART_BACKOFF_SECONDS * 2 ** (failures - 1), RESTART_BACKOFF_MAX_SECONDS) if failures else 0.0
+        self.restarts[index] = now + delay
+        return delay
+
+    def stop(self, *_args) -> None:
+        self._stopping = True
+        self.restarts.clear()
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def log_memory(self) -> None:
+        master = memory_usage(os.getpid())
+        if master is None:
+            return
+        total_pss = master["pss"]
+        lines = [f"master {os.getpid()}: rss {master['rss']:.0f} MB, pss {master['pss']:.0f} MB, uss {master['uss']:.0f} MB"]
+        for pid, index in sorted(self.children.items(), key=lambda item: item[1]):
+            usage = memory_usage(pid)
+            if usage is None:
+                continue
+            total_pss += usage["pss"]
+            lines.append(f"worker {index} ({pid}): rss {usage['rss']:.0f} MB, "
+                         f"pss {usage['pss']:.0f} MB, uss {usage['uss']:.0f} MB")
+        logger.info("Memory, %.0f MB PSS in total\n  %s", total_pss, "\n  ".join(lines))
+
+    def run(self, memory_interval: float = 60.0) -> int:
+        """Serve until stopped; returns the exit status for the master"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for index in range(self.workers):
+            self.spawn(index)
+        logger.info("Started %d workers with %d torch threads each", self.workers, self.threads)
+
+        next_report = time.monotonic() + min(memory_interval, 10.0) if memory_interval else None
+        while self.children or self.restarts:
+            now = time.monotonic()
+            for index, due in list(self.restarts.items()):
+                if due <= now:
+                    del self.restarts[index]
+                    self.spawn(index)
+
+            pid = 0
+            if self.children:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    break
+            if pid:
+                index = self.children.pop(pid)
+                if not self._stopping:
+                    delay = self.schedule_restart(index, time.monotonic())
+                    if delay is not None:
+                        logger.warning("Worker %d (%d) exited with status %d, restarting in %.1f s",
+                                       index, pid, status, delay)
+                continue
+
+            if next_report is not None and time.monotonic() >= next_report:
+                self.log_memory()
+                next_report = time.monotonic() + memory_interval
+            time.sleep(0.2)
+        return self.exit_code
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="damage_service:app", help="ASGI app as module:attribute")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=max(1, available_cores() // 2))
+    parser.add_argument("--threads", type=int, default=0, help="torch threads per worker (default cores / workers)")
+    parser.add_argument("--no-preload", action="store_true", help="Load the model in every worker instead")
+    parser.add_argument("--memory-interval", type=float, default=60.0, help="Seconds between memory reports, 0 to disable")
+    parser.add_argument("--max-restarts", type=int, default=MAX_RAPID_FAILURES,
+                        help="Rapid failures in a row of a worker before the master gives up")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    threads = args.threads or max(1, available_cores() // args.workers)
+    # Before torch or the inference module are imported
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    if os.environ.get("DAMAGE_EXECUTOR", "thread") != "thread":
+        logger.warning("DAMAGE_EXECUTOR=%s ignored: preforked workers run inference in threads",
+                       os.environ["DAMAGE_EXECUTOR"])
+    os.environ["DAMAGE_EXECUTOR"] = "thread"
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    app = load_app(args.app)
+
+    if not args.no_preload:
+        start = time.perf_counter()
+        preload_detector(threads)
+        logger.info("Model loaded in the master in %.1f s", time.perf_counter() - start)
+
+    sock = socket.create_server((args.host, args.port), backlog=2048)
+    sock.set_inheritable(True)
+
+    # Everything allocated so far lives as long as the workers; keep the
+    # collector from touching (and so un-sharing) those pages
+    gc.collect()
+    gc.freeze()
+
+    server = PreforkServer(
+        app, sock, args.workers, threads,
+        preload=not args.no_preload, log_level=args.log_level, max_rapid_failures=args.max_restarts,
+    )
+    code = server.run(memory_interval=args.memory_interval)
+    sock.close()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
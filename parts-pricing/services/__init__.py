@@ -3,7 +3,8 @@ Services package initialization
 """
 
 from .cache import get_redis, init_redis, close_redis, cache_get, cache_set
-from .price_aggregator import PriceAggregator
+from .price_aggregator import PriceAggregator, PriceStats
+from .part_index import PartIndex, part_index
 
 __all__ = [
     "get_redis",
@@ -11,5 +12,8 @@ __all__ = [
     "close_redis",
     "cache_get",
     "cache_set",
-    "PriceAggregator"
+    "PriceAggregator",
+    "PriceStats",
+    "PartIndex",
+    "part_index"
 ]
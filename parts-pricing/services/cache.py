@@ -17,6 +17,7 @@ redis_client: Optional[redis.Redis] = None
 CACHE_TTL_PRICES = 6 * 60 * 60  # 6 hours
 CACHE_TTL_SEARCH = 30 * 60  # 30 minutes
 CACHE_TTL_AVAILABILITY = 60 * 60  # 1 hour
+CACHE_TTL_DAMAGE = 7 * 24 * 60 * 60  # 7 days
 
 
 def get_redis() -> redis.Redis:
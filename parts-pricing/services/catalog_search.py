@@ -0,0 +1,238 @@
+"""
+Local full-text search over the parts catalog
+
+SQLite uses an FTS5 table kept in sync with ``parts`` by triggers;
+PostgreSQL uses a GIN-indexed ``tsvector`` with the built-in ``russian``
+configuration. FTS5 has no Russian stemmer, so query words are stemmed
+in Python and matched as prefixes ("фильтра" -> "фильтр*").
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from models import Part, engine, async_session
+from services.part_index import part_index
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of fresh local hits that makes a live scrape unnecessary
+LOCAL_SEARCH_MIN_RESULTS = int(os.getenv("LOCAL_SEARCH_MIN_RESULTS", "3"))
+# Local hits without a price newer than this are considered stale
+LOCAL_SEARCH_MAX_AGE_HOURS = int(os.getenv("LOCAL_SEARCH_MAX_AGE_HOURS", "24"))
+
+_SQLITE_SETUP = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+        name, brand, sku, oem_number,
+        content='parts', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS parts_fts_ai AFTER INSERT ON parts BEGIN
+        INSERT INTO parts_fts(rowid, name, brand, sku, oem_number)
+        VALUES (new.id, new.name, new.brand, new.sku, new.oem_number);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS parts_fts_ad AFTER DELETE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, name, brand, sku, oem_number)
+        VALUES ('delete', old.id, old.name, old.brand, old.sku, old.oem_number);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS parts_fts_au AFTER UPDATE ON parts BEGIN
+        INSERT INTO parts_fts(parts_fts, rowid, name, brand, sku, oem_number)
+        VALUES ('delete', old.id, old.name, old.brand, old.sku, old.oem_number);
+        INSERT INTO parts_fts(rowid, name, brand, sku, oem_number)
+        VALUES (new.id, new.name, new.brand, new.sku, new.oem_number);
+    END
+    """,
+]
+
+_SQLITE_QUERY = """
+    WITH hits AS (
+        SELECT rowid AS id, bm25(parts_fts) AS rank
+        FROM parts_fts
+        WHERE parts_fts MATCH :query
+        ORDER BY rank
+        LIMIT :limit
+    )
+    SELECT p.id, p.name, p.sku, p.brand, p.oem_number,
+           COALESCE(
+               (SELECT MAX(s.last_seen_at) FROM offer_states s WHERE s.part_id = p.id),
+               (SELECT MAX(r.scraped_at) FROM price_records r WHERE r.part_id = p.id)
+           ) AS last_price_at
+    FROM hits JOIN parts p ON p.id = hits.id
+    ORDER BY hits.rank
+"""
+
+_PG_DOCUMENT = (
+    "to_tsvector('russian', coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' "
+    "|| coalesce(sku, '') || ' ' || coalesce(oem_number, ''))"
+)
+
+_PG_SETUP = [
+    f"CREATE INDEX IF NOT EXISTS parts_search_idx ON parts USING GIN ({_PG_DOCUMENT})",
+]
+
+_PG_QUERY = f"""
+    WITH hits AS (
+        SELECT id, ts_rank({_PG_DOCUMENT}, q) AS rank
+        FROM parts, websearch_to_tsquery('russian', :query) q
+        WHERE {_PG_DOCUMENT} @@ q
+        ORDER BY rank DESC
+        LIMIT :limit
+    )
+    SELECT p.id, p.name, p.sku, p.brand, p.oem_number,
+           COALESCE(
+               (SELECT MAX(s.last_seen_at) FROM offer_states s WHERE s.part_id = p.id),
+               (SELECT MAX(r.scraped_at) FROM price_records r WHERE r.part_id = p.id)
+           ) AS last_price_at
+    FROM hits JOIN parts p ON p.id = hits.id
+    ORDER BY hits.rank DESC
+"""
+
+# Russian inflectional endings, longest first ("ок"/"ек" cover the
+# fleeting vowel of genitive plurals: "колодок" -> "колод")
+_RU_ENDINGS = sorted([
+    "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ых", "их",
+    "ах", "ях", "ов", "ев", "ей", "ий", "ый", "ой", "ая", "яя", "ое", "ее",
+    "ые", "ие", "ом", "ем", "ам", "ям", "ую", "юю", "ок", "ек",
+    "а", "я", "ы", "и", "о", "е", "у", "ю", "ь", "й",
+], key=len, reverse=True)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC = re.compile(r"[а-яё]")
+
+
+@dataclass
+class CatalogHit:
+    """Catalog part matched by local search"""
+    part_id: int
+    name: str
+    sku: Optional[str] = None
+    brand: Optional[str] = None
+    oem_number: Optional[str] = None
+    last_price_at: Optional[datetime] = None
+
+    def is_fresh(self, max_age_hours: int = LOCAL_SEARCH_MAX_AGE_HOURS) -> bool:
+        """Whether the part has a price recent enough to skip live sources"""
+        if self.last_price_at is None:
+            return False
+        return self.last_price_at >= datetime.utcnow() - timedelta(hours=max_age_hours)
+
+
+def stem_russian(word: str) -> str:
+    """Strip a Russian inflectional ending, keeping at least 3 letters of stem"""
+    if not _CYRILLIC.search(word) or len(word) <= 4:
+        return word
+    for ending in _RU_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def build_fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query of quoted prefix terms"""
+    terms = [stem_russian(word) for word in _WORD.findall(query.lower())]
+    return " ".join(f'"{term}"*' for term in terms if term)
+
+
+async def init_catalog_search() -> None:
+    """Create the full-text index for the current database dialect"""
+    dialect = engine.dialect.name
+
+    async with engine.begin() as conn:
+        if dialect == "sqlite":
+            exists = await conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'parts_fts'"
+            )
+            created = exists.first() is None
+            for statement in _SQLITE_SETUP:
+                await conn.exec_driver_sql(statement)
+            if created:
+                await conn.exec_driver_sql("INSERT INTO parts_fts(parts_fts) VALUES ('rebuild')")
+        elif dialect == "postgresql":
+            for statement in _PG_SETUP:
+                await conn.exec_driver_sql(statement)
+        else:
+            logger.warning(f"Full-text catalog search is not supported on {dialect}")
+
+
+def _to_datetime(value) -> Optional[datetime]:
+    """Raw SQLite rows return timestamps as strings"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+async def search_catalog(query: str, limit: int = 10) -> List[CatalogHit]:
+    """
+    Search the local catalog
+
+    An exact SKU/OEM match through the cross-reference index comes first,
+    followed by full-text hits ranked by relevance.
+    """
+    hits: List[CatalogHit] = []
+    article = query.split(":", 1)[1] if query.upper().startswith("OEM:") else query
+
+    async with async_session() as session:
+        exact_id = part_index.lookup(article) if any(c.isdigit() for c in article) else None
+        if exact_id is not None:
+            part = await session.get(Part, exact_id)
+            if part:
+                last_price_at = await session.scalar(
+                    text(
+                        "SELECT COALESCE("
+                        "(SELECT MAX(last_seen_at) FROM offer_states WHERE part_id = :id), "
+                        "(SELECT MAX(scraped_at) FROM price_records WHERE part_id = :id))"
+                    ),
+                    {"id": part.id}
+                )
+                hits.append(CatalogHit(
+                    part_id=part.id,
+                    name=part.name,
+                    sku=part.sku,
+                    brand=part.brand,
+                    oem_number=part.oem_number,
+                    last_price_at=_to_datetime(last_price_at)
+                ))
+
+        dialect = engine.dialect.name
+        if dialect == "sqlite":
+            statement, params = _SQLITE_QUERY, {"query": build_fts_query(article), "limit": limit}
+        elif dialect == "postgresql":
+            statement, params = _PG_QUERY, {"query": article, "limit": limit}
+        else:
+            return hits
+
+        if not params["query"]:
+            return hits
+
+        try:
+            rows = await session.execute(text(statement), params)
+        except Exception as e:
+            logger.error(f"Catalog search failed: {e}")
+            return hits
+
+        seen = {hit.part_id for hit in hits}
+        for row in rows:
+            if row.id in seen:
+                continue
+            hits.append(CatalogHit(
+                part_id=row.id,
+                name=row.name,
+                sku=row.sku,
+                brand=row.brand,
+                oem_number=row.oem_number,
+                last_price_at=_to_datetime(row.last_price_at)
+            ))
+
+    return hits[:limit]
@@ -0,0 +1,110 @@
+"""
+Result cache for damage detection, keyed by image content
+
+The same photo is often analyzed repeatedly (client retries, the same
+image sent to /detect and /detect-base64, the frontend re-running its
+analysis). Results are cached in Redis under the SHA-256 of the raw
+image bytes plus the detector version, so a backend or model change
+never serves stale detections.
+
+With DAMAGE_CACHE_PERCEPTUAL enabled, a difference hash (dHash) of a
+small grayscale thumbnail is stored as well, so a re-encoded copy of a
+photo with the same dimensions also hits the cache. Boxes are in pixel
+coordinates, which is why the dimensions are part of that key.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from damage_backends import DAMAGE_BACKEND, MODEL_NAME
+from damage_cascade import DAMAGE_CASCADE, DAMAGE_CASCADE_CROP, DAMAGE_CASCADE_THRESHOLD
+from damage_roi import DAMAGE_ROI, DAMAGE_ROI_RESOLUTION
+from hf_damage_detector import BufferReader
+from .cache import CACHE_TTL_DAMAGE, cache_get, cache_set
+
+logger = logging.getLogger(__name__)
+
+DAMAGE_CACHE_ENABLED = os.getenv("DAMAGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+DAMAGE_CACHE_PERCEPTUAL = os.getenv("DAMAGE_CACHE_PERCEPTUAL", "false").lower() in ("1", "true", "yes")
+
+# Bump when the analysis itself (thresholds, post-processing) changes
+ANALYSIS_VERSION = 1
+
+DETECTOR_VERSION = f"{MODEL_NAME.replace('/', '_')}:{DAMAGE_BACKEND}:v{ANALYSIS_VERSION}"
+if DAMAGE_CASCADE:
+    DETECTOR_VERSION += f":cascade{DAMAGE_CASCADE_THRESHOLD}{'-crop' if DAMAGE_CASCADE_CROP else ''}"
+if DAMAGE_ROI:
+    DETECTOR_VERSION += f":roi{DAMAGE_ROI_RESOLUTION}"
+
+_DHASH_SIZE = 8
+
+
+def content_key(image_data: bytes) -> str:
+    """Cache key for the exact image bytes"""
+    return f"damage:{DETECTOR_VERSION}:sha256:{hashlib.sha256(image_data).hexdigest()}"
+
+
+def perceptual_key(image_data: bytes) -> Optional[str]:
+    """Cache key for the image dimensions and dHash, None if it can't be decoded"""
+    try:
+        image = Image.open(BufferReader(image_data))
+        width, height = image.size
+        # Decoding at 1/8 scale is plenty for a 9x8 thumbnail
+        image.draft("L", (width // 8, height // 8))
+        pixels = np.asarray(
+            image.convert("L").resize((_DHASH_SIZE + 1, _DHASH_SIZE), Image.Resampling.BILINEAR),
+            dtype=np.int16,
+        )
+    except Exception as e:
+        logger.debug(f"Perceptual hash failed: {e}")
+        return None
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    dhash = int("".join("1" if bit else "0" for bit in bits), 2)
+    return f"damage:{DETECTOR_VERSION}:dhash:{width}x{height}:{dhash:016x}"
+
+
+def _cache_keys(image_data: bytes) -> List[str]:
+    keys = [content_key(image_data)]
+    if DAMAGE_CACHE_PERCEPTUAL:
+        key = perceptual_key(image_data)
+        if key:
+            keys.append(key)
+    return keys
+
+
+async def cache_keys(image_data: bytes) -> List[str]:
+    """
+    Cache keys of an image, exact content first (none if caching is off)
+
+    Computed in a worker thread, since the perceptual key decodes the
+    image; compute them once per request and pass them to both
+    ``get_cached_result`` and ``cache_result``.
+    """
+    if not DAMAGE_CACHE_ENABLED:
+        return []
+    return await asyncio.to_thread(_cache_keys, image_data)
+
+
+async def get_cached_result(keys: List[str]) -> Optional[Dict[str, Any]]:
+    """Cached analysis of an image (or a near-duplicate) with these keys, if any"""
+    for key in keys:
+        result = await cache_get(key)
+        if result is not None:
+            return result
+    return None
+
+
+async def cache_result(keys: List[str], result: Dict[str, Any]) -> None:
+    """Store a successful analysis under all keys of its image"""
+    if not result.get("success"):
+        return
+
+    for key in keys:
+        await cache_set(key, result, CACHE_TTL_DAMAGE)
@@ -0,0 +1,261 @@
+"""
+Damage detection scheduling: micro-batching and a dedicated worker pool
+
+Concurrent requests are collected for up to DAMAGE_BATCH_MAX_WAIT_MS
+milliseconds (or until DAMAGE_BATCH_MAX_SIZE images are waiting) and
+analyzed with one batched DETR forward pass; every caller gets back
+its own result.
+
+Batches run in a dedicated executor (a process pool by default, see
+DAMAGE_EXECUTOR) so CPU-bound inference never blocks the event loop
+serving the price and search routes. At most DAMAGE_QUEUE_MAX images
+may be queued or in flight; beyond that ``submit`` fails fast with
+``InferenceQueueFull``.
+
+Images that belong together (``submit_group``, e.g. all photos of one
+car) skip the batching window and are analyzed as one batch.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .metrics import SIZE_BUCKETS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Damage pipeline metrics, served by GET /api/damage/metrics
+damage_metrics = MetricsRegistry()
+
+# Per-image and per-batch stages reported by the detector (ms)
+IMAGE_STAGES = ("decode_ms", "region_analysis_ms")
+BATCH_STAGES = ("prefilter_ms", "preprocess_ms", "forward_ms", "postprocess_ms")
+
+DAMAGE_BATCH_MAX_SIZE = int(os.getenv("DAMAGE_BATCH_MAX_SIZE", "8"))
+DAMAGE_BATCH_MAX_WAIT_MS = float(os.getenv("DAMAGE_BATCH_MAX_WAIT_MS", "5"))
+
+# "process" - model lives in worker processes, "thread" - in this process
+DAMAGE_EXECUTOR = os.getenv("DAMAGE_EXECUTOR", "process")
+DAMAGE_WORKERS = int(os.getenv("DAMAGE_WORKERS", "1"))
+# Images queued or in flight before new requests are rejected
+DAMAGE_QUEUE_MAX = int(os.getenv("DAMAGE_QUEUE_MAX", "32"))
+# Retry-After hint (seconds) sent with rejected requests
+DAMAGE_RETRY_AFTER = int(os.getenv("DAMAGE_RETRY_AFTER", "2"))
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue is at capacity"""
+
+    def __init__(self, retry_after: int = DAMAGE_RETRY_AFTER):
+        super().__init__("Damage detection queue is full")
+        self.retry_after = retry_after
+
+
+def create_executor(kind: str = DAMAGE_EXECUTOR, workers: int = DAMAGE_WORKERS) -> Executor:
+    """Create the executor that runs inference batches"""
+    from hf_damage_detector import init_worker
+
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="damage")
+
+    # spawn: forking a process that already started torch threads can deadlock
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+    )
+
+
+class InferenceBatcher:
+    """Groups concurrent analysis requests into batches for the worker pool"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[bytes]], List[Dict[str, Any]]],
+        executor: Optional[Executor] = None,
+        workers: int = DAMAGE_WORKERS,
+        max_batch_size: int = DAMAGE_BATCH_MAX_SIZE,
+        max_wait_ms: float = DAMAGE_BATCH_MAX_WAIT_MS,
+        max_pending: int = DAMAGE_QUEUE_MAX,
+        metrics: MetricsRegistry = damage_metrics,
+    ):
+        self.run_batch = run_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self._pending = 0
+        # (image or group of images, caller future, submit time, is group)
+        self._queue: "asyncio.Queue[Tuple[Any, asyncio.Future, float, bool]]" = asyncio.Queue()
+        self._held: Optional[Tuple[Any, asyncio.Future, float, bool]] = None
+        self._slots = asyncio.Semaphore(workers)
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatching: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Images queued or being analyzed"""
+        return self._pending
+
+    def submit(self, image_data: bytes) -> "asyncio.Future[Dict[str, Any]]":
+        """
+        Queue an image; the returned future resolves to its analysis result
+
+        Cancelling the future drops the image if its batch has not been
+        dispatched yet; a running forward pass is not interrupted.
+
+        Raises:
+            InferenceQueueFull: if DAMAGE_QUEUE_MAX images are already pending
+        """
+        return self._enqueue(image_data, 1, group=False)
+
+    def submit_group(self, images_data: List[bytes]) -> "asyncio.Future[List[Dict[str, Any]]]":
+        """
+        Queue images that belong together (e.g. photos of one car)
+
+        They are analyzed as their own batch in a single forward pass,
+        regardless of DAMAGE_BATCH_MAX_SIZE, and count against the queue
+        bound like as many single images. The future resolves to the
+        list of their results.
+
+        Raises:
+            InferenceQueueFull: if the images don't fit in the queue
+        """
+        return self._enqueue(images_data, len(images_data), group=True)
+
+    def _enqueue(self, payload: Any, count: int, group: bool) -> asyncio.Future:
+        if self._pending + count > self.max_pending:
+            raise InferenceQueueFull()
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending += count
+        future.add_done_callback(functools.partial(self._release, count=count))
+        self._queue.put_nowait((payload, future, time.perf_counter(), group))
+        return future
+
+    def _release(self, _future: asyncio.Future, count: int = 1) -> None:
+        self._pending -= count
+
+    async def _collect(self) -> Tuple[List[Tuple[Any, asyncio.Future, float, bool]], bool]:
+        """
+        Wait for the first request, then gather more until the batch is full or the window closes
+
+        Returns:
+            (batch, whether it is a single group of images)
+        """
+        loop = asyncio.get_running_loop()
+        if self._held is not None:
+            first, self._held = self._held, None
+        else:
+            first = await self._queue.get()
+
+        batch = [first]
+        group = first[3]
+        deadline = loop.time() + self.max_wait
+
+        while not group and len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item[3]:
+                # Groups are batches of their own - it goes next
+                self._held = item
+                break
+            batch.append(item)
+
+        # Callers that gave up while waiting don't need a forward pass
+        return [item for item in batch if not item[1].cancelled()], group
+
+    async def _run(self) -> None:
+        """Batching loop - collects the next batch as soon as a worker is free"""
+        while True:
+            await self._slots.acquire()
+            batch, group = await self._collect()
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._dispatch(batch, group))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Any, asyncio.Future, float, bool]], group: bool = False) -> None:
+        """Run one batch (or one group of images) in the executor and resolve its callers"""
+        loop = asyncio.get_running_loop()
+        images_data = batch[0][0] if group else [item[0] for item in batch]
+        start = time.perf_counter()
+        queue_waits = [(start - item[2]) * 1000 for item in batch]
+
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, images_data)
+        except Exception as e:
+            logger.error(f"Damage batch of {len(images_data)} failed: {e}")
+            self.metrics.inc("batches_failed")
+            for item in batch:
+                if not item[1].done():
+                    item[1].set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        if group:
+            queue_waits = queue_waits * len(results)
+        self._record(results, queue_waits, (time.perf_counter() - start) * 1000)
+
+        if group:
+            results = [results]
+        for item, result in zip(batch, results):
+            if not item[1].done():
+                item[1].set_result(result)
+
+    def _record(self, results: List[Dict[str, Any]], queue_waits: List[float], executor_ms: float) -> None:
+        """Record batch metrics and add the queue wait to each result's timings"""
+        metrics = self.metrics
+        metrics.inc("batches")
+        metrics.inc("images", len(results))
+        metrics.observe("batch_size", len(results), SIZE_BUCKETS)
+        metrics.observe("executor_ms", executor_ms)
+
+        all_timings = []
+        for result, queue_wait in zip(results, queue_waits):
+            metrics.observe("queue_wait_ms", queue_wait)
+            if not result.get("success"):
+                metrics.inc("images_failed")
+            if result.get("cascade", {}).get("skipped"):
+                metrics.inc("images_skipped_by_cascade")
+            timings = result.get("timings")
+            if timings is None:
+                continue
+            timings["queue_wait_ms"] = queue_wait
+            for stage in IMAGE_STAGES:
+                if stage in timings:
+                    metrics.observe(stage, timings[stage])
+            all_timings.append(timings)
+
+        # Batch stages are repeated in every result, record them once
+        for stage in BATCH_STAGES:
+            value = next((timings[stage] for timings in all_timings if stage in timings), None)
+            if value is not None:
+                metrics.observe(stage, value)
+        load_ms = next((timings["model_load_ms"] for timings in all_timings if "model_load_ms" in timings), None)
+        if load_ms is not None:
+            metrics.set("model_load_ms", load_ms)
+
+    def shutdown(self) -> None:
+        """Stop the batching loop and the worker pool"""
+        if self._worker is not None:
+            self._worker.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
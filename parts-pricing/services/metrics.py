@@ -0,0 +1,130 @@
+"""
+In-process metrics: counters, rates and bucketed histograms
+
+Lightweight enough to update on every request; ``snapshot()`` returns a
+JSON-serializable view for the metrics endpoints.
+"""
+
+import bisect
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+# Milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, max and estimated percentiles"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "mean": round(self.sum / self.count, 3) if self.count else None,
+            "max": round(self.max, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class Rate:
+    """
+    Events per second over a sliding window
+
+    Counted in a fixed ring of ``resolution``-second buckets, so memory
+    does not grow with the event rate; the window moves a bucket at a time.
+    """
+
+    def __init__(self, window: float = 60.0, resolution: float = 1.0):
+        self.window = window
+        self.resolution = resolution
+        size = max(1, math.ceil(window / resolution))
+        self._counts = [0] * size
+        # Tick (monotonic time in buckets) each slot is counting
+        self._ticks = [-1] * size
+
+    def _tick(self) -> int:
+        return int(time.monotonic() / self.resolution)
+
+    def add(self, count: int = 1) -> None:
+        tick = self._tick()
+        slot = tick % len(self._counts)
+        if self._ticks[slot] != tick:
+            self._ticks[slot] = tick
+            self._counts[slot] = 0
+        self._counts[slot] += count
+
+    def per_second(self) -> float:
+        oldest = self._tick() - len(self._counts) + 1
+        return sum(count for tick, count in zip(self._ticks, self._counts) if tick >= oldest) / self.window
+
+
+class MetricsRegistry:
+    """Named counters, rates, gauges and histograms"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.rates: Dict[str, Rate] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+            self.rates.setdefault(name, Rate()).add(count)
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "counters": dict(self.counters),
+                "per_second": {name: round(rate.per_second(), 3) for name, rate in self.rates.items()},
+                "gauges": dict(self.gauges),
+                "histograms": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
@@ -0,0 +1,224 @@
+"""
+Cross-reference index between scraped offers and catalog parts
+
+Articles and brands are written differently on every source
+("W 610/3", "w610-3", "MANN-FILTER", "Манн"), so both are normalized
+into lookup keys. Keys are persisted in the ``part_keys`` table and
+mirrored in memory as a plain dict, which makes resolving a scraped
+offer to ``Part.id`` a couple of hash lookups. The brand-less ``sku:``
+key only matches offers without a brand or of the part's own brand:
+different makers reuse the same article numbers.
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from models import Part, PartKey, PartSourceUrl, async_session
+from scrapers.base import ScrapedPart
+
+logger = logging.getLogger(__name__)
+
+# Cyrillic letters that look like Latin ones and get mixed into articles
+_CYRILLIC_LOOKALIKES = str.maketrans({
+    "А": "A", "В": "B", "Е": "E", "К": "K", "М": "M", "Н": "H", "О": "O",
+    "Р": "P", "С": "C", "Т": "T", "Х": "X", "У": "Y",
+})
+
+_NON_ALNUM = re.compile(r"[^0-9A-ZА-ЯЁ]+")
+
+
+def _clean_brand(value: str) -> str:
+    return _NON_ALNUM.sub("", value.upper().replace("Ö", "O"))
+
+
+# Canonical brand -> spellings seen on the sources
+BRAND_ALIASES: Dict[str, List[str]] = {
+    "MANN": ["MANNFILTER", "МАНН", "МАННФИЛЬТР"],
+    "BOSCH": ["БОШ", "ROBERTBOSCH"],
+    "VAG": ["VW", "VOLKSWAGEN", "AUDI", "SKODA", "SEAT", "ФОЛЬКСВАГЕН"],
+    "MERCEDES": ["MERCEDESBENZ", "MB", "DAIMLER", "МЕРСЕДЕС"],
+    "HYUNDAIKIA": ["HYUNDAI", "KIA", "MOBIS", "ХЕНДАЙ", "КИА"],
+    "TOYOTA": ["TOYOTALEXUS", "ТОЙОТА"],
+    "LADA": ["VAZ", "ВАЗ", "ЛАДА", "AVTOVAZ", "АВТОВАЗ"],
+    "KNECHT": ["MAHLE", "MAHLEKNECHT", "KNECHTMAHLE"],
+    "FEBI": ["FEBIBILSTEIN"],
+    "LEMFORDER": ["LEMFOERDER"],  # "LEMFÖRDER" folds to the canonical spelling
+    "TRW": ["TRWAUTOMOTIVE"],
+}
+
+_BRAND_LOOKUP: Dict[str, str] = {
+    _clean_brand(alias): canonical
+    for canonical, aliases in BRAND_ALIASES.items()
+    for alias in aliases
+}
+
+
+def normalize_article(value: Optional[str]) -> str:
+    """Normalize SKU/OEM number: upper case, no separators, Latin look-alikes"""
+    if not value:
+        return ""
+    cleaned = _NON_ALNUM.sub("", value.upper())
+    return cleaned.translate(_CYRILLIC_LOOKALIKES)
+
+
+def normalize_brand(value: Optional[str]) -> str:
+    """Normalize brand name and collapse known aliases"""
+    if not value:
+        return ""
+    cleaned = _clean_brand(value)
+    return _BRAND_LOOKUP.get(cleaned, cleaned)
+
+
+def build_keys(
+    sku: Optional[str],
+    brand: Optional[str] = None,
+    oem_number: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Build lookup keys for a part, most specific first
+
+    Returns:
+        List of (key, kind) tuples
+    """
+    keys = []
+    article = normalize_article(sku)
+    brand_key = normalize_brand(brand)
+    oem = normalize_article(oem_number)
+
+    if article and brand_key:
+        keys.append((f"brand_sku:{brand_key}:{article}", "brand_sku"))
+    if article:
+        keys.append((f"sku:{article}", "sku"))
+    if oem:
+        keys.append((f"oem:{oem}", "oem"))
+
+    return keys
+
+
+class PartIndex:
+    """In-memory mirror of ``part_keys`` and known source URLs"""
+
+    def __init__(self):
+        self._keys: Dict[str, int] = {}
+        # Normalized brand of every indexed part, to check brand-less matches
+        self._brands: Dict[int, str] = {}
+        self._urls: Dict[Tuple[int, str], List[str]] = {}
+
+    async def load(self) -> None:
+        """Load keys and URLs from the database, indexing parts without keys"""
+        async with async_session() as session:
+            key_rows = await session.execute(select(PartKey.key, PartKey.part_id))
+            self._keys = {key: part_id for key, part_id in key_rows}
+
+            url_rows = await session.execute(
+                select(PartSourceUrl.part_id, PartSourceUrl.source, PartSourceUrl.url)
+            )
+            self._urls = {}
+            for part_id, source, url in url_rows:
+                self._urls.setdefault((part_id, source), []).append(url)
+
+            indexed = set(self._keys.values())
+            parts = (await session.execute(select(Part))).scalars().all()
+            self._brands = {p.id: normalize_brand(p.brand) for p in parts}
+            missing = [p for p in parts if p.id not in indexed]
+
+        for part in missing:
+            await self.index_part(part)
+
+        logger.info(f"Part index loaded: {len(self._keys)} keys, {len(self._urls)} source links")
+
+    async def index_part(self, part: Part) -> None:
+        """Persist and cache lookup keys for a catalog part"""
+        self._brands[part.id] = normalize_brand(part.brand)
+        new_keys = [
+            (key, kind)
+            for key, kind in build_keys(part.sku, part.brand, part.oem_number)
+            if key not in self._keys
+        ]
+        if not new_keys:
+            return
+
+        async with async_session() as session:
+            for key, kind in new_keys:
+                try:
+                    async with session.begin_nested():
+                        session.add(PartKey(key=key, part_id=part.id, kind=kind))
+                    self._keys[key] = part.id
+                except IntegrityError:
+                    # Another part (or worker) already owns this key - keep the first owner
+                    logger.debug(f"Part key {key} already taken, skipping for part {part.id}")
+            await session.commit()
+
+    def resolve(self, part: ScrapedPart) -> Optional[int]:
+        """
+        Resolve a scraped offer to a catalog ``Part.id``
+
+        An article match without the brand only counts when the offer has
+        no brand or the part has the same one (after aliases).
+        """
+        brand = normalize_brand(part.brand)
+        for key, kind in build_keys(part.sku, part.brand, part.oem_number):
+            part_id = self._keys.get(key)
+            if part_id is None:
+                continue
+            part_brand = self._brands.get(part_id)
+            if kind == "sku" and brand and part_brand and part_brand != brand:
+                continue
+            return part_id
+        return None
+
+    def lookup(self, article: str, brand: Optional[str] = None) -> Optional[int]:
+        """Resolve a raw article (SKU or OEM number) to a catalog ``Part.id``"""
+        return self.resolve(ScrapedPart(name="", sku=article, brand=brand, oem_number=article))
+
+    def known_urls(self, part_id: int, source: str) -> List[str]:
+        """Product URLs previously matched to this part on a source"""
+        return list(self._urls.get((part_id, source), []))
+
+    async def link(self, part_id: int, source: str, part: ScrapedPart) -> None:
+        """Remember the product URL of a scraped offer matched to a part"""
+        if not part.url:
+            return
+
+        urls = self._urls.setdefault((part_id, source), [])
+        if part.url in urls:
+            return
+
+        async with async_session() as session:
+            try:
+                session.add(PartSourceUrl(
+                    part_id=part_id,
+                    source=source,
+                    url=part.url,
+                    sku=part.sku,
+                    brand=part.brand,
+                ))
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+
+        urls.append(part.url)
+
+    async def unlink(self, part_id: int, source: str, url: str) -> None:
+        """Forget a product URL that no longer lists the part"""
+        async with async_session() as session:
+            await session.execute(
+                delete(PartSourceUrl).where(
+                    PartSourceUrl.part_id == part_id,
+                    PartSourceUrl.source == source,
+                    PartSourceUrl.url == url,
+                )
+            )
+            await session.commit()
+
+        urls = self._urls.get((part_id, source), [])
+        if url in urls:
+            urls.remove(url)
+
+
+# Global index instance
+part_index = PartIndex()
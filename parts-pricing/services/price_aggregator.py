@@ -1,57 +1,194 @@
 """
 Price aggregator service - combines prices from multiple sources
+
+Scrapes that find an offer unchanged (same price, availability and
+delivery as its last record, per ``offer_states``) do not write a new
+price record; only the offer's ``last_seen_at`` is bumped, and reads
+treat a record as current until its offer was last seen.
 """
 
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
-from models import PriceRecord, async_session
-from sqlalchemy import select, and_
-from sqlalchemy.orm import joinedload
+from models import OfferState, PriceRecord, async_session
+from scrapers.registry import SOURCES
+from sqlalchemy import select, and_, func, update
+from sqlalchemy.exc import IntegrityError
+
+from .cache import cache_get, cache_set, cache_delete, CACHE_TTL_PRICES
+from .price_index import price_dict, price_index
 
 logger = logging.getLogger(__name__)
 
+# Seconds an in-process stats memo is trusted without a local write
+STATS_MEMO_TTL = float(os.getenv("PRICE_STATS_MEMO_TTL", "5"))
+# Parts whose stats are memoized at once (least recently used dropped first)
+STATS_MEMO_SIZE = int(os.getenv("PRICE_STATS_MEMO_SIZE", "10000"))
+# Tries of a price write racing other writers of the same new offer
+OFFER_STATE_ATTEMPTS = 3
+# Offers whose last fingerprint is remembered at once
+FINGERPRINT_MEMO_SIZE = int(os.getenv("PRICE_FINGERPRINT_MEMO_SIZE", "100000"))
+
+
+def offer_fingerprint(price: float, currency: str, availability: Optional[str], delivery_days: Optional[int]) -> str:
+    """Fingerprint of the fields whose change makes a new price record"""
+    state = f"{price:.2f}|{currency}|{availability}|{delivery_days}"
+    return hashlib.blake2b(state.encode(), digest_size=8).hexdigest()
+
+
+@dataclass
+class PriceStats:
+    """Price statistics for a part, built in a single pass over its prices"""
+    part_id: int
+    prices: List[Dict[str, Any]] = field(default_factory=list)
+    in_stock_sources: int = 0
+    best: Optional[Dict[str, Any]] = None
+    best_in_stock: Optional[Dict[str, Any]] = None
+    average_price: Optional[float] = None
+    average_in_stock: Optional[float] = None
+    sources: List[str] = field(default_factory=list)
+    
+    @property
+    def total_sources(self) -> int:
+        return len(self.prices)
+    
+    @property
+    def lowest_in_stock(self) -> Optional[float]:
+        return self.best_in_stock["price"] if self.best_in_stock else None
+    
+    @classmethod
+    def from_prices(cls, part_id: int, prices: List[Dict[str, Any]]) -> "PriceStats":
+        """Compute all statistics in one pass"""
+        stats = cls(part_id=part_id, prices=prices)
+        total = 0.0
+        total_in_stock = 0.0
+        sources: Dict[str, None] = {}
+        
+        for p in prices:
+            price = p["price"]
+            total += price
+            sources[p["source"]] = None
+            
+            if stats.best is None or price < stats.best["price"]:
+                stats.best = p
+            
+            if p.get("availability") == "in_stock":
+                stats.in_stock_sources += 1
+                total_in_stock += price
+                if stats.best_in_stock is None or price < stats.best_in_stock["price"]:
+                    stats.best_in_stock = p
+        
+        if prices:
+            stats.average_price = total / len(prices)
+        if stats.in_stock_sources:
+            stats.average_in_stock = total_in_stock / stats.in_stock_sources
+        stats.sources = list(sources)
+        
+        return stats
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PriceStats":
+        return cls(**data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    def to_summary(self) -> Dict[str, Any]:
+        """Summary in the shape returned by the prices endpoint"""
+        if not self.prices:
+            return {
+                "part_id": self.part_id,
+                "has_prices": False,
+                "message": "No prices available"
+            }
+        
+        return {
+            "part_id": self.part_id,
+            "has_prices": True,
+            "total_sources": self.total_sources,
+            "in_stock_sources": self.in_stock_sources,
+            "best_price": self.best["price"],
+            "average_price": self.average_price,
+            "lowest_in_stock": self.lowest_in_stock,
+            "sources": self.sources,
+            "prices": self.prices
+        }
+
 
 class PriceAggregator:
     """Aggregates and processes prices from multiple sources"""
     
     def __init__(self):
-        self.sources = ["autodoc", "exist", "partsreview", "umapi"]
+        self.sources = list(SOURCES)
+        # part_id -> (memoized at, stats), least recently used first
+        self._stats_memo: "OrderedDict[int, Tuple[float, PriceStats]]" = OrderedDict()
+        # Local writes so far; stats read across a write are not memoized
+        self._writes = 0
+        # Last known fingerprint per (part, source, url, offer), least
+        # recently used first; the database decides
+        self._fingerprints: "OrderedDict[Tuple[int, str, str, str], str]" = OrderedDict()
     
     async def get_prices_for_part(
         self, 
         part_id: int, 
         max_age_hours: int = 24
     ) -> List[Dict[str, Any]]:
-        """Get all prices for a part, filtering by age"""
+        """Get all prices for a part, filtering by when their offer was last seen"""
         
         cutoff_time = datetime.utcnow() - timedelta(hours=max_age_hours)
+        last_seen_at = func.coalesce(OfferState.last_seen_at, PriceRecord.scraped_at)
         
         async with async_session() as session:
-            stmt = select(PriceRecord).where(
+            stmt = select(PriceRecord, last_seen_at).outerjoin(
+                OfferState, OfferState.price_record_id == PriceRecord.id
+            ).where(
                 and_(
                     PriceRecord.part_id == part_id,
-                    PriceRecord.scraped_at >= cutoff_time
+                    last_seen_at >= cutoff_time
                 )
             ).order_by(PriceRecord.price)
             
             result = await session.execute(stmt)
-            records = result.scalars().all()
             
-            return [
-                {
-                    "id": r.id,
-                    "source": r.source,
-                    "price": r.price,
-                    "currency": r.currency,
-                    "url": r.url,
-                    "availability": r.availability,
-                    "delivery_days": r.delivery_days,
-                    "scraped_at": r.scraped_at.isoformat() if r.scraped_at else None
-                }
-                for r in records
-            ]
+            return [price_dict(r, seen_at) for r, seen_at in result]
+    
+    async def get_price_stats(self, part_id: int) -> "PriceStats":
+        """
+        Get price statistics for a part
+        
+        Stats are memoized in-process until the next write for the part (or
+        STATS_MEMO_TTL seconds, to pick up writes from other workers) and
+        cached per part in Redis until the next save. At most
+        STATS_MEMO_SIZE parts are memoized.
+        """
+        writes = self._writes
+        memo = self._stats_memo.get(part_id)
+        if memo:
+            if time.monotonic() - memo[0] < STATS_MEMO_TTL:
+                self._stats_memo.move_to_end(part_id)
+                return memo[1]
+            del self._stats_memo[part_id]
+        
+        cache_key = f"price_stats:part:{part_id}"
+        cached = await cache_get(cache_key)
+        if cached:
+            stats = PriceStats.from_dict(cached)
+        else:
+            stats = PriceStats.from_prices(part_id, await self.get_prices_for_part(part_id))
+            await cache_set(cache_key, stats.to_dict(), CACHE_TTL_PRICES)
+        
+        if writes == self._writes:
+            self._stats_memo[part_id] = (time.monotonic(), stats)
+            self._stats_memo.move_to_end(part_id)
+            if len(self._stats_memo) > STATS_MEMO_SIZE:
+                self._stats_memo.popitem(last=False)
+        return stats
     
     async def get_best_price(
         self, 
@@ -60,18 +197,8 @@ class PriceAggregator:
     ) -> Optional[Dict[str, Any]]:
         """Get the best (lowest) price for a part"""
         
-        prices = await self.get_prices_for_part(part_id)
-        
-        if not prices:
-            return None
-        
-        if in_stock_only:
-            prices = [p for p in prices if p.get("availability") == "in_stock"]
-        
-        if not prices:
-            return None
-        
-        return min(prices, key=lambda x: x["price"])
+        stats = await self.get_price_stats(part_id)
+        return stats.best_in_stock if in_stock_only else stats.best
     
     async def get_average_price(
         self, 
@@ -80,57 +207,106 @@ class PriceAggregator:
     ) -> Optional[float]:
         """Calculate average price across all sources"""
         
-        prices = await self.get_prices_for_part(part_id)
+        stats = await self.get_price_stats(part_id)
+        return stats.average_in_stock if in_stock_only else stats.average_price
+    
+    async def get_price_summary(self, part_id: int) -> Dict[str, Any]:
+        """Get price summary with statistics"""
         
-        if not prices:
-            return None
+        stats = await self.get_price_stats(part_id)
+        return stats.to_summary()
+    
+    async def save_price_record(
+        self,
+        part_id: int,
+        source: str,
+        price: float,
+        url: str,
+        availability: str = "in_stock",
+        delivery_days: Optional[int] = None,
+        raw_data: Optional[Dict] = None,
+        offer: Optional[str] = None
+    ) -> Optional[PriceRecord]:
+        """
+        Save a price record if the offer changed since its last record
         
-        if in_stock_only:
-            prices = [p for p in prices if p.get("availability") == "in_stock"]
+        A new offer inserted by another writer at the same time is checked
+        against that writer's state again.
         
-        if not prices:
-            return None
+        Returns:
+            The new record, or None when the offer was unchanged and only
+            its last_seen_at was bumped
+        """
         
-        return sum(p["price"] for p in prices) / len(prices)
-    
-    async def get_price_summary(self, part_id: int) -> Dict[str, Any]:
-        """Get price summary with statistics"""
+        offer = offer or ""
+        key = (part_id, source, url, offer)
+        fingerprint = offer_fingerprint(price, "RUB", availability, delivery_days)
         
-        prices = await self.get_prices_for_part(part_id)
+        for attempt in range(OFFER_STATE_ATTEMPTS):
+            now = datetime.utcnow()
+            
+            # Conditional on the stored fingerprint, so a change written by
+            # another worker is never mistaken for "unchanged"
+            if self._fingerprints.get(key, fingerprint) == fingerprint:
+                async with async_session() as session:
+                    result = await session.execute(
+                        update(OfferState)
+                        .where(
+                            OfferState.part_id == part_id,
+                            OfferState.source == source,
+                            OfferState.url == url,
+                            OfferState.offer == offer,
+                            OfferState.fingerprint == fingerprint
+                        )
+                        .values(last_seen_at=now)
+                    )
+                    await session.commit()
+                if result.rowcount:
+                    self._remember(key, fingerprint)
+                    price_index.touch(part_id, source, url, offer, now)
+                    return None
+            
+            try:
+                record = await self._write_record(
+                    part_id, source, price, url, availability, delivery_days, raw_data, offer, fingerprint, now
+                )
+                break
+            except IntegrityError:
+                # Another writer inserted this offer's state first: check
+                # against its state again
+                if attempt == OFFER_STATE_ATTEMPTS - 1:
+                    raise
+                self._fingerprints.pop(key, None)
         
-        if not prices:
-            return {
-                "part_id": part_id,
-                "has_prices": False,
-                "message": "No prices available"
-            }
+        self._remember(key, fingerprint)
+        price_index.apply(record)
         
-        in_stock_prices = [p for p in prices if p.get("availability") == "in_stock"]
+        # Invalidate memoized and cached stats for this part
+        self._writes += 1
+        self._stats_memo.pop(part_id, None)
+        await cache_delete(f"price_stats:part:{part_id}")
         
-        return {
-            "part_id": part_id,
-            "has_prices": True,
-            "total_sources": len(prices),
-            "in_stock_sources": len(in_stock_prices),
-            "best_price": min(p["price"] for p in prices) if prices else None,
-            "average_price": sum(p["price"] for p in prices) / len(prices) if prices else None,
-            "lowest_in_stock": min(p["price"] for p in in_stock_prices) if in_stock_prices else None,
-            "sources": list(set(p["source"] for p in prices)),
-            "prices": prices
-        }
+        return record
     
-    async def save_price_record(
+    async def _write_record(
         self,
         part_id: int,
         source: str,
         price: float,
         url: str,
-        availability: str = "in_stock",
-        delivery_days: Optional[int] = None,
-        raw_data: Optional[Dict] = None
+        availability: str,
+        delivery_days: Optional[int],
+        raw_data: Optional[Dict],
+        offer: str,
+        fingerprint: str,
+        now: datetime
     ) -> PriceRecord:
-        """Save a new price record to the database"""
+        """
+        Insert a price record and point the offer's state at it
         
+        Raises:
+            IntegrityError: if the state was inserted concurrently
+        """
         async with async_session() as session:
             record = PriceRecord(
                 part_id=part_id,
@@ -141,11 +317,34 @@ class PriceAggregator:
                 availability=availability,
                 delivery_days=delivery_days,
                 raw_data=raw_data,
-                scraped_at=datetime.utcnow()
+                offer=offer,
+                scraped_at=now
             )
-            
             session.add(record)
+            await session.flush()
+            
+            state = await session.scalar(
+                select(OfferState).where(
+                    OfferState.part_id == part_id,
+                    OfferState.source == source,
+                    OfferState.url == url,
+                    OfferState.offer == offer
+                )
+            )
+            if state is None:
+                state = OfferState(part_id=part_id, source=source, url=url, offer=offer)
+                session.add(state)
+            state.fingerprint = fingerprint
+            state.price_record_id = record.id
+            state.changed_at = now
+            state.last_seen_at = now
+            
             await session.commit()
             await session.refresh(record)
-            
-            return record
+        return record
+    
+    def _remember(self, key: Tuple[int, str, str, str], fingerprint: str) -> None:
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        if len(self._fingerprints) > FINGERPRINT_MEMO_SIZE:
+            self._fingerprints.popitem(last=False)
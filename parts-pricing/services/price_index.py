@@ -0,0 +1,346 @@
+"""
+Array-backed index of current price offers
+
+Holds the latest record of every (part, source, offer) as a NumPy
+structured array sorted by part_id, so best/average/lowest-in-stock for
+a part are a binary search plus a few vectorized operations on a small
+slice - no ORM objects or dict conversion on the hot path.
+
+The array is persisted as a ``.npy`` snapshot that workers map read-only
+(``mmap_mode="r"``) at startup, so all workers share the same page cache.
+Records written after the snapshot are applied on top as a small
+in-memory delta: directly from ``save_price_record`` in this worker and
+by polling ``price_records`` for ids above the high-water mark for
+writes made by other workers (and ids skipped by a sync, in case their
+transaction commits later). Offers found unchanged are not rewritten
+(see ``offer_states``); their last-seen time is bumped the same way,
+through ``touch`` and by polling ``offer_states.last_seen_at``.
+
+Build or rebuild the snapshot with::
+
+    python -m services.price_index build
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_, select
+
+from models import OfferState, PriceRecord, async_session
+from scrapers.registry import SOURCES
+
+logger = logging.getLogger(__name__)
+
+PRICE_INDEX_PATH = os.getenv("PRICE_INDEX_PATH", "price_index.npy")
+# Seconds between polls for records written by other workers
+PRICE_INDEX_SYNC_INTERVAL = float(os.getenv("PRICE_INDEX_SYNC_INTERVAL", "2"))
+# Seconds a record id skipped by a sync is re-checked (a transaction that
+# had it may still commit)
+PRICE_INDEX_GAP_SECONDS = float(os.getenv("PRICE_INDEX_GAP_SECONDS", "60"))
+# Re-read last-seen bumps this far behind the newest one seen, for
+# transactions that commit out of timestamp order
+_SEEN_OVERLAP = timedelta(seconds=30)
+
+SOURCE_CODES = {"unknown": 0, **{name: info.code for name, info in SOURCES.items()}}
+AVAILABILITY_CODES = {"unknown": 0, "in_stock": 1, "on_order": 2, "out_of_stock": 3}
+
+_SOURCE_NAMES = {code: name for name, code in SOURCE_CODES.items()}
+_AVAILABILITY_NAMES = {code: name for name, code in AVAILABILITY_CODES.items()}
+_IN_STOCK = AVAILABILITY_CODES["in_stock"]
+
+OFFER_DTYPE = np.dtype([
+    ("part_id", "<i8"),
+    ("record_id", "<i8"),
+    ("price", "<f8"),
+    ("scraped_at", "<f8"),  # unix time the offer was last seen (naive UTC)
+    ("offer", "<u4"),  # offer_key: crc32 of the page URL and the offer on it
+    ("delivery_days", "<i2"),  # -1 when unknown
+    ("source", "u1"),
+    ("availability", "u1"),
+])
+
+_BUILD_BATCH_SIZE = 50_000
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else 0.0
+
+
+def offer_key(url: Optional[str], offer: Optional[str]) -> int:
+    """Identity of an offer: its page and, as pages list several, which one on it"""
+    return zlib.crc32(f"{url or ''}#{offer}".encode() if offer else (url or "").encode())
+
+
+def price_dict(record: PriceRecord, last_seen_at: Optional[datetime]) -> Dict[str, Any]:
+    """A price record in the shape the price endpoints return"""
+    return {
+        "id": record.id,
+        "source": record.source,
+        "price": record.price,
+        "currency": record.currency,
+        "url": record.url,
+        "availability": record.availability,
+        "delivery_days": record.delivery_days,
+        "scraped_at": record.scraped_at.isoformat() if record.scraped_at else None,
+        "last_seen_at": last_seen_at.isoformat() if last_seen_at else None,
+    }
+
+
+def _offer_row(
+    record_id: int,
+    part_id: int,
+    source: str,
+    price: float,
+    url: Optional[str],
+    offer: Optional[str],
+    availability: Optional[str],
+    delivery_days: Optional[int],
+    scraped_at: Optional[datetime],
+) -> Tuple:
+    """Convert price record fields to an ``OFFER_DTYPE`` tuple"""
+    return (
+        part_id,
+        record_id,
+        price,
+        _timestamp(scraped_at),
+        offer_key(url, offer),
+        delivery_days if delivery_days is not None else -1,
+        SOURCE_CODES.get(source, 0),
+        AVAILABILITY_CODES.get(availability or "unknown", 0),
+    )
+
+
+def _latest_per_offer(rows: np.ndarray) -> np.ndarray:
+    """Keep the newest record of every (part, source, offer), sorted by part"""
+    if len(rows) == 0:
+        return rows
+    order = np.lexsort((rows["record_id"], rows["offer"], rows["source"], rows["part_id"]))
+    rows = rows[order]
+    key = rows[["part_id", "source", "offer"]]
+    last = np.ones(len(rows), dtype=bool)
+    last[:-1] = key[1:] != key[:-1]
+    return rows[last]
+
+
+def _row_to_dict(row: np.void) -> Dict[str, Any]:
+    """``price_dict`` from the row alone, for a record no longer in the database"""
+    delivery_days = int(row["delivery_days"])
+    return {
+        "id": int(row["record_id"]),
+        "source": _SOURCE_NAMES.get(int(row["source"]), "unknown"),
+        "price": float(row["price"]),
+        "currency": "RUB",
+        "url": None,
+        "availability": _AVAILABILITY_NAMES.get(int(row["availability"]), "unknown"),
+        "delivery_days": delivery_days if delivery_days >= 0 else None,
+        "scraped_at": None,
+        "last_seen_at": datetime.utcfromtimestamp(float(row["scraped_at"])).isoformat(),
+    }
+
+
+class PriceIndex:
+    """Read-only snapshot of current offers plus an in-memory delta"""
+
+    def __init__(self, path: str = PRICE_INDEX_PATH):
+        self.path = path
+        self._base = np.empty(0, dtype=OFFER_DTYPE)
+        self._delta: Dict[int, Dict[Tuple[int, int], Tuple]] = {}
+        self.high_water = 0
+        # Ids below high_water not seen yet -> when first missed
+        self._gaps: Dict[int, float] = {}
+        self.seen_water: Optional[datetime] = None
+        self.ready = False
+        self._last_sync = 0.0
+
+    def open(self) -> bool:
+        """Map the snapshot read-only; the index stays disabled if it is missing"""
+        if not os.path.exists(self.path):
+            logger.info(f"Price index snapshot {self.path} not found, index disabled")
+            return False
+
+        self._base = np.load(self.path, mmap_mode="r")
+        self._delta = {}
+        self._gaps = {}
+        self.high_water = int(self._base["record_id"].max()) if len(self._base) else 0
+        self.seen_water = datetime.utcfromtimestamp(float(self._base["scraped_at"].max())) if len(self._base) else None
+        self.ready = True
+        logger.info(f"Price index mapped: {len(self._base)} offers, high water {self.high_water}")
+        return True
+
+    def _current(self, part_id: int, key: Tuple[int, int]) -> Optional[Tuple]:
+        """The indexed row of an offer, from the delta or the snapshot"""
+        row = self._delta.get(part_id, {}).get(key)
+        if row is not None:
+            return row
+        ids = self._base["part_id"]
+        rows = self._base[np.searchsorted(ids, part_id, side="left"):np.searchsorted(ids, part_id, side="right")]
+        match = rows[(rows["source"] == key[0]) & (rows["offer"] == key[1])]
+        return match[0].item() if len(match) else None
+
+    def apply(self, record: PriceRecord) -> None:
+        """Apply a written price record (again is fine: the newest record of an offer wins)"""
+        if not self.ready:
+            return
+
+        row = _offer_row(
+            record.id, record.part_id, record.source, record.price, record.url, record.offer,
+            record.availability, record.delivery_days, record.scraped_at,
+        )
+        key = (row[6], row[4])
+        current = self._current(record.part_id, key)
+        if current is not None and current[1] >= record.id:
+            return
+        self._delta.setdefault(record.part_id, {})[key] = row
+
+    def touch(self, part_id: int, source: str, url: Optional[str], offer: Optional[str], seen_at: datetime) -> None:
+        """Mark a current offer as seen again at ``seen_at``"""
+        if not self.ready:
+            return
+
+        key = (SOURCE_CODES.get(source, 0), offer_key(url, offer))
+        row = self._current(part_id, key)
+        seen = _timestamp(seen_at)
+        if row is not None and seen > row[3]:
+            self._delta.setdefault(part_id, {})[key] = row[:3] + (seen,) + row[4:]
+
+    async def sync(self, force: bool = False) -> None:
+        """Apply records written and offers seen by other workers since the last sync"""
+        if not self.ready:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_sync < PRICE_INDEX_SYNC_INTERVAL:
+            return
+        self._last_sync = now
+
+        # Ids skipped for long are rolled back, not still committing
+        self._gaps = {i: since for i, since in self._gaps.items() if now - since < PRICE_INDEX_GAP_SECONDS}
+
+        async with async_session() as session:
+            condition = PriceRecord.id > self.high_water
+            if self._gaps:
+                condition = or_(condition, PriceRecord.id.in_(list(self._gaps)))
+            result = await session.execute(select(PriceRecord).where(condition).order_by(PriceRecord.id))
+            for record in result.scalars():
+                self.apply(record)
+                self._gaps.pop(record.id, None)
+                if record.id > self.high_water:
+                    for missing in range(self.high_water + 1, record.id):
+                        self._gaps[missing] = now
+                    self.high_water = record.id
+
+            stmt = select(
+                OfferState.part_id, OfferState.source, OfferState.url, OfferState.offer, OfferState.last_seen_at
+            )
+            if self.seen_water:
+                stmt = stmt.where(OfferState.last_seen_at > self.seen_water - _SEEN_OVERLAP)
+            for part_id, source, url, offer, seen_at in await session.execute(stmt):
+                self.touch(part_id, source, url, offer, seen_at)
+                self.seen_water = max(self.seen_water, seen_at) if self.seen_water else seen_at
+
+    def offers(self, part_id: int, max_age_hours: int = 24) -> np.ndarray:
+        """Current offers of a part no older than ``max_age_hours``"""
+        ids = self._base["part_id"]
+        lo = np.searchsorted(ids, part_id, side="left")
+        hi = np.searchsorted(ids, part_id, side="right")
+        rows = self._base[lo:hi]
+
+        delta = self._delta.get(part_id)
+        if delta:
+            superseded = np.array(
+                [(int(r["source"]), int(r["offer"])) in delta for r in rows], dtype=bool
+            )
+            rows = np.concatenate([rows[~superseded], np.array(list(delta.values()), dtype=OFFER_DTYPE)])
+
+        cutoff = time.time() - max_age_hours * 3600
+        return rows[rows["scraped_at"] >= cutoff]
+
+    async def best(self, part_id: int, in_stock_only: bool = True) -> Optional[Dict[str, Any]]:
+        """Cheapest current offer, as the aggregator returns it"""
+        rows = self.offers(part_id)
+        if in_stock_only:
+            rows = rows[rows["availability"] == _IN_STOCK]
+        if len(rows) == 0:
+            return None
+        row = rows[np.argmin(rows["price"])]
+        async with async_session() as session:
+            record = await session.get(PriceRecord, int(row["record_id"]))
+        if record is None:
+            return _row_to_dict(row)
+        return price_dict(record, datetime.utcfromtimestamp(float(row["scraped_at"])))
+
+    def average(self, part_id: int, in_stock_only: bool = True) -> Optional[float]:
+        """Average price of current offers"""
+        rows = self.offers(part_id)
+        if in_stock_only:
+            rows = rows[rows["availability"] == _IN_STOCK]
+        if len(rows) == 0:
+            return None
+        return float(rows["price"].mean())
+
+    def lowest_in_stock(self, part_id: int) -> Optional[float]:
+        """Lowest in-stock price"""
+        rows = self.offers(part_id)
+        prices = rows["price"][rows["availability"] == _IN_STOCK]
+        return float(prices.min()) if len(prices) else None
+
+
+async def build_snapshot(path: str = PRICE_INDEX_PATH) -> int:
+    """
+    Build a snapshot from ``price_records`` and atomically replace the file
+
+    Workers that already mapped the old file keep reading it until they
+    re-open the index.
+    """
+    chunks: List[np.ndarray] = []
+    batch: List[Tuple] = []
+
+    async with async_session() as session:
+        result = await session.stream(
+            select(
+                PriceRecord.id, PriceRecord.part_id, PriceRecord.source, PriceRecord.price,
+                PriceRecord.url, PriceRecord.offer, PriceRecord.availability, PriceRecord.delivery_days,
+                func.coalesce(OfferState.last_seen_at, PriceRecord.scraped_at),
+            ).outerjoin(
+                OfferState, OfferState.price_record_id == PriceRecord.id
+            ).order_by(PriceRecord.id).execution_options(yield_per=_BUILD_BATCH_SIZE)
+        )
+        async for row in result:
+            batch.append(_offer_row(*row))
+            if len(batch) >= _BUILD_BATCH_SIZE:
+                chunks.append(_latest_per_offer(np.array(batch, dtype=OFFER_DTYPE)))
+                batch = []
+
+    if batch:
+        chunks.append(_latest_per_offer(np.array(batch, dtype=OFFER_DTYPE)))
+
+    rows = _latest_per_offer(np.concatenate(chunks)) if chunks else np.empty(0, dtype=OFFER_DTYPE)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, rows)
+    os.replace(tmp_path, path)
+
+    logger.info(f"Price index snapshot written to {path}: {len(rows)} offers")
+    return len(rows)
+
+
+# Global index instance
+price_index = PriceIndex()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Price index snapshot tools")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--path", default=PRICE_INDEX_PATH, help="Snapshot file")
+    args = parser.parse_args()
+
+    asyncio.run(build_snapshot(args.path))
@@ -0,0 +1,781 @@
+"""
+Scheduled price refreshes: a durable priority queue of (part, source) jobs
+
+Jobs live in the ``refresh_jobs`` table, one row per part and source, so
+the queue survives restarts and is shared by every worker process on any
+host that uses the same DATABASE_URL. Workers lease jobs: a lease is
+taken with a conditional UPDATE (only one worker can win it) and expires
+after REFRESH_LEASE_SECONDS, after which a job whose worker died becomes
+visible again. Failed jobs are retried with exponential backoff up to
+REFRESH_MAX_ATTEMPTS times.
+
+The planner (``plan_refreshes``) queues parts whose prices are older than
+their tier, as in the architecture doc: popular parts (at least
+REFRESH_POPULAR_VIEWS price views over POPULARITY_DAYS days, counted in
+Redis) every 6 hours, the rest daily. Jobs are leased most urgent first:
+priority is the staleness in tier intervals plus log(1 + views).
+
+Clients request a refresh of one part (``request_refresh``) and poll its
+progress per source (``refresh_status``); a request for a part that
+already has one in progress attaches to it.
+
+Run workers with ``python refresh_worker.py``, or in the API process
+itself (REFRESH_INPROCESS_WORKERS).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import socket
+import time
+import uuid
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import OfferState, Part, PriceRecord, RefreshJob, RefreshRequest, async_session
+from scrapers import BaseScraper, ScrapedPart, ScrapedPrice
+from scrapers.registry import get_source, plan_sources, source_names
+
+from . import cache
+from .cache import cache_delete_pattern
+from .metrics import MetricsRegistry
+from .part_index import part_index
+from .price_aggregator import PriceAggregator
+
+logger = logging.getLogger(__name__)
+
+# Refresh tiers (hours)
+REFRESH_POPULAR_HOURS = float(os.getenv("REFRESH_POPULAR_HOURS", "6"))
+REFRESH_DEFAULT_HOURS = float(os.getenv("REFRESH_DEFAULT_HOURS", "24"))
+# Price views over POPULARITY_DAYS that make a part popular
+REFRESH_POPULAR_VIEWS = int(os.getenv("REFRESH_POPULAR_VIEWS", "20"))
+POPULARITY_DAYS = 7
+
+# Default: every source with prices that is configured here (scrapers/registry.py)
+REFRESH_SOURCES = [s for s in os.getenv("REFRESH_SOURCES", "").split(",") if s] or source_names("prices", configured=True)
+# Parts planned per session
+REFRESH_PLAN_BATCH = int(os.getenv("REFRESH_PLAN_BATCH", "1000"))
+# A job not completed within this time is handed to another worker
+REFRESH_LEASE_SECONDS = int(os.getenv("REFRESH_LEASE_SECONDS", "300"))
+REFRESH_MAX_ATTEMPTS = int(os.getenv("REFRESH_MAX_ATTEMPTS", "5"))
+# Delay before the first retry; doubled for every further attempt
+REFRESH_RETRY_SECONDS = int(os.getenv("REFRESH_RETRY_SECONDS", "60"))
+
+# Responses after which a linked product page is dropped
+GONE_STATUSES = (404, 410)
+
+# Staleness assumed for a part that was never scraped on a source
+NEVER_SCRAPED_STALENESS = 4.0
+# Client-requested refreshes run before any scheduled one
+REQUESTED_PRIORITY = 1000.0
+
+# Worker slots run inside each API process (0 when refresh_worker.py
+# processes are deployed)
+REFRESH_INPROCESS_WORKERS = int(os.getenv("REFRESH_INPROCESS_WORKERS", "2"))
+
+refresh_metrics = MetricsRegistry()
+
+
+def known_offers(part: Part, source: str) -> List[ScrapedPart]:
+    """The product pages of a catalog part already linked on a source"""
+    return [
+        ScrapedPart(
+            name=part.name,
+            sku=part.sku or "",
+            brand=part.brand,
+            oem_number=part.oem_number,
+            url=url
+        )
+        for url in part_index.known_urls(part.id, source)
+    ]
+
+
+async def search_offers(part: Part, source: str, scraper: BaseScraper) -> List[ScrapedPart]:
+    """
+    Search a source for a catalog part by article
+
+    Only results resolving to this part are kept, and linked for the
+    next refresh.
+    """
+    query = part.sku or part.oem_number or part.name
+    offers = [
+        found for found in await scraper.search(query)
+        if part_index.resolve(found) == part.id
+    ]
+
+    for offer in offers:
+        await part_index.link(part.id, source, offer)
+
+    return offers
+
+
+async def _known_prices(part: Part, source: str, scraper: BaseScraper) -> List[ScrapedPrice]:
+    """
+    Prices from the linked product pages of a part
+
+    A page that is gone (404/410) or lists no prices any more is unlinked,
+    so the part is searched for again.
+    """
+    prices = []
+    for offer in known_offers(part, source):
+        try:
+            found = await scraper.get_prices(offer)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code not in GONE_STATUSES:
+                raise
+            found = []
+
+        if not found:
+            logger.info(f"Unlinking stale {source} page of part {part.id}: {offer.url}")
+            await part_index.unlink(part.id, source, offer.url)
+            refresh_metrics.inc("urls_unlinked")
+        prices.extend(found)
+    return prices
+
+
+async def refresh_part_source(part: Part, source: str, scraper: BaseScraper, aggregator: PriceAggregator) -> int:
+    """
+    Scrape and save the current prices of a part on one source
+
+    Linked product pages are used directly; when there are none, or all
+    turned out stale, the source is searched in the same run.
+
+    Returns the number of prices scraped; prices unchanged since their
+    last record are not written again (``prices_unchanged``). Fetch
+    errors of a strict scraper propagate, so the job is retried.
+    """
+    prices = await _known_prices(part, source, scraper)
+    if not part_index.known_urls(part.id, source):
+        for offer in await search_offers(part, source, scraper):
+            prices.extend(await scraper.get_prices(offer))
+
+    for scraped_price in prices:
+        record = await aggregator.save_price_record(
+            part_id=part.id,
+            source=source,
+            price=scraped_price.price,
+            url=scraped_price.url or "",
+            availability=scraped_price.availability,
+            delivery_days=scraped_price.delivery_days,
+            raw_data=scraped_price.raw_data,
+            offer=scraped_price.offer
+        )
+        refresh_metrics.inc("prices_written" if record else "prices_unchanged")
+    return len(prices)
+
+
+def write_savings() -> Dict[str, Any]:
+    """Price writes avoided by change detection in this process"""
+    written = refresh_metrics.counters.get("prices_written", 0)
+    unchanged = refresh_metrics.counters.get("prices_unchanged", 0)
+    total = written + unchanged
+    return {
+        "prices_scraped": total,
+        "prices_written": written,
+        "prices_unchanged": unchanged,
+        "writes_avoided": round(unchanged / total, 3) if total else None,
+    }
+
+
+async def invalidate_price_cache(part_id: int) -> None:
+    """Drop the cached price responses of a part"""
+    await cache_delete_pattern(f"prices:part:{part_id}:*")
+    await cache_delete_pattern(f"best_price:part:{part_id}:*")
+
+
+# Popularity
+
+def _popularity_key(day: datetime) -> str:
+    return f"popularity:{day:%Y%m%d}"
+
+
+async def record_view(part_id: int) -> None:
+    """Count a price view of a part (one sorted set per day)"""
+    if not cache.redis_client:
+        return
+
+    key = _popularity_key(datetime.utcnow())
+    try:
+        async with cache.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zincrby(key, 1, part_id)
+            pipe.expire(key, (POPULARITY_DAYS + 1) * 24 * 60 * 60)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Popularity update error: {e}")
+
+
+async def popularity(days: int = POPULARITY_DAYS) -> Dict[int, float]:
+    """Price views per part over the last ``days`` days"""
+    views: Dict[int, float] = {}
+    if not cache.redis_client:
+        return views
+
+    today = datetime.utcnow()
+    try:
+        for offset in range(days):
+            key = _popularity_key(today - timedelta(days=offset))
+            for member, score in await cache.redis_client.zrange(key, 0, -1, withscores=True):
+                views[int(member)] = views.get(int(member), 0.0) + score
+    except Exception as e:
+        logger.error(f"Popularity read error: {e}")
+    return views
+
+
+def refresh_interval(views: float) -> timedelta:
+    """How often a part is refreshed: 6 hours if popular, else daily"""
+    hours = REFRESH_POPULAR_HOURS if views >= REFRESH_POPULAR_VIEWS else REFRESH_DEFAULT_HOURS
+    return timedelta(hours=hours)
+
+
+def refresh_priority(views: float, age: Optional[timedelta], interval: timedelta) -> float:
+    """Staleness in tier intervals plus log(1 + views); higher runs first"""
+    staleness = NEVER_SCRAPED_STALENESS if age is None else age / interval
+    return staleness + math.log1p(views)
+
+
+# Queue
+
+class RefreshQueue:
+    """Durable queue of refresh jobs with leases and retries"""
+
+    def __init__(
+        self,
+        lease_seconds: int = REFRESH_LEASE_SECONDS,
+        max_attempts: int = REFRESH_MAX_ATTEMPTS,
+        retry_seconds: int = REFRESH_RETRY_SECONDS,
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+    async def enqueue(
+        self,
+        part_id: int,
+        source: str,
+        priority: float = 0.0,
+        due_at: Optional[datetime] = None,
+    ) -> None:
+        """
+        Queue a refresh of a part on a source
+
+        A finished job is queued again; a queued one keeps the higher
+        priority and the earlier due time; a leased one is left alone.
+        """
+        due_at = due_at or datetime.utcnow()
+
+        async with async_session() as session:
+            existing = (await session.execute(
+                select(RefreshJob.id).where(RefreshJob.part_id == part_id, RefreshJob.source == source)
+            )).scalar_one_or_none()
+
+            if existing is None:
+                session.add(RefreshJob(part_id=part_id, source=source, priority=priority, due_at=due_at))
+                try:
+                    await session.commit()
+                    return
+                except IntegrityError:
+                    # Queued concurrently by another process
+                    await session.rollback()
+                    existing = (await session.execute(
+                        select(RefreshJob.id).where(RefreshJob.part_id == part_id, RefreshJob.source == source)
+                    )).scalar_one()
+
+            await session.execute(
+                update(RefreshJob)
+                .where(RefreshJob.id == existing, RefreshJob.status.in_(("done", "dead")))
+                .values(status="queued", priority=priority, due_at=due_at, attempts=0, last_error=None)
+            )
+            await session.execute(
+                update(RefreshJob)
+                .where(RefreshJob.id == existing, RefreshJob.status == "queued", RefreshJob.priority < priority)
+                .values(priority=priority)
+            )
+            await session.execute(
+                update(RefreshJob)
+                .where(RefreshJob.id == existing, RefreshJob.status == "queued", RefreshJob.due_at > due_at)
+                .values(due_at=due_at)
+            )
+            await session.commit()
+
+    def _available(self, now: datetime):
+        """Due queued jobs, and leased ones whose lease has expired"""
+        return or_(
+            and_(RefreshJob.status == "queued", RefreshJob.due_at <= now),
+            and_(
+                RefreshJob.status == "leased",
+                RefreshJob.lease_expires_at < now,
+                RefreshJob.attempts < self.max_attempts,
+            ),
+        )
+
+    async def lease(self, owner: str, limit: int = 1, sources: Optional[List[str]] = None) -> List[RefreshJob]:
+        """
+        Lease up to ``limit`` of the most urgent available jobs
+
+        Each lease is a conditional UPDATE, so a job goes to exactly one
+        of the workers racing for it. With ``sources``, only jobs of
+        those sources are leased (the ones the worker can scrape).
+        """
+        now = datetime.utcnow()
+        leased = []
+        available = self._available(now)
+        if sources is not None:
+            available = and_(available, RefreshJob.source.in_(sources))
+
+        async with async_session() as session:
+            # Jobs whose worker died on their last allowed attempt
+            await session.execute(
+                update(RefreshJob)
+                .where(
+                    RefreshJob.status == "leased",
+                    RefreshJob.lease_expires_at < now,
+                    RefreshJob.attempts >= self.max_attempts,
+                )
+                .values(status="dead", lease_owner=None, finished_at=now, last_error="Lease expired")
+            )
+
+            candidates = (await session.execute(
+                select(RefreshJob.id)
+                .where(available)
+                .order_by(RefreshJob.priority.desc(), RefreshJob.due_at)
+                .limit(limit * 4)
+            )).scalars().all()
+
+            for job_id in candidates:
+                result = await session.execute(
+                    update(RefreshJob)
+                    .where(RefreshJob.id == job_id, available)
+                    .values(
+                        status="leased",
+                        lease_owner=owner,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=RefreshJob.attempts + 1,
+                    )
+                )
+                if result.rowcount == 1:
+                    leased.append(job_id)
+                    if len(leased) == limit:
+                        break
+            await session.commit()
+
+            if not leased:
+                return []
+            jobs = (await session.execute(select(RefreshJob).where(RefreshJob.id.in_(leased)))).scalars().all()
+
+        return sorted(jobs, key=lambda job: -job.priority)
+
+    async def _finish(self, job: RefreshJob, owner: str, **values) -> bool:
+        """Update a job only while ``owner`` still holds its lease"""
+        async with async_session() as session:
+            result = await session.execute(
+                update(RefreshJob)
+                .where(RefreshJob.id == job.id, RefreshJob.status == "leased", RefreshJob.lease_owner == owner)
+                .values(lease_owner=None, lease_expires_at=None, **values)
+            )
+            await session.commit()
+
+        if result.rowcount != 1:
+            logger.warning(f"Lost the lease of refresh job {job.id} ({job.source}, part {job.part_id})")
+            return False
+        return True
+
+    async def complete(self, job: RefreshJob, owner: str, scraped_count: int) -> bool:
+        """Mark a leased job done; False if the lease had expired and moved on"""
+        return await self._finish(
+            job, owner,
+            status="done", scraped_count=scraped_count, last_error=None, finished_at=datetime.utcnow(),
+        )
+
+    async def fail(self, job: RefreshJob, owner: str, error: str) -> bool:
+        """Schedule a retry with backoff, or give up after REFRESH_MAX_ATTEMPTS"""
+        now = datetime.utcnow()
+        if job.attempts >= self.max_attempts:
+            return await self._finish(job, owner, status="dead", last_error=error, finished_at=now)
+
+        delay = self.retry_seconds * 2 ** (job.attempts - 1)
+        return await self._finish(
+            job, owner,
+            status="queued", last_error=error, due_at=now + timedelta(seconds=delay),
+        )
+
+    async def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        async with async_session() as session:
+            rows = await session.execute(
+                select(RefreshJob.status, func.count()).group_by(RefreshJob.status)
+            )
+            return {status: count for status, count in rows}
+
+
+refresh_queue = RefreshQueue()
+
+
+async def _due_jobs(
+    session,
+    part_ids: List[int],
+    sources: List[str],
+    views: Dict[int, float],
+    now: datetime,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Jobs due among ``part_ids``: (new jobs to insert, finished jobs to
+    queue again), as parameter rows for one executemany each
+    """
+    last_scraped = {
+        (part_id, source): scraped_at
+        for part_id, source, scraped_at in await session.execute(
+            select(PriceRecord.part_id, PriceRecord.source, func.max(PriceRecord.scraped_at))
+            .where(PriceRecord.part_id.in_(part_ids), PriceRecord.source.in_(sources))
+            .group_by(PriceRecord.part_id, PriceRecord.source)
+        )
+    }
+    for part_id, source, seen_at in await session.execute(
+        select(OfferState.part_id, OfferState.source, func.max(OfferState.last_seen_at))
+        .where(OfferState.part_id.in_(part_ids), OfferState.source.in_(sources))
+        .group_by(OfferState.part_id, OfferState.source)
+    ):
+        last = last_scraped.get((part_id, source))
+        last_scraped[(part_id, source)] = max(last, seen_at) if last else seen_at
+    jobs = {
+        (part_id, source): (job_id, status, finished_at)
+        for job_id, part_id, source, status, finished_at in await session.execute(
+            select(RefreshJob.id, RefreshJob.part_id, RefreshJob.source, RefreshJob.status, RefreshJob.finished_at)
+            .where(RefreshJob.part_id.in_(part_ids), RefreshJob.source.in_(sources))
+        )
+    }
+
+    new, requeued = [], []
+    for part_id in part_ids:
+        part_views = views.get(part_id, 0.0)
+        interval = refresh_interval(part_views)
+
+        for source in sources:
+            job_id, status, finished_at = jobs.get((part_id, source), (None, None, None))
+            if status in ("queued", "leased"):
+                continue
+
+            last = last_scraped.get((part_id, source))
+            if finished_at and status in ("done", "dead"):
+                last = max(last, finished_at) if last else finished_at
+            age = now - last if last else None
+            if age is not None and age < interval:
+                continue
+
+            priority = refresh_priority(part_views, age, interval)
+            if job_id is None:
+                new.append({
+                    "part_id": part_id, "source": source, "status": "queued",
+                    "priority": priority, "due_at": now, "attempts": 0,
+                })
+            else:
+                requeued.append({"job_id": job_id, "new_priority": priority, "new_due_at": now})
+    return new, requeued
+
+
+async def plan_refreshes(
+    queue: RefreshQueue = refresh_queue,
+    sources: List[str] = REFRESH_SOURCES,
+    batch_size: int = REFRESH_PLAN_BATCH,
+) -> int:
+    """
+    Queue the (part, source) pairs due for a refresh
+
+    A pair is due when its last refresh (the newest price record or
+    last-seen offer, or the last finished job if that found nothing) is
+    older than its tier. Parts are planned ``batch_size`` at a time, each
+    batch in one session with one INSERT and one UPDATE executemany.
+    Safe to run from several workers at once.
+
+    Returns:
+        Number of jobs queued
+    """
+    now = datetime.utcnow()
+    views = await popularity()
+    jobs_table = RefreshJob.__table__
+    requeue = (
+        update(jobs_table)
+        .where(jobs_table.c.id == bindparam("job_id"), jobs_table.c.status.in_(("done", "dead")))
+        .values(status="queued", priority=bindparam("new_priority"), due_at=bindparam("new_due_at"),
+                attempts=0, last_error=None)
+    )
+
+    queued = 0
+    after_id = 0
+    while True:
+        conflicts: List[Dict[str, Any]] = []
+        async with async_session() as session:
+            part_ids = (await session.execute(
+                select(Part.id).where(Part.id > after_id).order_by(Part.id).limit(batch_size)
+            )).scalars().all()
+            if not part_ids:
+                break
+            after_id = part_ids[-1]
+
+            new, requeued = await _due_jobs(session, part_ids, sources, views, now)
+            if new:
+                try:
+                    async with session.begin_nested():
+                        await session.execute(insert(jobs_table), new)
+                except IntegrityError:
+                    # Another planner queued some of them meanwhile
+                    conflicts = new
+            if requeued:
+                await session.execute(requeue, requeued)
+            await session.commit()
+
+        for job in conflicts:
+            await queue.enqueue(job["part_id"], job["source"], job["priority"], now)
+        queued += len(new) + len(requeued)
+
+    refresh_metrics.inc("jobs_planned", queued)
+    return queued
+
+
+async def request_refresh(part_id: int, sources: List[str], queue: RefreshQueue = refresh_queue) -> Tuple[str, bool]:
+    """
+    Refresh a part on the given sources as soon as a worker is free
+
+    Returns:
+        (request id, True if attached to a request already in progress
+        that covers these sources)
+    """
+    async with async_session() as session:
+        latest = (await session.execute(
+            select(RefreshRequest)
+            .where(RefreshRequest.part_id == part_id)
+            .order_by(RefreshRequest.created_at.desc())
+            .limit(1)
+        )).scalar_one_or_none()
+
+    if latest is not None and set(sources) <= set(latest.sources):
+        status = await refresh_status(latest.id)
+        if status and status["status"] in ("queued", "running"):
+            return latest.id, True
+
+    request = RefreshRequest(id=uuid.uuid4().hex, part_id=part_id, sources=sources, created_at=datetime.utcnow())
+    async with async_session() as session:
+        session.add(request)
+        await session.commit()
+
+    # Sources expected to answer first are run first
+    plan = plan_sources(("prices",), candidates=sources)
+    ordered = plan.sources + [source for source in sources if source not in plan.sources]
+    for rank, source in enumerate(ordered):
+        await queue.enqueue(part_id, source, REQUESTED_PRIORITY + len(ordered) - rank)
+    refresh_metrics.inc("refreshes_requested")
+    return request.id, False
+
+
+def _source_progress(job: Optional[RefreshJob], since: datetime) -> Dict[str, Any]:
+    """State of one source of a refresh request made at ``since``"""
+    if job is None:
+        return {"status": "queued", "attempts": 0, "failures": 0}
+
+    if job.finished_at and job.finished_at >= since and job.status in ("done", "dead"):
+        status = "done" if job.status == "done" else "failed"
+    elif job.status == "leased":
+        status = "running"
+    elif job.status == "queued" and job.last_error:
+        status = "retrying"
+    else:
+        status = "queued"
+
+    # Every attempt but a running or successful last one has failed
+    failures = job.attempts if status in ("retrying", "failed") else max(0, job.attempts - 1)
+    progress = {"status": status, "attempts": job.attempts, "failures": failures}
+    if status == "done":
+        progress["scraped_count"] = job.scraped_count or 0
+    if job.last_error and status in ("retrying", "running", "failed"):
+        progress["error"] = job.last_error
+    if status in ("done", "failed"):
+        progress["finished_at"] = job.finished_at.isoformat()
+    elif status == "retrying":
+        progress["retry_at"] = job.due_at.isoformat()
+    return progress
+
+
+async def refresh_status(request_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Progress of a refresh request per source, or None if unknown
+
+    The request is ``done`` once every source finished, ``failed`` if
+    any of them gave up, ``queued`` until a worker picks a source up and
+    ``running`` in between. A refresh already running when the request
+    was made counts for it. ``errors`` is the number of failed attempts
+    over all sources (each source reports its own ``failures``).
+    """
+    async with async_session() as session:
+        request = await session.get(RefreshRequest, request_id)
+        if request is None:
+            return None
+        jobs = {
+            job.source: job
+            for job in (await session.execute(
+                select(RefreshJob).where(
+                    RefreshJob.part_id == request.part_id,
+                    RefreshJob.source.in_(request.sources),
+                )
+            )).scalars()
+        }
+
+    sources = {source: _source_progress(jobs.get(source), request.created_at) for source in request.sources}
+    states = {progress["status"] for progress in sources.values()}
+    if states <= {"done", "failed"}:
+        status = "failed" if "failed" in states else "done"
+    elif states == {"queued"}:
+        status = "queued"
+    else:
+        status = "running"
+
+    return {
+        "job_id": request.id,
+        "part_id": request.part_id,
+        "status": status,
+        "created_at": request.created_at.isoformat(),
+        "scraped_count": sum(progress.get("scraped_count", 0) for progress in sources.values()),
+        "errors": sum(progress["failures"] for progress in sources.values()),
+        "sources": sources,
+    }
+
+
+class RefreshWorker:
+    """
+    Runs refresh jobs from the queue in concurrent slots
+
+    Every slot leases its own jobs under a host/process/slot owner name,
+    so any number of workers can run in other processes and on other
+    hosts. Scrapers are opened once, in strict mode (a failed fetch
+    fails the job), and shared by the slots; only jobs of their sources
+    are leased.
+    """
+
+    def __init__(
+        self,
+        queue: RefreshQueue = refresh_queue,
+        sources: List[str] = REFRESH_SOURCES,
+        concurrency: int = 4,
+        poll_seconds: float = 5.0,
+        aggregator: Optional[PriceAggregator] = None,
+    ):
+        self.queue = queue
+        self.sources = sources
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.aggregator = aggregator or PriceAggregator()
+        self.scrapers: Dict[str, BaseScraper] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def run(self, stop: asyncio.Event, plan_seconds: float = 0, drain: bool = False) -> None:
+        """
+        Work until ``stop`` is set
+
+        Args:
+            plan_seconds: also run the planner this often (0 - never)
+            drain: return once no job is available
+        """
+        async with AsyncExitStack() as stack:
+            for source in self.sources:
+                scraper = await stack.enter_async_context(get_source(source).create())
+                scraper.strict = True
+                self.scrapers[source] = scraper
+
+            tasks = [asyncio.create_task(self._slot(f"{self.owner}:{slot}", stop, drain))
+                     for slot in range(self.concurrency)]
+            if plan_seconds:
+                tasks.append(asyncio.create_task(self._plan(stop, plan_seconds)))
+
+            try:
+                await asyncio.gather(*tasks[:self.concurrency])
+            finally:
+                stop.set()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _plan(self, stop: asyncio.Event, interval: float) -> None:
+        while not stop.is_set():
+            try:
+                queued = await plan_refreshes(self.queue, self.sources)
+                logger.info(f"Planned {queued} price refreshes")
+            except Exception:
+                logger.exception("Refresh planning failed")
+            await _sleep(stop, interval)
+
+    async def _slot(self, owner: str, stop: asyncio.Event, drain: bool) -> None:
+        while not stop.is_set():
+            try:
+                jobs = await self.queue.lease(owner, sources=self.sources)
+            except Exception:
+                logger.exception("Leasing refresh jobs failed")
+                await _sleep(stop, self.poll_seconds)
+                continue
+            if not jobs:
+                if drain:
+                    return
+                await _sleep(stop, self.poll_seconds)
+                continue
+
+            job = jobs[0]
+            start = time.perf_counter()
+            try:
+                scraped_count = await self.run_job(job)
+            except Exception as e:
+                logger.exception(f"Refresh of part {job.part_id} on {job.source} failed")
+                refresh_metrics.inc("jobs_failed")
+                await self.queue.fail(job, owner, repr(e))
+            else:
+                refresh_metrics.inc("jobs_done")
+                refresh_metrics.inc("prices_scraped", scraped_count)
+                await self.queue.complete(job, owner, scraped_count)
+            refresh_metrics.observe(f"job_ms:{job.source}", (time.perf_counter() - start) * 1000)
+
+    async def run_job(self, job: RefreshJob) -> int:
+        """Refresh one part on one source"""
+        scraper = self.scrapers.get(job.source)
+        if scraper is None:
+            raise ValueError(f"Unknown source: {job.source}")
+
+        async with async_session() as session:
+            part = await session.get(Part, job.part_id)
+        if part is None:
+            return 0
+
+        scraped_count = await refresh_part_source(part, job.source, scraper, self.aggregator)
+        await invalidate_price_cache(part.id)
+        return scraped_count
+
+
+_inprocess_worker: Optional[Tuple[asyncio.Event, asyncio.Task]] = None
+
+
+def start_inprocess_worker(concurrency: int = REFRESH_INPROCESS_WORKERS) -> None:
+    """Run refresh jobs in this (API) process, in the background"""
+    global _inprocess_worker
+    if concurrency <= 0 or _inprocess_worker is not None:
+        return
+    stop = asyncio.Event()
+    worker = RefreshWorker(concurrency=concurrency, poll_seconds=1.0)
+    _inprocess_worker = (stop, asyncio.create_task(worker.run(stop)))
+
+
+async def stop_inprocess_worker() -> None:
+    """Let running jobs finish and stop the in-process worker"""
+    global _inprocess_worker
+    if _inprocess_worker is None:
+        return
+    stop, task = _inprocess_worker
+    _inprocess_worker = None
+    stop.set()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def _sleep(stop: asyncio.Event, seconds: float) -> None:
+    """Sleep, waking early when ``stop`` is set"""
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
@@ -0,0 +1,270 @@
+"""
+Streaming ingestion of uploaded images with enforced size limits
+
+The damage routes read the request body chunk by chunk instead of
+letting the framework buffer (or spool) the whole upload first:
+
+- the declared Content-Length is checked before anything is read
+- multipart file data and base64 form values (urlencoded or multipart)
+  are decoded incrementally
+  into one preallocated ``bytearray`` - no intermediate form string,
+  second decoded copy or ``BytesIO``
+- reading stops as soon as the decoded image exceeds the limit
+
+The returned ``bytearray`` is what the detector decodes from (through a
+memoryview, see ``hf_damage_detector.decode_image``) and what is sent to
+the worker pool.
+"""
+
+import binascii
+import os
+from typing import List, Optional
+from urllib.parse import unquote_to_bytes
+
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Largest accepted image (decoded bytes)
+DAMAGE_MAX_IMAGE_BYTES = int(os.getenv("DAMAGE_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+# Most photos accepted by /detect-batch
+DAMAGE_BATCH_MAX_IMAGES = int(os.getenv("DAMAGE_BATCH_MAX_IMAGES", "12"))
+
+# Room for multipart headers and boundaries
+_MULTIPART_OVERHEAD = 64 * 1024
+# Base64 is 4/3 of the image; percent-encoding "+", "/" and "=" can triple
+# single characters, so only reject outright what no valid form could send
+_URLENCODED_MAX_FACTOR = 4
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the size limit"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Image exceeds the size limit of {limit} bytes")
+        self.limit = limit
+
+
+class InvalidUpload(Exception):
+    """Raised when the request body is not a usable image upload"""
+
+
+class _ImageBuffer:
+    """Preallocated output buffer with a hard size limit"""
+
+    def __init__(self, expected: int, limit: int):
+        self.limit = limit
+        self.data = bytearray(min(expected, limit))
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        end = self.size + len(chunk)
+        if end > self.limit:
+            raise UploadTooLarge(self.limit)
+        if end > len(self.data):
+            # Chunked request without Content-Length, grow geometrically
+            self.data.extend(bytes(max(end, min(2 * len(self.data), self.limit)) - len(self.data)))
+        self.data[self.size:end] = chunk
+        self.size = end
+
+    def result(self) -> bytearray:
+        """The written bytes; trimming a bytearray in place doesn't copy"""
+        if self.size == 0:
+            raise InvalidUpload("Empty image")
+        del self.data[self.size:]
+        return self.data
+
+
+class _Base64Writer:
+    """Base64-decodes text written in arbitrary chunks into an ``_ImageBuffer``"""
+
+    def __init__(self, buffer: _ImageBuffer):
+        self.buffer = buffer
+        self.pending = b""  # text not forming a whole 4-character group yet
+
+    def write(self, text: bytes, final: bool = False) -> None:
+        text = (self.pending + text).translate(None, b" \r\n")
+        usable = len(text) if final else len(text) - len(text) % 4
+        if usable:
+            try:
+                self.buffer.write(binascii.a2b_base64(text[:usable]))
+            except binascii.Error as e:
+                raise InvalidUpload(f"Invalid base64 data: {e}")
+        self.pending = text[usable:]
+
+    def close(self) -> None:
+        self.write(b"", final=True)
+
+
+def _content_length(request: Request) -> Optional[int]:
+    value = request.headers.get("content-length")
+    return int(value) if value and value.isdigit() else None
+
+
+async def read_multipart_image(request: Request, field: str = "image", limit: int = DAMAGE_MAX_IMAGE_BYTES) -> bytearray:
+    """
+    Stream the file part ``field`` of a multipart/form-data request
+
+    Raises:
+        UploadTooLarge: declared or actual size over ``limit``
+        InvalidUpload: not multipart, the field is missing or empty
+    """
+    images = await read_multipart_images(request, field, limit, max_count=1)
+    return images[0]
+
+
+async def read_multipart_images(
+    request: Request,
+    field: str = "images",
+    limit: int = DAMAGE_MAX_IMAGE_BYTES,
+    max_count: int = DAMAGE_BATCH_MAX_IMAGES,
+    base64: bool = False,
+) -> List[bytearray]:
+    """
+    Stream every file part named ``field`` of a multipart/form-data request
+
+    Each image is limited to ``limit`` bytes; parts beyond ``max_count``
+    are rejected before they are read. With ``base64`` the parts are
+    base64 text, decoded as they stream in.
+
+    Raises:
+        UploadTooLarge: declared or actual size over the limits
+        InvalidUpload: not multipart, the field is missing or empty,
+            invalid base64 or too many images
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise InvalidUpload("Expected multipart/form-data")
+
+    length = _content_length(request)
+    encoded_limit = limit * 4 // 3 + 4 if base64 else limit
+    if length is not None and length > (encoded_limit + _MULTIPART_OVERHEAD) * max_count:
+        raise UploadTooLarge(limit * max_count)
+
+    # A single image can be preallocated from Content-Length, several
+    # start small and grow
+    expected = length if max_count == 1 and length else 1024 * 1024
+    if base64:
+        expected = expected * 3 // 4
+    images: List[_ImageBuffer] = []
+    state = {"header": b"", "value": b"", "buffer": None}
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        state["header"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        state["value"] += data[start:end]
+
+    def on_header_end() -> None:
+        if state["header"].lower() == b"content-disposition":
+            _, disposition = parse_options_header(state["value"])
+            if disposition.get(b"name", b"").decode("latin-1") == field:
+                if len(images) >= max_count:
+                    raise InvalidUpload(f"At most {max_count} image(s) per request")
+                image = _ImageBuffer(expected, limit)
+                images.append(image)
+                state["buffer"] = _Base64Writer(image) if base64 else image
+        state["header"] = state["value"] = b""
+
+    def on_part_begin() -> None:
+        state["buffer"] = None
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if state["buffer"] is not None:
+            state["buffer"].write(data[start:end])
+
+    def on_part_end() -> None:
+        if isinstance(state["buffer"], _Base64Writer):
+            state["buffer"].close()
+        state["buffer"] = None
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+    parser.finalize()
+
+    if not images:
+        raise InvalidUpload(f"Field '{field}' is missing")
+    return [image.result() for image in images]
+
+
+async def read_base64_image(request: Request, field: str = "image_base64", limit: int = DAMAGE_MAX_IMAGE_BYTES) -> bytearray:
+    """
+    Stream a base64 image from an application/x-www-form-urlencoded or
+    multipart/form-data body
+
+    The value is percent-decoded and base64-decoded chunk by chunk, in
+    whole 4-character groups, straight into the output buffer.
+
+    Raises:
+        UploadTooLarge: declared or actual size over ``limit``
+        InvalidUpload: the field is missing, empty or not valid base64
+    """
+    if request.headers.get("content-type", "").lower().startswith("multipart/"):
+        images = await read_multipart_images(request, field, limit, max_count=1, base64=True)
+        return images[0]
+
+    length = _content_length(request)
+    if length is not None and length > limit * _URLENCODED_MAX_FACTOR:
+        raise UploadTooLarge(limit)
+
+    buffer = _ImageBuffer((length or 4 * 1024 * 1024) * 3 // 4, limit)
+    decoder = _Base64Writer(buffer)
+    prefix = f"{field}=".encode()
+
+    pending = b""  # input not decoded yet (unfinished key or split %XX escape)
+    value_started = value_ended = False
+
+    async for chunk in request.stream():
+        if value_ended:
+            continue
+        pending += chunk
+
+        if not value_started:
+            start = _value_offset(pending, prefix)
+            if start < 0:
+                # Keep only the unfinished "key=value" pair
+                pending = pending[pending.rfind(b"&") + 1:]
+                if len(pending) > limit * _URLENCODED_MAX_FACTOR:
+                    raise UploadTooLarge(limit)
+                continue
+            pending = pending[start:]
+            value_started = True
+
+        end = pending.find(b"&")
+        if end >= 0:
+            value, pending, value_ended = pending[:end], b"", True
+        else:
+            # Hold back an escape split across chunks
+            cut = pending.find(b"%", len(pending) - 2)
+            cut = cut if cut >= 0 else len(pending)
+            value, pending = pending[:cut], pending[cut:]
+
+        decoder.write(_unquote(value))
+
+    if not value_started:
+        raise InvalidUpload(f"Field '{field}' is missing")
+    decoder.write(_unquote(pending), final=True)
+    return buffer.result()
+
+
+def _value_offset(data: bytes, prefix: bytes) -> int:
+    """Offset of the value of the pair starting with ``prefix``, or -1"""
+    if data.startswith(prefix):
+        return len(prefix)
+    position = data.find(b"&" + prefix)
+    return position + 1 + len(prefix) if position >= 0 else -1
+
+
+def _unquote(value: bytes) -> bytes:
+    # URLSearchParams writes "+" as %2B, so a literal "+" is an encoded
+    # space - whitespace that base64 decoding drops anyway
+    return unquote_to_bytes(value.replace(b"+", b" "))
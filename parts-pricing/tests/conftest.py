@@ -0,0 +1,15 @@
+"""
+Test setup: a throwaway SQLite database and the service root on sys.path
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Before models is imported: the engine is created at import time
+_db_dir = tempfile.mkdtemp(prefix="parts-pricing-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'parts.db')}")
+os.environ.setdefault("PRICE_INDEX_PATH", os.path.join(_db_dir, "price_index.npy"))
@@ -0,0 +1,50 @@
+import asyncio
+
+from scrapers.browser import BrowserPage, BrowserPool
+
+
+class FakePage:
+    def __init__(self, gates):
+        self.gates = gates
+        self.url = ""
+
+    async def set_extra_http_headers(self, headers):
+        pass
+
+    async def goto(self, url, wait_until, timeout):
+        self.url = url
+        if url in self.gates:
+            await self.gates[url].wait()
+
+    async def content(self):
+        return f"<html>{self.url}</html>"
+
+
+class FakeContext:
+    async def close(self):
+        pass
+
+
+def test_fetches_waiting_for_a_busy_source_hold_no_slot():
+    async def run():
+        gates = {"https://slow.example/1": asyncio.Event()}
+        pool = BrowserPool(contexts=1, concurrency=2, block=set())
+        pool._browser = object()
+
+        async def open_page(user_agent):
+            return BrowserPage(FakeContext(), FakePage(gates))
+        pool._open_page = open_page
+
+        # One page for "slow": the second fetch waits for it, without a slot
+        first = asyncio.create_task(pool.fetch("slow", "https://slow.example/1", timeout=5))
+        second = asyncio.create_task(pool.fetch("slow", "https://slow.example/2", timeout=5))
+        await asyncio.sleep(0)
+
+        response = await asyncio.wait_for(pool.fetch("fast", "https://fast.example/", timeout=5), 1)
+        assert response.url == "https://fast.example/"
+
+        gates["https://slow.example/1"].set()
+        assert (await first).url == "https://slow.example/1"
+        assert (await second).url == "https://slow.example/2"
+
+    asyncio.run(run())
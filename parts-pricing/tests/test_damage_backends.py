@@ -0,0 +1,37 @@
+"""
+Parity of the ONNX backends with eager torch
+
+Skipped unless onnxruntime is installed, the backend's model is exported
+to DAMAGE_ONNX_DIR (python damage_backends.py export) and the torch
+checkpoint is in the Hugging Face cache. Set DAMAGE_PARITY_IMAGES to a
+directory of real photos; synthetic images yield few detections.
+"""
+
+import os
+
+import pytest
+
+from damage_backends import _ONNX_FILES, DAMAGE_ONNX_DIR, MODEL_NAME
+
+
+def _checkpoint_cached() -> bool:
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    return isinstance(try_to_load_from_cache(MODEL_NAME, "config.json"), str)
+
+
+@pytest.mark.parametrize("backend", sorted(_ONNX_FILES))
+def test_onnx_backend_matches_torch(backend):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("torch")
+    if not os.path.exists(os.path.join(DAMAGE_ONNX_DIR, _ONNX_FILES[backend])):
+        pytest.skip(f"{backend} model not exported to {DAMAGE_ONNX_DIR}")
+    if not _checkpoint_cached():
+        pytest.skip(f"{MODEL_NAME} checkpoint not cached")
+
+    from benchmarks.damage_backends import check_parity, load_images
+
+    report = check_parity(load_images(os.getenv("DAMAGE_PARITY_IMAGES", ""), count=4), [backend])[backend]
+    assert report["ok"], report
@@ -0,0 +1,47 @@
+import asyncio
+import glob
+import os
+
+import pyarrow.parquet as pq
+
+from export_prices import export_prices, read_watermark
+from models import PriceRecord, async_session, init_db
+
+PAGE = "https://exist.example/price/w7008"
+
+
+def test_records_committed_after_higher_ids_are_exported(tmp_path):
+    out = str(tmp_path)
+
+    async def run():
+        await init_db()
+        async with async_session() as session:
+            session.add(PriceRecord(part_id=500, source="exist", price=800.0, url=PAGE, availability="in_stock"))
+            await session.commit()
+        await export_prices(out)
+
+        async with async_session() as session:
+            early = PriceRecord(part_id=501, source="exist", price=700.0, url=PAGE, offer="0", availability="in_stock")
+            late = PriceRecord(part_id=501, source="exist", price=650.0, url=PAGE, offer="1", availability="in_stock")
+            session.add_all([early, late])
+            await session.flush()
+            # The higher id is committed, and exported, first
+            await session.delete(early)
+            await session.commit()
+        stats = await export_prices(out)
+        assert stats["exported"] == 1 and stats["gaps"] == 1
+        assert set(read_watermark(out)[1]) == {early.id}
+
+        async with async_session() as session:
+            session.add(PriceRecord(
+                id=early.id, part_id=501, source="exist", price=700.0, url=PAGE, offer="0", availability="in_stock"
+            ))
+            await session.commit()
+        stats = await export_prices(out)
+        assert stats["exported"] == 1 and stats["gaps"] == 0
+
+        files = glob.glob(os.path.join(out, "price_records", "*", "*-late.parquet"))
+        rows = pq.read_table(files[0]).to_pylist()
+        assert [(row["id"], row["offer"]) for row in rows] == [(early.id, "0")]
+
+    asyncio.run(run())
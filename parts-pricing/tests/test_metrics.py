@@ -0,0 +1,17 @@
+from services import metrics
+from services.metrics import Rate
+
+
+def test_rate_keeps_a_fixed_ring_of_buckets(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: now[0])
+    rate = Rate(window=10.0)
+
+    for _ in range(10000):
+        rate.add()
+        now[0] += 0.001
+    assert len(rate._counts) == 10
+    assert rate.per_second() == 1000.0
+
+    now[0] += 10.0
+    assert rate.per_second() == 0.0
@@ -0,0 +1,36 @@
+import asyncio
+
+from models import Part, async_session, init_db
+from scrapers.base import ScrapedPart
+from services.part_index import PartIndex, normalize_brand
+
+
+async def _index(*parts: Part) -> PartIndex:
+    await init_db()
+    index = PartIndex()
+    async with async_session() as session:
+        session.add_all(parts)
+        await session.commit()
+    for part in parts:
+        await index.index_part(part)
+    return index
+
+
+def test_brand_aliases_are_normalized():
+    assert normalize_brand("Mann-Filter") == "MANN"
+    assert normalize_brand("LEMFÖRDER") == "LEMFORDER"
+    assert normalize_brand("Lemfoerder") == "LEMFORDER"
+
+
+def test_article_match_requires_same_brand():
+    async def run():
+        index = await _index(Part(name="Oil filter", sku="W 610/3", brand="MANN"))
+        part_id = index.lookup("W610-3", brand="MANN")
+
+        assert part_id is not None
+        assert index.resolve(ScrapedPart(name="", sku="w610-3", brand="Mann-Filter")) == part_id
+        assert index.resolve(ScrapedPart(name="", sku="W610-3")) == part_id
+        # Same article, another maker
+        assert index.resolve(ScrapedPart(name="", sku="W610-3", brand="Bosch")) is None
+
+    asyncio.run(run())
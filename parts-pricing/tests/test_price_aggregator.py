@@ -0,0 +1,68 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import OfferState, PriceRecord, async_session, init_db
+from services.price_aggregator import PriceAggregator
+
+PAGE = "https://exist.example/price/oc90"
+
+
+async def count_records(part_id: int) -> int:
+    async with async_session() as session:
+        return await session.scalar(select(func.count()).where(PriceRecord.part_id == part_id))
+
+
+def test_unchanged_offers_on_one_page_are_not_rewritten():
+    async def run():
+        await init_db()
+        aggregator = PriceAggregator()
+        prices = [820.0, 790.0, 1150.0, 905.0]
+
+        for _ in range(2):
+            saved = [
+                await aggregator.save_price_record(301, "exist", price, PAGE, offer=str(position))
+                for position, price in enumerate(prices)
+            ]
+        assert saved == [None] * 4
+        assert await count_records(301) == 4
+
+        # A fresh process only has the database to go by
+        aggregator = PriceAggregator()
+        prices[2] = 1099.0
+        saved = [
+            await aggregator.save_price_record(301, "exist", price, PAGE, offer=str(position))
+            for position, price in enumerate(prices)
+        ]
+        assert [record is not None for record in saved] == [False, False, True, False]
+        assert await count_records(301) == 5
+
+    asyncio.run(run())
+
+
+def test_offer_state_inserted_concurrently_is_retried(monkeypatch):
+    async def run():
+        await init_db()
+        await PriceAggregator().save_price_record(302, "exist", 820.0, PAGE, offer="0")
+
+        # The second writer read the state before the first one committed it
+        original = AsyncSession.scalar
+        stale_reads = [None]
+
+        async def scalar(self, statement, *args, **kwargs):
+            if stale_reads:
+                return stale_reads.pop()
+            return await original(self, statement, *args, **kwargs)
+        monkeypatch.setattr(AsyncSession, "scalar", scalar)
+
+        record = await PriceAggregator().save_price_record(302, "exist", 790.0, PAGE, offer="0")
+        assert record is not None and not stale_reads
+        assert await count_records(302) == 2
+        async with async_session() as session:
+            states = (await session.execute(
+                select(OfferState.price_record_id).where(OfferState.part_id == 302)
+            )).scalars().all()
+        assert states == [record.id]
+
+    asyncio.run(run())
@@ -0,0 +1,56 @@
+import asyncio
+
+from models import PriceRecord, async_session, init_db
+from services.price_aggregator import PriceAggregator
+from services.price_index import PriceIndex, build_snapshot
+
+PAGE = "https://autodoc.example/part/w7008"
+
+
+def test_offers_on_one_page_are_indexed_separately(tmp_path):
+    async def run():
+        await init_db()
+        aggregator = PriceAggregator()
+        for position, price in enumerate([6620.0, 5985.0, 669.0, 7864.0]):
+            await aggregator.save_price_record(101, "autodoc", price, PAGE, offer=str(position))
+
+        path = str(tmp_path / "index.npy")
+        await build_snapshot(path)
+        index = PriceIndex(path)
+        index.open()
+
+        best = await index.best(101)
+        assert best == await aggregator.get_best_price(101)
+        assert best["price"] == 669.0 and best["url"] == PAGE
+
+    asyncio.run(run())
+
+
+def test_records_committed_out_of_id_order_are_applied(tmp_path):
+    async def run():
+        await init_db()
+        path = str(tmp_path / "index.npy")
+        await build_snapshot(path)
+        index = PriceIndex(path)
+        index.open()
+
+        async with async_session() as session:
+            early = PriceRecord(part_id=202, source="exist", price=500.0, url=PAGE, offer="0", availability="in_stock")
+            late = PriceRecord(part_id=202, source="exist", price=400.0, url=PAGE, offer="1", availability="in_stock")
+            session.add_all([early, late])
+            await session.flush()
+            # The later id is committed and synced first
+            await session.delete(early)
+            await session.commit()
+        await index.sync(force=True)
+
+        async with async_session() as session:
+            session.add(PriceRecord(
+                id=early.id, part_id=202, source="exist", price=300.0, url=PAGE, offer="0", availability="in_stock"
+            ))
+            await session.commit()
+        await index.sync(force=True)
+
+        assert (await index.best(202))["price"] == 300.0
+
+    asyncio.run(run())
@@ -0,0 +1,150 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+from models import Part, PartSourceUrl, RefreshJob, async_session, init_db
+from scrapers import AutoDocScraper, ExistScraper, ScrapedPart
+from scrapers.base import FETCH_ERRORS
+from services.part_index import part_index
+from services.price_aggregator import PriceAggregator
+from services.refresh import RefreshQueue, plan_refreshes, refresh_part_source, refresh_status, request_refresh
+
+
+def test_lease_only_takes_jobs_of_the_given_sources():
+    async def run():
+        await init_db()
+        queue = RefreshQueue()
+        await queue.enqueue(401, "autodoc", priority=5.0)
+        await queue.enqueue(401, "exist", priority=1.0)
+
+        jobs = await queue.lease("test:exist", limit=2, sources=["exist"])
+        assert [(job.part_id, job.source) for job in jobs] == [(401, "exist")]
+
+        jobs = await queue.lease("test:any", limit=2)
+        assert [(job.part_id, job.source) for job in jobs] == [(401, "autodoc")]
+
+    asyncio.run(run())
+
+
+def test_strict_scraper_raises_fetch_errors():
+    def refuse(request):
+        raise httpx.ConnectError("Name or service not known", request=request)
+
+    async def run():
+        part = ScrapedPart(name="Oil filter", sku="OC90", url="https://exist.example/price/oc90")
+        async with ExistScraper() as scraper:
+            scraper.session = httpx.AsyncClient(transport=httpx.MockTransport(refuse))
+            assert await scraper.get_prices(part) == []
+
+            # Either the refused request or, once it opened, the circuit
+            scraper.strict = True
+            with pytest.raises(FETCH_ERRORS):
+                await scraper.get_prices(part)
+
+    asyncio.run(run())
+
+
+def test_refresh_status_reports_failed_attempts():
+    async def run():
+        await init_db()
+        queue = RefreshQueue(retry_seconds=0)
+        request_id, _ = await request_refresh(402, ["autodoc", "exist"], queue)
+
+        job, = await queue.lease("test:worker", sources=["exist"])
+        await queue.fail(job, "test:worker", "ConnectError('Name or service not known')")
+        status = await refresh_status(request_id)
+        assert status["errors"] == 1
+        assert status["sources"]["exist"]["status"] == "retrying"
+        assert status["sources"]["exist"]["failures"] == 1
+        assert status["sources"]["autodoc"]["failures"] == 0
+
+        job, = await queue.lease("test:worker", sources=["exist"])
+        await queue.complete(job, "test:worker", 3)
+        status = await refresh_status(request_id)
+        assert status["errors"] == 1
+        assert status["sources"]["exist"] == {
+            "status": "done", "attempts": 2, "failures": 1, "scraped_count": 3,
+            "finished_at": status["sources"]["exist"]["finished_at"],
+        }
+
+    asyncio.run(run())
+
+
+def test_stale_product_page_is_unlinked_and_searched_again():
+    old_url = "https://autodoc.example/part/knecht-oc90-old"
+    new_url = "https://autodoc.example/part/knecht-oc90"
+
+    def site(request):
+        url = str(request.url)
+        if url.startswith(old_url):
+            return httpx.Response(404, text="gone")
+        if "/search" in url:
+            return httpx.Response(200, text=(
+                f'<a class="product-card" href="/part/knecht-oc90"><h3>Oil filter</h3>'
+                f'<div class="card-sku">OC 90</div><div class="card-brand">Knecht</div></a>'
+            ))
+        if url == new_url:
+            return httpx.Response(200, text='<div class="offer__price">1 250 ₽</div><div class="offer__price">990 ₽</div>')
+        return httpx.Response(404)
+
+    async def run():
+        await init_db()
+        async with async_session() as session:
+            part = Part(name="Oil filter", sku="OC90", brand="KNECHT")
+            session.add(part)
+            await session.commit()
+        await part_index.index_part(part)
+        await part_index.link(part.id, "autodoc", ScrapedPart(name="Oil filter", sku="OC90", url=old_url))
+
+        async with AutoDocScraper() as scraper:
+            scraper.base_url = "https://autodoc.example"
+            scraper.session = httpx.AsyncClient(transport=httpx.MockTransport(site))
+            scraper.strict = True
+            scraped = await refresh_part_source(part, "autodoc", scraper, PriceAggregator())
+
+        assert scraped == 2
+        assert part_index.known_urls(part.id, "autodoc") == [new_url]
+        async with async_session() as session:
+            urls = (await session.execute(
+                select(PartSourceUrl.url).where(PartSourceUrl.part_id == part.id)
+            )).scalars().all()
+        assert urls == [new_url]
+
+    asyncio.run(run())
+
+
+def test_plan_refreshes_queues_new_and_finished_jobs_in_batches():
+    async def run():
+        await init_db()
+        async with async_session() as session:
+            parts = [Part(name=f"Filter {i}", sku=f"PLAN{i}") for i in range(5)]
+            session.add_all(parts)
+            await session.commit()
+        part_ids = [part.id for part in parts]
+
+        queue = RefreshQueue()
+        await queue.enqueue(part_ids[0], "exist")
+        job, = await queue.lease("test:planner", sources=["exist"])
+        await queue.complete(job, "test:planner", 0)
+        async with async_session() as session:
+            await session.execute(
+                update(RefreshJob).where(RefreshJob.id == job.id).values(finished_at=datetime(2020, 1, 1))
+            )
+            await session.commit()
+
+        await plan_refreshes(queue, ["exist"], batch_size=2)
+
+        async with async_session() as session:
+            jobs = {
+                part_id: (status, attempts)
+                for part_id, status, attempts in await session.execute(
+                    select(RefreshJob.part_id, RefreshJob.status, RefreshJob.attempts)
+                    .where(RefreshJob.part_id.in_(part_ids), RefreshJob.source == "exist")
+                )
+            }
+        assert jobs == {part_id: ("queued", 0) for part_id in part_ids}
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import asyncio
+
+from api.routes import search
+from scrapers import ScrapedPart
+from scrapers.registry import SourcePlan
+from services.catalog_search import CatalogHit
+
+
+def stub_sources(monkeypatch, catalog_calls):
+    async def search_catalog(q, limit):
+        catalog_calls.append(q)
+        return [CatalogHit(part_id=7, name="Oil filter", sku="W610/3", brand="MANN")]
+
+    async def search_source(source, q, limit):
+        return source, [
+            ScrapedPart(name="Фильтр масляный", sku="W 610/3", brand="Mann-Filter", url="https://exist.example/1"),
+            ScrapedPart(name="Фильтр масляный", sku="OC 90", brand="Knecht", url="https://exist.example/2"),
+        ]
+
+    monkeypatch.setattr(search, "search_catalog", search_catalog)
+    monkeypatch.setattr(search, "_search_source", search_source)
+    monkeypatch.setattr(search, "plan_sources", lambda needs, budget, candidates: SourcePlan(sources=["exist"]))
+
+
+def test_catalog_and_live_results_are_deduplicated(monkeypatch):
+    calls = []
+    stub_sources(monkeypatch, calls)
+
+    response = asyncio.run(search.search_parts(q="W610/3", limit=10, sources=None, budget_ms=1000))
+    assert [(r.source, r.sku) for r in response.results] == [("catalog", "W610/3"), ("exist", "OC 90")]
+
+
+def test_catalog_is_skipped_unless_requested(monkeypatch):
+    calls = []
+    stub_sources(monkeypatch, calls)
+
+    response = asyncio.run(search.search_parts(q="W610/3", limit=10, sources="exist", budget_ms=1000))
+    assert calls == []
+    assert {r.source for r in response.results} == {"exist"}
+    assert response.sources_searched == ["exist"]
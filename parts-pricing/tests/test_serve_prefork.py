@@ -0,0 +1,43 @@
+import signal
+import socket
+
+import serve_prefork
+from serve_prefork import PreforkServer
+
+
+class CrashingServer(PreforkServer):
+    def run_worker(self) -> None:
+        raise RuntimeError("model failed to load")
+
+
+def test_restart_backoff_doubles_and_resets(monkeypatch):
+    monkeypatch.setattr(serve_prefork, "RAPID_FAILURE_SECONDS", 10.0)
+    monkeypatch.setattr(serve_prefork, "RESTART_BACKOFF_SECONDS", 1.0)
+    monkeypatch.setattr(serve_prefork, "RESTART_BACKOFF_MAX_SECONDS", 3.0)
+    server = PreforkServer(None, None, workers=1, threads=1, preload=True, max_rapid_failures=5)
+
+    delays = []
+    for now in (1.0, 2.0, 3.0):
+        server.started[0] = now - 0.5
+        delays.append(server.schedule_restart(0, now))
+    assert delays == [1.0, 2.0, 3.0]
+
+    # A worker that ran for a while starts over without delay
+    server.started[0] = 0.0
+    assert server.schedule_restart(0, 100.0) == 0.0
+    assert server.failures[0] == 0
+
+
+def test_master_gives_up_after_rapid_failures(monkeypatch):
+    monkeypatch.setattr(serve_prefork, "RESTART_BACKOFF_SECONDS", 0.01)
+    sock = socket.create_server(("127.0.0.1", 0))
+    previous = signal.getsignal(signal.SIGTERM), signal.getsignal(signal.SIGINT)
+    try:
+        server = CrashingServer(None, sock, workers=2, threads=1, preload=True, max_rapid_failures=2)
+        assert server.run(memory_interval=0) == 1
+    finally:
+        signal.signal(signal.SIGTERM, previous[0])
+        signal.signal(signal.SIGINT, previous[1])
+        sock.close()
+    assert not server.children and not server.restarts
+    assert max(server.failures.values()) == 3
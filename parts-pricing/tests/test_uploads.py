@@ -0,0 +1,54 @@
+import asyncio
+import base64
+
+import pytest
+from starlette.requests import Request
+
+from services.uploads import InvalidUpload, read_base64_image, read_multipart_image
+
+IMAGE = bytes(range(256)) * 40
+BOUNDARY = "testboundary"
+
+
+def make_request(body: bytes, content_type: str, chunk: int = 1000) -> Request:
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+
+    async def receive():
+        data = chunks.pop(0)
+        return {"type": "http.request", "body": data, "more_body": bool(chunks)}
+
+    headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())]
+    return Request({"type": "http", "method": "POST", "headers": headers}, receive)
+
+
+def multipart(field: str, value: bytes, filename: str = "") -> Request:
+    disposition = f'form-data; name="{field}"' + (f'; filename="{filename}"' if filename else "")
+    body = (
+        f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+        + value
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+    return make_request(body, f"multipart/form-data; boundary={BOUNDARY}")
+
+
+def test_multipart_image():
+    assert asyncio.run(read_multipart_image(multipart("image", IMAGE, "car.jpg"))) == IMAGE
+
+
+def test_empty_multipart_image_is_rejected():
+    with pytest.raises(InvalidUpload):
+        asyncio.run(read_multipart_image(multipart("image", b"", "car.jpg")))
+
+
+def test_base64_urlencoded_and_multipart():
+    encoded = base64.b64encode(IMAGE)
+    body = b"image_base64=" + encoded.replace(b"+", b"%2B").replace(b"/", b"%2F").replace(b"=", b"%3D")
+    assert asyncio.run(read_base64_image(make_request(body, "application/x-www-form-urlencoded"))) == IMAGE
+    assert asyncio.run(read_base64_image(multipart("image_base64", encoded))) == IMAGE
+
+
+def test_empty_base64_is_rejected():
+    with pytest.raises(InvalidUpload):
+        asyncio.run(read_base64_image(multipart("image_base64", b"")))
+    with pytest.raises(InvalidUpload):
+        asyncio.run(read_base64_image(make_request(b"image_base64=", "application/x-www-form-urlencoded")))